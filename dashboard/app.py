@@ -2,14 +2,12 @@
 import streamlit as st
 import pandas as pd
 import matplotlib.pyplot as plt
-import numpy as np
 import os
 from dotenv import load_dotenv, set_key
 
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 
 # ---------- PATH SETUP ----------
-import subprocess
 import sys
 
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
@@ -17,9 +15,15 @@ from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 # ---------- PATH SETUP ----------
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 reports_dir = os.path.join(BASE_DIR, "reports")
-data_dir = os.path.join(BASE_DIR, "data", "trimmed")
+data_dir = os.path.join(BASE_DIR, "data", "processed")
 src_dir = os.path.join(BASE_DIR, "src")
 
+sys.path.insert(0, src_dir)
+from moving_averages import add_crossover_signals
+from cache import cache_info
+from pipeline import run_pipeline
+from trim_data import trimmed_bars
+
 # ---------- PAGE CONFIG ----------
 st.set_page_config(page_title="Adaptive MA Strategy Dashboard", layout="wide")
 st.title("Adaptive Moving Average Strategy Dashboard")
@@ -53,15 +57,8 @@ if new_token:
 st.sidebar.markdown("---")
 st.sidebar.header("Data Management")
 
-def run_script(script_name, status_text):
-    script_path = os.path.join(src_dir, script_name)
-    status_text.text(f"Running {script_name}...")
-    try:
-        result = subprocess.run([sys.executable, script_path], check=True, capture_output=True, text=True)
-        # print(result.stdout) # Optional: Log output
-    except subprocess.CalledProcessError as e:
-        st.error(f"Error running {script_name}:\n{e.stderr}")
-        raise e
+# Each stage skips symbols whose inputs did not change unless forced
+force_rebuild = st.sidebar.checkbox("Force full rebuild", value=False)
 
 if st.sidebar.button("Update Data & Run Optimization"):
     # Check if token exists
@@ -71,23 +68,24 @@ if st.sidebar.button("Update Data & Run Optimization"):
         status_placeholder = st.sidebar.empty()
         try:
             with st.spinner("Running data pipeline... This may take a while."):
-                # 1. Fetch Data
-                run_script("fetch-data-upstox.py", status_placeholder)
-                
-                # 2. Features
-                run_script("features.py", status_placeholder)
-                
-                # 3. Trim Data
-                run_script("trim_data.py", status_placeholder)
-                
-                # 4. Optimize
-                run_script("optimize_on_dynamic_noise.py", status_placeholder)
-                
+                # Fetch -> features -> panel -> optimize in this process; processed
+                # files and the panel are checkpointed for the views below
+                _, timings = run_pipeline(
+                    checkpoint=True,
+                    force=force_rebuild,
+                    progress=lambda stage: status_placeholder.text(f"Running {stage}..."),
+                )
+
             status_placeholder.success("Pipeline completed successfully! ✅")
+            st.session_state["pipeline_timings"] = timings
             st.rerun() # Refresh app to show new data
             
         except Exception as e:
-            st.sidebar.error("Pipeline failed!")
+            st.sidebar.error(f"Pipeline failed: {e}")
+
+if "pipeline_timings" in st.session_state:
+    timings = st.session_state["pipeline_timings"]
+    st.sidebar.caption("Last run: " + " · ".join(f"{stage} {secs:.1f}s" for stage, secs in timings.items()))
 
 
 
@@ -170,27 +168,23 @@ if has_selection:
     st.markdown("---")
     st.subheader("📈 Price Chart + Scenario MA Overlay")
 
-    price_file = os.path.join(data_dir, f"{selected_symbol}.csv")
-
-    if not os.path.exists(price_file):
+    # ---------- LOAD PRICE DATA ----------
+    try:
+        # Rolling ~3-month window as a view over the processed store
+        df = trimmed_bars(selected_symbol, data_dir)
+    except FileNotFoundError:
         st.error("Price data not found for this stock.")
         st.stop()
-
-    # ---------- LOAD PRICE DATA ----------
-    df = pd.read_csv(price_file)
-    df["Date"] = pd.to_datetime(df["Date"], utc=True, errors="coerce").dt.tz_convert(None)
+    if df.empty:
+        st.warning("No recent price data for this stock.")
+        st.stop()
     df = df.sort_values("Date")
 
     # ---------- APPLY SCENARIO MOVING AVERAGES ----------
-    if scenario_ma_type == "EMA":
-        df["MA_Fast"] = df["Close"].ewm(span=fast_ma, adjust=False).mean()
-        df["MA_Slow"] = df["Close"].ewm(span=slow_ma, adjust=False).mean()
-    else:
-        df["MA_Fast"] = df["Close"].rolling(fast_ma).mean()
-        df["MA_Slow"] = df["Close"].rolling(slow_ma).mean()
-
-    df["Signal"] = np.where(df["MA_Fast"] > df["MA_Slow"], 1, -1)
-    df["Crossover"] = df["Signal"].diff()
+    # MA columns come from the feature cache, which lives across reruns
+    df = add_crossover_signals(df, scenario_ma_type, fast_ma, slow_ma, binary=True)
+    stats = cache_info()
+    st.sidebar.caption(f"Feature cache: {stats['hits']} hits / {stats['misses']} misses, {stats['mb']} MB")
 
     # ---------- PLOT ----------
 # ---------- PLOT ----------
@@ -1,660 +1,178 @@
-import pandas as pd
-import requests
+# Resolves Yahoo-style symbols to Upstox instrument keys and keeps
+# upstox_symbol_map.json up to date.
+#
+#   python generate_upstox_symbol.py [--refresh]
+#
+# Symbols come from the universe registry (universe.json, see src/universe.py).
+#
+# The NSE instrument master is cached in data/instruments/ and re-downloaded
+# only when older than a day (conditional on its ETag), streamed down to the
+# NSE equity rows and joined to the symbols through one dict lookup each.
+
+import os
+import re
+import sys
+import json
 import gzip
-import io
-
-# ---------- YOUR YAHOO SYMBOLS ----------
-YAHOO_SYMBOLS = [
-   "ICICIBANK.NS", "ITC.NS", "MARUTI.NS","TATASTEEL.NS","LT.NS"
-       
-    "360ONE.NS",
-    "3MINDIA.NS",
-    "ABB.NS",
-    "ACC.NS",
-    "ACMESOLAR.NS",
-    "AIAENG.NS",
-    "APLAPOLLO.NS",
-    "AUBANK.NS",
-    "AWL.NS",
-    "AADHARHFC.NS",
-    "AARTIIND.NS",
-    "AAVAS.NS",
-    "ABBOTINDIA.NS",
-    "ACE.NS",
-    "ADANIENSOL.NS",
-    "ADANIENT.NS",
-    "ADANIGREEN.NS",
-    "ADANIPORTS.NS",
-    "ADANIPOWER.NS",
-    "ATGL.NS",
-    "ABCAPITAL.NS",
-    "ABFRL.NS",
-    "ABLBL.NS",
-    "ABREL.NS",
-    "ABSLAMC.NS",
-    "AEGISLOG.NS",
-    "AEGISVOPAK.NS",
-    "AFCONS.NS",
-    "AFFLE.NS",
-    "AJANTPHARM.NS",
-    "AKUMS.NS",
-    "AKZOINDIA.NS",
-    "APLLTD.NS",
-    "ALKEM.NS",
-    "ALKYLAMINE.NS",
-    "ALOKINDS.NS",
-    "ARE&M.NS",
-    "AMBER.NS",
-    "AMBUJACEM.NS",
-    "ANANDRATHI.NS",
-    "ANANTRAJ.NS",
-    "ANGELONE.NS",
-    "APARINDS.NS",
-    "APOLLOHOSP.NS",
-    "APOLLOTYRE.NS",
-    "APTUS.NS",
-    "ASAHIINDIA.NS",
-    "ASHOKLEY.NS",
-    "ASIANPAINT.NS",
-    "ASTERDM.NS",
-    "ASTRAZEN.NS",
-    "ASTRAL.NS",
-    "ATHERENERG.NS",
-    "ATUL.NS",
-    "AUROPHARMA.NS",
-    "AIIL.NS",
-    "DMART.NS",
-    "AXISBANK.NS",
-    "BASF.NS",
-    "BEML.NS",
-    "BLS.NS",
-    "BSE.NS",
-    "BAJAJ-AUTO.NS",
-    "BAJFINANCE.NS",
-    "BAJAJFINSV.NS",
-    "BAJAJHLDNG.NS",
-    "BAJAJHFL.NS",
-    "BALKRISIND.NS",
-    "BALRAMCHIN.NS",
-    "BANDHANBNK.NS",
-    "BANKBARODA.NS",
-    "BANKINDIA.NS",
-    "MAHABANK.NS",
-    "BATAINDIA.NS",
-    "BAYERCROP.NS",
-    "BERGEPAINT.NS",
-    "BDL.NS",
-    "BEL.NS",
-    "BHARATFORG.NS",
-    "BHEL.NS",
-    "BPCL.NS",
-    "BHARTIARTL.NS",
-    "BHARTIHEXA.NS",
-    "BIKAJI.NS",
-    "BIOCON.NS",
-    "BSOFT.NS",
-    "BLUEDART.NS",
-    "BLUEJET.NS",
-    "BLUESTARCO.NS",
-    "BBTC.NS",
-    "BOSCHLTD.NS",
-    "FIRSTCRY.NS",
-    "BRIGADE.NS",
-    "BRITANNIA.NS",
-    "MAPMYINDIA.NS",
-    "CCL.NS",
-    "CESC.NS",
-    "CGPOWER.NS",
-    "CRISIL.NS",
-    "CAMPUS.NS",
-    "CANFINHOME.NS",
-    "CANBK.NS",
-    "CAPLIPOINT.NS",
-    "CGCL.NS",
-    "CARBORUNIV.NS",
-    "CASTROLIND.NS",
-    "CEATLTD.NS",
-    "CENTRALBK.NS",
-    "CDSL.NS",
-    "CENTURYPLY.NS",
-    "CERA.NS",
-    "CHALET.NS",
-    "CHAMBLFERT.NS",
-    "CHENNPETRO.NS",
-    "CHOICEIN.NS",
-    "CHOLAHLDNG.NS",
-    "CHOLAFIN.NS",
-    "CIPLA.NS",
-    "CUB.NS",
-    "CLEAN.NS",
-    "COALINDIA.NS",
-    "COCHINSHIP.NS",
-    "COFORGE.NS",
-    "COHANCE.NS",
-    "COLPAL.NS",
-    "CAMS.NS",
-    "CONCORDBIO.NS",
-    "CONCOR.NS",
-    "COROMANDEL.NS",
-    "CRAFTSMAN.NS",
-    "CREDITACC.NS",
-    "CROMPTON.NS",
-    "CUMMINSIND.NS",
-    "CYIENT.NS",
-     "ASTERDM.NS",
-    "ASTRAZEN.NS",
-    "ASTRAL.NS",
-    "ATHERENERG.NS",
-    "ATUL.NS",
-    "AUROPHARMA.NS",
-    "AIIL.NS",
-    "DMART.NS",
-    "AXISBANK.NS",
-    "BASF.NS",
-    "BEML.NS",
-    "BLS.NS",
-    "BSE.NS",
-    "BAJAJ-AUTO.NS",
-    "BAJFINANCE.NS",
-    "BAJAJFINSV.NS",
-    "BAJAJHLDNG.NS",
-    "BAJAJHFL.NS",
-    "BALKRISIND.NS",
-    "BALRAMCHIN.NS",
-    "BANDHANBNK.NS",
-    "BANKBARODA.NS",
-    "BANKINDIA.NS",
-    "MAHABANK.NS",
-    "BATAINDIA.NS",
-    "BAYERCROP.NS",
-    "BERGEPAINT.NS",
-    "BDL.NS",
-    "BEL.NS",
-    "BHARATFORG.NS",
-    "BHEL.NS",
-    "BPCL.NS",
-    "BHARTIARTL.NS",
-    "BHARTIHEXA.NS",
-    "BIKAJI.NS",
-    "BIOCON.NS",
-    "BSOFT.NS",
-    "BLUEDART.NS",
-    "BLUEJET.NS",
-    "BLUESTARCO.NS",
-    "BBTC.NS",
-    "BOSCHLTD.NS",
-    "FIRSTCRY.NS",
-    "BRIGADE.NS",
-    "BRITANNIA.NS",
-    "MAPMYINDIA.NS",
-    "CCL.NS",
-    "CESC.NS",
-    "CGPOWER.NS",
-    "CRISIL.NS",
-    "CAMPUS.NS",
-      "CANFINHOME.NS",
-    "CANBK.NS",
-    "CAPLIPOINT.NS",
-    "CGCL.NS",
-    "CARBORUNIV.NS",
-    "CASTROLIND.NS",
-    "CEATLTD.NS",
-    "CENTRALBK.NS",
-    "CDSL.NS",
-    "CENTURYPLY.NS",
-    "CERA.NS",
-    "CHALET.NS",
-    "CHAMBLFERT.NS",
-    "CHENNPETRO.NS",
-    "CHOICEIN.NS",
-    "CHOLAHLDNG.NS",
-    "CHOLAFIN.NS",
-    "CIPLA.NS",
-    "CUB.NS",
-    "CLEAN.NS",
-    "COALINDIA.NS",
-    "COCHINSHIP.NS",
-    "COFORGE.NS",
-    "COHANCE.NS",
-    "COLPAL.NS",
-    "CAMS.NS",
-    "CONCORDBIO.NS",
-    "CONCOR.NS",
-    "COROMANDEL.NS",
-    "CRAFTSMAN.NS",
-    "CREDITACC.NS",
-    "CROMPTON.NS",
-    "CUMMINSIND.NS",
-    "CYIENT.NS",
-    "DCMSHRIRAM.NS",
-    "DLF.NS",
-    "DOMS.NS",
-    "DABUR.NS",
-    "DALBHARAT.NS",
-    "DATAPATTNS.NS",
-    "DEEPAKFERT.NS",
-    "DEEPAKNTR.NS",
-    "DELHIVERY.NS",
-    "DEVYANI.NS",
-    "DIVISLAB.NS",
-    "DIXON.NS",
-    "AGARWALEYE.NS",
-    "LALPATHLAB.NS",
-    "DRREDDY.NS",
-    "DUMMYHDLVR.NS",
-    "EIDPARRY.NS",
-    "EIHOTEL.NS",
-    "EICHERMOT.NS",
-    "ELECON.NS",
-    "ELGIEQUIP.NS",
-    "EMAMILTD.NS",
-    "EMCURE.NS",
-    "ENDURANCE.NS",
-    "ENGINERSIN.NS",
-    "ERIS.NS",
-    "ESCORTS.NS",
-    "ETERNAL.NS",
-    "EXIDEIND.NS",
-    "NYKAA.NS",
-    "FEDERALBNK.NS",
-    "FACT.NS",
-    "FINCABLES.NS",
-    "FINPIPE.NS",
-    "FSL.NS",
-    "FIVESTAR.NS",
-    "FORCEMOT.NS",
-    "FORTIS.NS",
-    "GAIL.NS",
-    "GVT&D.NS",
-    "GMRAIRPORT.NS",
-    "GRSE.NS",
-    "GICRE.NS",
-    "GILLETTE.NS",
-    "GLAND.NS",
-    "GLAXO.NS",
-    "GLENMARK.NS",
-    "MEDANTA.NS",
-    "GODIGIT.NS",
-    "GPIL.NS",
-    "GODFRYPHLP.NS",
-    "GODREJAGRO.NS",
-    "GODREJCP.NS",
-    "GODREJIND.NS",
-    "GODREJPROP.NS",
-    "GRANULES.NS",
-    "GRAPHITE.NS",
-    "GRASIM.NS",
-    "GRAVITA.NS",
-    "GESHIP.NS",
-    "FLUOROCHEM.NS",
-    "GUJGASLTD.NS",
-    "GMDCLTD.NS",
-    "GSPL.NS",
-      "HEG.NS",
-    "HBLENGINE.NS",
-    "HCLTECH.NS",
-    "HDFCAMC.NS",
-    "HDFCBANK.NS",
-    "HDFCLIFE.NS",
-    "HFCL.NS",
-    "HAPPSTMNDS.NS",
-    "HAVELLS.NS",
-    "HEROMOTOCO.NS",
-    "HEXT.NS",
-    "HSCL.NS",
-    "HINDALCO.NS",
-    "HAL.NS",
-    "HINDCOPPER.NS",
-    "HINDPETRO.NS",
-    "HINDUNILVR.NS",
-    "HINDZINC.NS",
-    "POWERINDIA.NS",
-    "HOMEFIRST.NS",
-    "HONASA.NS",
-    "HONAUT.NS",
-    "HUDCO.NS",
-    "HYUNDAI.NS",
-    "ICICIBANK.NS",
-    "ICICIGI.NS",
-    "ICICIPRULI.NS",
-    "IDBI.NS",
-    "IDFCFIRSTB.NS",
-    "IFCI.NS",
-    "IIFL.NS",
-    "INOXINDIA.NS",
-    "IRB.NS",
-    "IRCON.NS",
-    "ITCHOTELS.NS",
-    "ITC.NS",
-    "ITI.NS",
-    "INDGN.NS",
-    "INDIACEM.NS",
-    "INDIAMART.NS",
-    "INDIANB.NS",
-    "IEX.NS",
-    "INDHOTEL.NS",
-    "IOC.NS",
-    "IOB.NS",
-    "IRCTC.NS",
-    "IRFC.NS",
-    "IREDA.NS",
-    "IGL.NS",
-    "INDUSTOWER.NS",
-    "INDUSINDBK.NS",
-    "NAUKRI.NS",
-    "INFY.NS",
-    "INOXWIND.NS",
-    "INTELLECT.NS",
-    "INDIGO.NS",
-    "IGIL.NS",
-    "IKS.NS",
-    "IPCALAB.NS",
-    "JBCHEPHARM.NS",
-    "JKCEMENT.NS",
-    "JBMA.NS",
-    "JKTYRE.NS",
-    "JMFINANCIL.NS",
-    "JSWENERGY.NS",
-    "JSWINFRA.NS",
-    "JSWSTEEL.NS",
-    "JPPOWER.NS",
-    "J&KBANK.NS",
-    "JINDALSAW.NS",
-    "JSL.NS",
-    "JINDALSTEL.NS",
-    "JIOFIN.NS",
-    "JUBLFOOD.NS",
-    "JUBLINGREA.NS",
-    "JUBLPHARMA.NS",
-    "JWL.NS",
-    "JYOTHYLAB.NS",
-    "JYOTICNC.NS",
-    "KPRMILL.NS",
-    "KEI.NS",
-    "KPITTECH.NS",
-    "KSB.NS",
-    "KAJARIACER.NS",
-    "KPIL.NS",
-    "KALYANKJIL.NS",
-    "KARURVYSYA.NS",
-    "KAYNES.NS",
-    "KEC.NS",
-    "KFINTECH.NS",
-    "KIRLOSBROS.NS",
-    "KIRLOSENG.NS",
-    "KOTAKBANK.NS",
-    "KIMS.NS",
-    "LTF.NS",
-    "LTTS.NS",
-    "LICHSGFIN.NS",
-    "LTFOODS.NS",
-    "LTIM.NS",
-    "LT.NS",
-    "LATENTVIEW.NS",
-     "LAURUSLABS.NS",
-    "THELEELA.NS",
-    "LEMONTREE.NS",
-    "LICI.NS",
-    "LINDEINDIA.NS",
-    "LLOYDSME.NS",
-    "LODHA.NS",
-    "LUPIN.NS",
-    "MMTC.NS",
-    "MRF.NS",
-    "MGL.NS",
-    "MAHSCOOTER.NS",
-    "MAHSEAMLES.NS",
-    "M&MFIN.NS",
-    "M&M.NS",
-    "MANAPPURAM.NS",
-    "MRPL.NS",
-    "MANKIND.NS",
-    "MARICO.NS",
-    "MARUTI.NS",
-    "MFSL.NS",
-    "MAXHEALTH.NS",
-    "MAZDOCK.NS",
-    "METROPOLIS.NS",
-    "MINDACORP.NS",
-    "MSUMI.NS",
-    "MOTILALOFS.NS",
-    "MPHASIS.NS",
-    "MCX.NS",
-    "MUTHOOTFIN.NS",
-    "NATCOPHARM.NS",
-    "NBCC.NS",
-    "NCC.NS",
-    "NHPC.NS",
-    "NLCINDIA.NS",
-    "NMDC.NS",
-    "NSLNISP.NS",
-    "NTPCGREEN.NS",
-    "NTPC.NS",
-    "NH.NS",
-    "NATIONALUM.NS",
-    "NAVA.NS",
-    "NAVINFLUOR.NS",
-    "NESTLEIND.NS",
-    "NETWEB.NS",
-    "NEULANDLAB.NS",
-    "NEWGEN.NS",
-    "NAM-INDIA.NS",
-    "NIVABUPA.NS",
-    "NUVAMA.NS",
-     "NUVOCO.NS",
-    "OBEROIRLTY.NS",
-    "ONGC.NS",
-    "OIL.NS",
-    "OLAELEC.NS",
-    "OLECTRA.NS",
-    "PAYTM.NS",
-    "ONESOURCE.NS",
-    "OFSS.NS",
-    "POLICYBZR.NS",
-    "PCBL.NS",
-    "PGEL.NS",
-    "PIIND.NS",
-    "PNBHOUSING.NS",
-    "PTCIL.NS",
-    "PVRINOX.NS",
-    "PAGEIND.NS",
-    "PATANJALI.NS",
-    "PERSISTENT.NS",
-    "PETRONET.NS",
-    "PFIZER.NS",
-    "PHOENIXLTD.NS",
-    "PIDILITIND.NS",
-    "PPLPHARMA.NS",
-    "POLYMED.NS",
-    "POLYCAB.NS",
-    "POONAWALLA.NS",
-    "PFC.NS",
-    "POWERGRID.NS",
-    "PRAJIND.NS",
-    "PREMIERENE.NS",
-    "PRESTIGE.NS",
-    "PGHH.NS",
-    "PNB.NS",
-    "RRKABEL.NS",
-    "RBLBANK.NS",
-    "RECLTD.NS",
-    "RHIM.NS",
-    "RITES.NS",
-    "RADICO.NS",
-    "RVNL.NS",
-    "RAILTEL.NS",
-    "RAINBOW.NS",
-    "RKFORGE.NS",
-    "RCF.NS",
-    "REDINGTON.NS",
-    "RELIANCE.NS",
-    "RELINFRA.NS",
-    "RPOWER.NS",
-    "SBFC.NS",
-    "SBICARD.NS",
-    "SBILIFE.NS",
-    "SJVN.NS",
-    "SKFINDIA.NS",
-    "SRF.NS",
-    "SAGILITY.NS",
-    "SAILIFE.NS",
-    "SAMMAANCAP.NS",
-    "MOTHERSON.NS",
-    "SAPPHIRE.NS",
-    "SARDAEN.NS",
-    "SAREGAMA.NS",
-    "SCHAEFFLER.NS",
-    "SCHNEIDER.NS",
-    "SCI.NS",
-    "SHREECEM.NS",
-    "SHRIRAMFIN.NS",
-    "SHYAMMETL.NS",
-    "ENRIN.NS",
-    "SIEMENS.NS",
-    "SIGNATURE.NS",
-    "SOBHA.NS",
-    "SOLARINDS.NS",
-    "SONACOMS.NS",
-    "SONATSOFTW.NS",
-    "STARHEALTH.NS",
-    "SBIN.NS",
-    "SAIL.NS",
-    "SUMICHEM.NS",
-    "SUNPHARMA.NS",
-    "SUNTV.NS",
-    "SUNDARMFIN.NS",
-    "SUNDRMFAST.NS",
-    "SUPREMEIND.NS",
-    "SUZLON.NS",
-    "SWANCORP.NS",
-    "SWIGGY.NS",
-    "SYNGENE.NS",
-    "SYRMA.NS",
-    "TBOTEK.NS",
-    "TVSMOTOR.NS",
-    "TATACHEM.NS",
-    "TATACOMM.NS",
-    "TCS.NS",
-    "TATACONSUM.NS",
-    "TATAELXSI.NS",
-    "TATAINVEST.NS",
-    "TMPV.NS",
-    "TATAPOWER.NS",
-    "TATASTEEL.NS",
-    "TATATECH.NS",
-    "TTML.NS",
-    "TECHM.NS",
-    "TECHNOE.NS",
-    "TEJASNET.NS",
-    "NIACL.NS",
-    "RAMCOCEM.NS",
-    "THERMAX.NS",
-    "TIMKEN.NS",
-    "TITAGARH.NS",
-    "TITAN.NS",
-    "TORNTPHARM.NS",
-    "TORNTPOWER.NS",
-    "TARIL.NS",
-    "TRENT.NS",
-    "TRIDENT.NS",
-    "TRIVENI.NS",
-    "TRITURBINE.NS",
-    "TIINDIA.NS",
-    "UCOBANK.NS",
-    "UNOMINDA.NS",
-    "UPL.NS",
-    "UTIAMC.NS",
-    "ULTRACEMCO.NS",
-    "UNIONBANK.NS",
-    "UBL.NS",
-    "UNITDSPR.NS",
-    "USHAMART.NS",
-    "VGUARD.NS",
-    "DBREALTY.NS",
-    "VTL.NS",
-    "VBL.NS",
-    "MANYAVAR.NS",
-    "VEDL.NS",
-    "VENTIVE.NS",
-    "VIJAYA.NS",
-    "VMM.NS",
-    "IDEA.NS",
-    "VOLTAS.NS",
-    "WAAREEENER.NS",
-    "WELCORP.NS",
-    "WELSPUNLIV.NS",
-    "WHIRLPOOL.NS",
-    "WIPRO.NS",
-    "WOCKPHARMA.NS",
-    "YESBANK.NS",
-    "ZFCVINDIA.NS",
-    "ZEEL.NS",
-    "ZENTEC.NS",
-    "ZENSARTECH.NS",
-    "ZYDUSLIFE.NS",
-    "ECLERX.NS"
-]
-
-# ---------- DOWNLOAD UPSTOX INSTRUMENT MASTER ----------
-URL = "https://assets.upstox.com/market-quote/instruments/exchange/NSE.json.gz"
-response = requests.get(URL)
-response.raise_for_status()
-
-with gzip.open(io.BytesIO(response.content), "rt", encoding="utf-8") as f:
-    instruments = pd.read_json(f)
-
-# ---------- NORMALIZE COLUMN NAMES ----------
-instruments.columns = instruments.columns.str.lower()
-
-# ---------- FIND SYMBOL COLUMN (ROBUST) ----------
-symbol_col = None
-for candidate in ["trading_symbol", "tradingsymbol", "symbol"]:
-    if candidate in instruments.columns:
-        symbol_col = candidate
-        break
-
-if symbol_col is None:
-    raise RuntimeError(
-        f"❌ No trading symbol column found. Columns available:\n{instruments.columns.tolist()}"
-    )
-
-# ---------- FILTER NSE EQUITIES ----------
-instruments = instruments[
-    (instruments["exchange"] == "NSE") &
-    (instruments["segment"].str.contains("EQ", na=False))
-]
-
+import time
+import requests
 
-# Normalize symbols
-instruments[symbol_col] = instruments[symbol_col].astype(str).str.upper()
+# ---------- PATH SETUP ----------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, "data", "instruments")
+MAP_PATH = os.path.join(BASE_DIR, "upstox_symbol_map.json")
+
+sys.path.insert(0, os.path.join(BASE_DIR, "src"))
+from universe import load_universe
+
+MASTER_URL = "https://assets.upstox.com/market-quote/instruments/exchange/NSE.json.gz"
+MASTER_PATH = os.path.join(CACHE_DIR, "NSE.json.gz")
+MASTER_META_PATH = os.path.join(CACHE_DIR, "NSE.meta.json")
+MAX_AGE_SECONDS = 24 * 3600
+
+SYMBOL_KEYS = ("trading_symbol", "tradingsymbol", "symbol")
+
+# ---------- INSTRUMENT MASTER CACHE ----------
+def _read_meta():
+    if not os.path.exists(MASTER_META_PATH):
+        return {}
+    with open(MASTER_META_PATH) as f:
+        return json.load(f)
+
+def _write_meta(meta):
+    with open(MASTER_META_PATH, "w") as f:
+        json.dump(meta, f, indent=2)
+
+def fetch_master(force=False, max_age=MAX_AGE_SECONDS):
+    """
+    Path of the cached NSE.json.gz. Re-validated with If-None-Match /
+    If-Modified-Since once older than max_age (or when force=True); a failed
+    refresh falls back to the cached copy.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    meta = _read_meta()
+    cached = os.path.exists(MASTER_PATH)
+    if cached and not force and time.time() - meta.get("checked", 0) < max_age:
+        return MASTER_PATH
+
+    headers = {}
+    if cached and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if cached and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        response = requests.get(MASTER_URL, headers=headers, stream=True, timeout=60)
+        if response.status_code == 304:
+            print("OK Instrument master unchanged")
+        else:
+            response.raise_for_status()
+            tmp_path = f"{MASTER_PATH}.tmp"
+            with open(tmp_path, "wb") as f:
+                for chunk in response.iter_content(1 << 20):
+                    f.write(chunk)
+            os.replace(tmp_path, MASTER_PATH)
+            meta["etag"] = response.headers.get("ETag")
+            meta["last_modified"] = response.headers.get("Last-Modified")
+            print(f"OK Downloaded instrument master ({os.path.getsize(MASTER_PATH) / 1e6:.1f} MB)")
+    except requests.RequestException as e:
+        if not cached:
+            raise
+        print(f"! Instrument master refresh failed ({e}); using cached copy")
+        return MASTER_PATH
+
+    meta["checked"] = time.time()
+    _write_meta(meta)
+    return MASTER_PATH
+
+# ---------- STREAMING PARSE ----------
+def iter_instruments(path, chunk_size=1 << 20):
+    """Yields the master's JSON array one object at a time without loading it whole."""
+    decoder = json.JSONDecoder()
+    separators = re.compile(r"[\s,]*")
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise RuntimeError("Instrument master is not a JSON array")
+        pos = 1
+        while True:
+            pos = separators.match(buffer, pos).end()
+            if buffer.startswith("]", pos):
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Object cut at the chunk boundary: keep the tail, read more
+                more = f.read(chunk_size)
+                if not more:
+                    raise
+                buffer, pos = buffer[pos:] + more, 0
+                continue
+            yield item
+
+def build_index(path):
+    """{TRADING_SYMBOL: instrument_key} for NSE equities (first listing wins)."""
+    index = {}
+    for item in iter_instruments(path):
+        item = {k.lower(): v for k, v in item.items()}
+        if item.get("exchange") != "NSE" or "EQ" not in str(item.get("segment", "")):
+            continue
+        symbol = next((item[k] for k in SYMBOL_KEYS if k in item), None)
+        if symbol is None:
+            raise RuntimeError(f"No trading symbol field in instrument: {sorted(item)}")
+        index.setdefault(str(symbol).upper(), item["instrument_key"])
+    return index
 
 # ---------- MAP ----------
-symbol_map = {}
-missing = []
-
-for y in YAHOO_SYMBOLS:
-    yahoo_clean = y.replace(".NS", "").upper()
-    match = instruments[instruments[symbol_col] == yahoo_clean]
-
-    if not match.empty:
-        symbol_map[y] = match.iloc[0]["instrument_key"]
-    else:
-        missing.append(y)
-
-# ---------- OUTPUT ----------
-print("\n✅ GENERATED UPSTOX SYMBOL MAP\n")
-print("SYMBOL_MAP = {")
-for k, v in symbol_map.items():
-    print(f'    "{k}": "{v}",')
-print("}")
-
-if missing:
-    print("\n⚠️ NOT FOUND ON UPSTOX:")
-    for m in missing:
-        print(" -", m)
-import json
-
-with open("upstox_symbol_map.json", "w") as f:
-    json.dump(symbol_map, f, indent=4)
-
-print("Saved upstox_symbol_map.json")
+def resolve(yahoo_symbols, index):
+    """(symbol_map, missing) by one dict lookup per Yahoo symbol."""
+    symbol_map, missing = {}, []
+    for y in yahoo_symbols:
+        key = index.get(y.replace(".NS", "").upper())
+        if key is not None:
+            symbol_map[y] = key
+        else:
+            missing.append(y)
+    return symbol_map, missing
+
+def update_symbol_map(yahoo_symbols=None, map_path=MAP_PATH, refresh=False):
+    """
+    Adds instrument keys for symbols not yet in upstox_symbol_map.json (every
+    symbol when refresh=True, which also re-validates the master) and keeps
+    the existing entries. Returns the updated map.
+    """
+    if yahoo_symbols is None:
+        yahoo_symbols = load_universe()
+    symbol_map = {}
+    if os.path.exists(map_path):
+        with open(map_path) as f:
+            symbol_map = json.load(f)
+
+    todo = list(dict.fromkeys(yahoo_symbols if refresh else [y for y in yahoo_symbols if y not in symbol_map]))
+    if not todo:
+        print(f"OK upstox_symbol_map.json already covers all {len(yahoo_symbols)} symbols")
+        return symbol_map
+
+    index = build_index(fetch_master(force=refresh))
+    resolved, missing = resolve(todo, index)
+    added = sum(y not in symbol_map for y in resolved)
+    changed = sum(y in symbol_map and symbol_map[y] != k for y, k in resolved.items())
+    symbol_map.update(resolved)
+
+    print(f"\nOK {added} added, {changed} changed, {len(symbol_map)} symbols mapped")
+    if missing:
+        print("\n! NOT FOUND ON UPSTOX:")
+        for m in missing:
+            print(" -", m)
+
+    if added or changed:
+        tmp_path = f"{map_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(symbol_map, f, indent=4)
+        os.replace(tmp_path, map_path)
+        print(f"Saved {os.path.basename(map_path)}")
+    return symbol_map
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    update_symbol_map(refresh="--refresh" in sys.argv[1:])
@@ -1,10 +1,13 @@
-import pandas as pd
+import os
+import sys
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "src"))
+from storage import read_file, find_file
+
 def plot_processed_csv(filepath):
-    # Load file
-    df = pd.read_csv(filepath)
-    df["Date"] = pd.to_datetime(df["Date"])
+    # Load file (.csv or .feather)
+    df = read_file(filepath)
 
     # Make sure moving averages exist
     if not {"MA_Fast", "MA_Slow", "Crossover"}.issubset(df.columns):
@@ -35,4 +38,4 @@ def plot_processed_csv(filepath):
 
 if __name__ == "__main__":
     # Example usage
-    plot_processed_csv("data/processed/ADANIENT.NS.csv")
+    plot_processed_csv(find_file("data/processed", "ADANIENT.NS"))
@@ -1,8 +1,13 @@
 #In this file we perform backtesting [applying a trading strategy to our past data]
 
+import os
+import json
 import pandas as pd
 import numpy as np
 
+from storage import read_prices
+from panel import recent_window
+
 # ---------- Helper Metrics ----------
 
 def max_drawdown(equity):
@@ -19,6 +24,145 @@ def sharpe_ratio(daily_returns, periods_per_year=252):
         return 0.0
     return (mean / std) * np.sqrt(periods_per_year)
 
+NS_PER_DAY = 86_400_000_000_000
+
+def _max_drawdown_array(equity):
+    """max_drawdown() on a NumPy equity curve."""
+    peak = np.maximum.accumulate(equity)
+    return ((equity / peak) - 1).min()
+
+def _sharpe_ratio_array(daily_returns, periods_per_year=252):
+    """sharpe_ratio() on a NumPy return series (sample std, like pandas)."""
+    n = len(daily_returns)
+    if n < 2:
+        return 0.0
+    mean = daily_returns.sum() / n
+    std = np.sqrt(((daily_returns - mean) ** 2).sum() / (n - 1))
+    if std == 0 or np.isnan(std):
+        return 0.0
+    return (mean / std) * np.sqrt(periods_per_year)
+
+# ---------- Array Engine ----------
+def frame_to_arrays(df, entry_col="Crossover"):
+    """
+    Extracts the columns the backtest reads, sorted by Date, as NumPy arrays.
+    Do this once per frame and feed the result to backtest_arrays().
+    """
+    dates = pd.DatetimeIndex(pd.to_datetime(df["Date"]))
+    order = np.argsort(dates.as_unit("ns").asi8, kind="stable")
+    return {
+        "dates": dates[order],
+        "open_": df["Open"].to_numpy(dtype=float)[order],
+        "high": df["High"].to_numpy(dtype=float)[order],
+        "low": df["Low"].to_numpy(dtype=float)[order],
+        "close": df["Close"].to_numpy(dtype=float)[order],
+        "crossover": df[entry_col].to_numpy(dtype=float)[order],
+        "ma_slow": df["MA_Slow"].to_numpy(dtype=float)[order],
+    }
+
+def backtest_arrays(
+    dates,
+    open_,
+    high,
+    low,
+    close,
+    crossover,
+    ma_slow,
+    cost_bps=15,
+    exit_mode="opposite",
+    hold_days=10,
+    stop_loss=None,
+    take_profit=None
+):
+    """
+    Array kernel behind backtest_strategy(); same entry/exit rules and outputs.
+    Inputs are aligned 1-D arrays already sorted by date. The bar loop only
+    touches Python floats and the equity curve is a single cumprod, so a run is
+    O(n) instead of rebuilding a row Series and a pct_change column every bar.
+    """
+    dates = pd.DatetimeIndex(dates)
+    stamps = dates.as_unit("ns").asi8.tolist()
+    close = np.asarray(close, dtype=float)
+    opens = np.asarray(open_, dtype=float).tolist()
+    highs = np.asarray(high, dtype=float).tolist()
+    lows = np.asarray(low, dtype=float).tolist()
+    closes = close.tolist()
+    cross = np.asarray(crossover, dtype=float).tolist()
+    slow = np.asarray(ma_slow, dtype=float).tolist()
+    n = len(closes)
+
+    in_position = False
+    entry_price = 0.0
+    entry_stamp = 0
+    entry_date = None
+    trades = []
+    cost = 2 * (cost_bps / 10000)  # entry + exit
+    # Entry bars are skipped when the equity curve is extended
+    equity_bar = np.ones(n, dtype=bool)
+
+    for i in range(1, n):
+        # ENTRY: bullish crossover yesterday, confirmed by Close above the slow MA
+        if not in_position and cross[i - 1] == 2:
+            if closes[i - 1] > slow[i - 1]:
+                entry_price = opens[i]
+                entry_stamp = stamps[i]
+                entry_date = dates[i]
+                in_position = True
+                equity_bar[i] = False
+                continue
+
+        if in_position:
+            exit_reason = None
+            if exit_mode == "opposite" and cross[i - 1] == -2:
+                exit_reason = "Opposite crossover"
+            elif exit_mode == "time" and (stamps[i] - entry_stamp) // NS_PER_DAY >= hold_days:
+                exit_reason = f"{hold_days}-day exit"
+            elif stop_loss and lows[i] <= entry_price * (1 - stop_loss):
+                exit_reason = f"Stop loss ({stop_loss*100:.1f}%)"
+            elif take_profit and highs[i] >= entry_price * (1 + take_profit):
+                exit_reason = f"Take profit ({take_profit*100:.1f}%)"
+
+            if exit_reason is not None:
+                exit_price = opens[i]
+                net_return = (exit_price / entry_price) - 1 - cost
+                trades.append({
+                    "EntryDate": entry_date,
+                    "ExitDate": dates[i],
+                    "EntryPrice": entry_price,
+                    "ExitPrice": exit_price,
+                    "NetReturn": net_return,
+                    "ExitReason": exit_reason
+                })
+                in_position = False
+
+    # ---------- Metrics ----------
+    returns = np.zeros(n)
+    if n > 1:
+        returns[1:] = close[1:] / close[:-1] - 1
+        returns[np.isnan(returns)] = 0
+    equity_bar[:1] = False
+    equity = np.cumprod(np.concatenate(([1.0], 1 + returns[equity_bar])))
+    daily_returns = np.zeros(len(equity))
+    daily_returns[1:] = equity[1:] / equity[:-1] - 1
+
+    n_trades = len(trades)
+    if n_trades > 0:
+        win_rate = len([t for t in trades if t["NetReturn"] > 0]) / n_trades
+        total_return = np.prod([1 + t["NetReturn"] for t in trades]) - 1
+    else:
+        win_rate = 0
+        total_return = 0
+
+    metrics = {
+        "Total Return": round(total_return * 100, 2),
+        "Max Drawdown": round(_max_drawdown_array(equity) * 100, 2),
+        "Sharpe Ratio": round(_sharpe_ratio_array(daily_returns), 2),
+        "Win Rate": round(win_rate * 100, 2),
+        "Trades": n_trades
+    }
+
+    return metrics, trades
+
 # ---------- Backtest Function ----------
 def backtest_strategy(
     df,
@@ -27,13 +171,25 @@ def backtest_strategy(
     exit_mode="opposite",
     hold_days=10,
     stop_loss=None,       # e.g., 0.03 = 3%
-    take_profit=None      # e.g., 0.05 = 5%
+    take_profit=None,     # e.g., 0.05 = 5%
+    engine="numpy"        # "numpy" (array kernel) or "loop" (original row loop)
 ):
     """
     Runs a long-only MA crossover backtest with optimization levers.
     Entry: Bullish cross (next day's open)
     Exit: Opposite cross, time-based, stop-loss, or take-profit.
     """
+    if engine == "numpy":
+        return backtest_arrays(
+            **frame_to_arrays(df, entry_col),
+            cost_bps=cost_bps,
+            exit_mode=exit_mode,
+            hold_days=hold_days,
+            stop_loss=stop_loss,
+            take_profit=take_profit
+        )
+    if engine != "loop":
+        raise ValueError("engine must be numpy or loop")
 
     df = df.copy().sort_values("Date").reset_index(drop=True)
     df["Date"] = pd.to_datetime(df["Date"])
@@ -128,15 +284,256 @@ def backtest_strategy(
     return metrics, trades
 
 
+# ---------- Incremental Backtest ----------
+class BacktestState:
+    """
+    Resumable form of backtest_strategy(): same rules, fed one bar at a time.
+    Holds the open position, the trade log and running equity statistics
+    (peak, max drawdown, Welford mean/variance of daily returns), so advancing
+    by one new candle is O(1) and the whole state round-trips through JSON.
+    """
+
+    PARAMS = ("entry_col", "cost_bps", "exit_mode", "hold_days", "stop_loss", "take_profit")
+
+    def __init__(
+        self,
+        entry_col="Crossover",
+        cost_bps=15,
+        exit_mode="opposite",
+        hold_days=10,
+        stop_loss=None,
+        take_profit=None
+    ):
+        self.entry_col = entry_col
+        self.cost_bps = cost_bps
+        self.exit_mode = exit_mode
+        self.hold_days = hold_days
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+
+        self.in_position = False
+        self.entry_price = 0.0
+        self.entry_date = None
+        self.trades = []
+        self.last_date = None
+        self.prev = None           # (Close, MA_Slow, Crossover) of the last bar
+
+        self.equity = 1.0
+        self.peak = 1.0
+        self.max_drawdown = 0.0
+        self.n_returns = 1         # the curve starts with a 0.0 daily return
+        self.mean_return = 0.0
+        self.m2_return = 0.0
+
+    @classmethod
+    def from_frame(cls, df, **params):
+        """Builds a state by replaying a full processed frame."""
+        state = cls(**params)
+        state.update_many(df)
+        return state
+
+    def params(self):
+        return {name: getattr(self, name) for name in self.PARAMS}
+
+    # ---------- Bar Updates ----------
+    def update(self, bar):
+        """
+        Consumes one bar (dict or Series with Date, Open, High, Low, Close,
+        MA_Slow and the entry column). Returns the trade closed on it, if any.
+        """
+        return self._step(
+            pd.Timestamp(bar["Date"]),
+            float(bar["Open"]),
+            float(bar["High"]),
+            float(bar["Low"]),
+            float(bar["Close"]),
+            float(bar[self.entry_col]),
+            float(bar["MA_Slow"])
+        )
+
+    def update_many(self, df):
+        """
+        Consumes a frame of bars in date order, skipping any bar not newer than
+        the last one seen, so the tail of a refreshed file can be passed as is.
+        Returns the trades closed during the call.
+        """
+        arrays = frame_to_arrays(df, self.entry_col)
+        dates = arrays["dates"]
+        start = 0
+        if self.last_date is not None:
+            start = int(dates.searchsorted(self.last_date, side="right"))
+
+        closed = []
+        columns = [arrays[k][start:].tolist() for k in ("open_", "high", "low", "close", "crossover", "ma_slow")]
+        for date, *values in zip(dates[start:], *columns):
+            trade = self._step(date, *values)
+            if trade is not None:
+                closed.append(trade)
+        return closed
+
+    def _step(self, date, open_, high, low, close, cross, ma_slow):
+        prev = self.prev
+        self.prev = (close, ma_slow, cross)
+        self.last_date = date
+        if prev is None:
+            return None
+
+        prev_close, prev_slow, prev_cross = prev
+        trade = None
+
+        # ENTRY: bullish crossover yesterday, confirmed by Close above the slow MA
+        if not self.in_position and prev_cross == 2 and prev_close > prev_slow:
+            self.entry_price = open_
+            self.entry_date = date
+            self.in_position = True
+            return None
+
+        if self.in_position:
+            exit_reason = None
+            if self.exit_mode == "opposite" and prev_cross == -2:
+                exit_reason = "Opposite crossover"
+            elif self.exit_mode == "time" and (date - self.entry_date).days >= self.hold_days:
+                exit_reason = f"{self.hold_days}-day exit"
+            elif self.stop_loss and low <= self.entry_price * (1 - self.stop_loss):
+                exit_reason = f"Stop loss ({self.stop_loss*100:.1f}%)"
+            elif self.take_profit and high >= self.entry_price * (1 + self.take_profit):
+                exit_reason = f"Take profit ({self.take_profit*100:.1f}%)"
+
+            if exit_reason is not None:
+                cost = 2 * (self.cost_bps / 10000)  # entry + exit
+                trade = {
+                    "EntryDate": self.entry_date,
+                    "ExitDate": date,
+                    "EntryPrice": self.entry_price,
+                    "ExitPrice": open_,
+                    "NetReturn": (open_ / self.entry_price) - 1 - cost,
+                    "ExitReason": exit_reason
+                }
+                self.trades.append(trade)
+                self.in_position = False
+
+        # Equity follows Close to Close moves (entry bars are skipped, as in the loop)
+        change = (close / prev_close) - 1
+        if np.isnan(change):
+            change = 0.0
+        equity = self.equity * (1 + change)
+        daily = (equity / self.equity) - 1
+        self.equity = equity
+        self.peak = max(self.peak, equity)
+        self.max_drawdown = min(self.max_drawdown, (equity / self.peak) - 1)
+
+        self.n_returns += 1
+        delta = daily - self.mean_return
+        self.mean_return += delta / self.n_returns
+        self.m2_return += delta * (daily - self.mean_return)
+        return trade
+
+    # ---------- Results ----------
+    def metrics(self):
+        """Metrics dict in the backtest_strategy() format."""
+        n_trades = len(self.trades)
+        if n_trades > 0:
+            win_rate = len([t for t in self.trades if t["NetReturn"] > 0]) / n_trades
+            total_return = np.prod([1 + t["NetReturn"] for t in self.trades]) - 1
+        else:
+            win_rate = 0
+            total_return = 0
+
+        sharpe = 0.0
+        if self.n_returns > 1:
+            std = np.sqrt(self.m2_return / (self.n_returns - 1))
+            if std != 0 and not np.isnan(std):
+                sharpe = (self.mean_return / std) * np.sqrt(252)
+
+        return {
+            "Total Return": round(total_return * 100, 2),
+            "Max Drawdown": round(self.max_drawdown * 100, 2),
+            "Sharpe Ratio": round(sharpe, 2),
+            "Win Rate": round(win_rate * 100, 2),
+            "Trades": n_trades
+        }
+
+    # ---------- Persistence ----------
+    def to_dict(self):
+        def stamp(value):
+            return None if value is None else pd.Timestamp(value).isoformat()
+
+        return {
+            "params": self.params(),
+            "in_position": self.in_position,
+            "entry_price": self.entry_price,
+            "entry_date": stamp(self.entry_date),
+            "last_date": stamp(self.last_date),
+            "prev": self.prev,
+            "equity": self.equity,
+            "peak": self.peak,
+            "max_drawdown": self.max_drawdown,
+            "n_returns": self.n_returns,
+            "mean_return": self.mean_return,
+            "m2_return": self.m2_return,
+            "trades": [
+                {**t, "EntryDate": stamp(t["EntryDate"]), "ExitDate": stamp(t["ExitDate"])}
+                for t in self.trades
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        def stamp(value):
+            return None if value is None else pd.Timestamp(value)
+
+        state = cls(**data["params"])
+        for key in ("in_position", "entry_price", "equity", "peak", "max_drawdown",
+                    "n_returns", "mean_return", "m2_return"):
+            setattr(state, key, data[key])
+        state.entry_date = stamp(data["entry_date"])
+        state.last_date = stamp(data["last_date"])
+        state.prev = tuple(data["prev"]) if data["prev"] is not None else None
+        state.trades = [
+            {**t, "EntryDate": stamp(t["EntryDate"]), "ExitDate": stamp(t["ExitDate"])}
+            for t in data["trades"]
+        ]
+        return state
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+def resume_backtest(df, state_path, **params):
+    """
+    Advances the saved state at state_path with the bars of df it has not seen
+    (starting fresh if there is no state or its parameters changed), saves it
+    and returns (metrics, trades) like backtest_strategy().
+    """
+    state = None
+    if os.path.exists(state_path):
+        state = BacktestState.load(state_path)
+        if state.params() != BacktestState(**params).params():
+            state = None
+    if state is None:
+        state = BacktestState(**params)
+
+    state.update_many(df)
+    state.save(state_path)
+    return state.metrics(), state.trades
+
+
 if __name__ == "__main__":
 
 
 # Load processed file
-    df = pd.read_csv("data/processed/HDFCBANK.NS.csv")
+    df = read_prices("data/processed", "HDFCBANK.NS")
 
     # Run backtest for 3 months
-    df["Date"] = pd.to_datetime(df["Date"])
-    df_recent = df[df["Date"] >= (df["Date"].max() - pd.DateOffset(months=3))]
+    df_recent = recent_window(df, months=3)
 
     metrics, trades = backtest_strategy(df_recent, cost_bps=15, exit_mode="opposite")
 
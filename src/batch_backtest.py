@@ -0,0 +1,232 @@
+# Batched backtests: evaluate a whole grid of MA / exit configurations for one
+# symbol in a single call. Every configuration is a column of 2-D
+# (bars x configs) signal and position matrices, so the bar loop runs once per
+# symbol instead of once per configuration.
+
+import itertools
+import numpy as np
+import pandas as pd
+
+from backtest import NS_PER_DAY
+from moving_averages import MABank, crossover_matrix
+
+GRID_COLUMNS = ["ma_type", "fast", "slow", "stop_loss", "take_profit", "hold_days", "cost_bps"]
+METRIC_COLUMNS = ["Total Return", "Max Drawdown", "Sharpe Ratio", "Win Rate", "Trades"]
+
+# ---------- Parameter Grid ----------
+def param_grid(
+    ma_types=("EMA",),
+    ma_pairs=((10, 20),),
+    stop_loss=(0.03,),
+    take_profit=(0.05,),
+    hold_days=(7,),
+    cost_bps=(15,)
+):
+    """Cartesian product of the levers as a DataFrame with GRID_COLUMNS."""
+    rows = [
+        (ma_type.upper(), fast, slow, sl, tp, hd, cost)
+        for ma_type, (fast, slow), sl, tp, hd, cost in itertools.product(
+            ma_types, ma_pairs, stop_loss, take_profit, hold_days, cost_bps
+        )
+    ]
+    return pd.DataFrame(rows, columns=GRID_COLUMNS)
+
+# ---------- Moving Average Matrices ----------
+def crossover_matrices(close, ma_types, fast, slow, binary_signal=False, use_ema=None):
+    """
+    Builds (bars x configs) MA_Slow and Crossover matrices.
+    Each distinct (ma_type, window) is computed once, in one MA bank per type,
+    and shared by every configuration that uses it. binary_signal=True mirrors
+    the optimizers' np.where(fast > slow, 1, -1) convention; otherwise ties /
+    warm-up are 0.
+    ma_type "ADAPTIVE" switches per bar between the EMA and SMA banks: use_ema
+    is a boolean array (one flag per bar) choosing EMA where True.
+    """
+    ma_types = [t.upper() for t in ma_types]
+    fast = np.asarray(fast, dtype=int)
+    slow = np.asarray(slow, dtype=int)
+
+    needed = {}
+    for ma_type, f, s in zip(ma_types, fast, slow):
+        for bank_type in (("EMA", "SMA") if ma_type == "ADAPTIVE" else (ma_type,)):
+            needed.setdefault(bank_type, set()).update((f, s))
+    if "ADAPTIVE" in ma_types and use_ema is None:
+        raise ValueError("ADAPTIVE configurations need a per-bar use_ema mask")
+
+    # One MA bank per type holds every window the grid needs
+    banks = {t: MABank(close, windows, t) for t, windows in needed.items()}
+
+    def column(ma_type, window):
+        if ma_type == "ADAPTIVE":
+            return np.where(use_ema, banks["EMA"][window], banks["SMA"][window])
+        return banks[ma_type][window]
+
+    ma_fast = np.column_stack([column(t, w) for t, w in zip(ma_types, fast)])
+    ma_slow = np.column_stack([column(t, w) for t, w in zip(ma_types, slow)])
+    return ma_slow, crossover_matrix(ma_fast, ma_slow, binary=binary_signal)
+
+# ---------- Vectorized Simulation ----------
+def simulate_batch(
+    dates,
+    open_,
+    high,
+    low,
+    close,
+    crossover,
+    ma_slow,
+    cost_bps=15,
+    exit_mode="time",
+    hold_days=7,
+    stop_loss=None,
+    take_profit=None,
+    valid=None
+):
+    """
+    Runs backtest_arrays() semantics for K configurations at once.
+    crossover / ma_slow are (bars x K); prices and dates may be (bars,) or
+    (bars x K); cost_bps / hold_days / stop_loss / take_profit are scalars or
+    length-K. valid (bars x K) marks real bars when columns are padded with
+    leading NaN rows (panel mode); padding never trades or enters the metrics.
+    Returns a dict of length-K metric arrays keyed like the metrics dict.
+    """
+    crossover = np.asarray(crossover, dtype=float)
+    ma_slow = np.asarray(ma_slow, dtype=float)
+    n, k = crossover.shape
+
+    def as_matrix(values):
+        values = np.asarray(values, dtype=float)
+        return values[:, None] if values.ndim == 1 else values
+
+    def as_vector(values, dtype=float):
+        values = np.asarray(0 if values is None else values, dtype=float)
+        values = np.nan_to_num(values, nan=0.0)
+        return np.broadcast_to(values, (k,)).astype(dtype)
+
+    open_, high, low, close = (as_matrix(v) for v in (open_, high, low, close))
+    if np.ndim(dates) == 2:
+        stamps = np.asarray(dates, dtype="datetime64[ns]").view(np.int64)
+    else:
+        stamps = pd.DatetimeIndex(dates).as_unit("ns").asi8[:, None]
+    cost = 2 * (as_vector(cost_bps) / 10000)  # entry + exit
+    hold_days = as_vector(hold_days, dtype=np.int64)
+    stop_loss = as_vector(stop_loss)
+    take_profit = as_vector(take_profit)
+
+    in_position = np.zeros(k, dtype=bool)
+    entry_price = np.zeros(k)
+    entry_stamp = np.zeros(k, dtype=np.int64)
+    n_trades = np.zeros(k, dtype=np.int64)
+    n_wins = np.zeros(k, dtype=np.int64)
+    growth = np.ones(k)
+    entry_bar = np.zeros((n, k), dtype=bool)
+
+    for i in range(1, n):
+        prev_cross = crossover[i - 1]
+        prev_close = close[i - 1]
+
+        # ENTRY: bullish crossover yesterday, confirmed by Close above the slow MA
+        enter = ~in_position & (prev_cross == 2) & (prev_close > ma_slow[i - 1])
+
+        # EXIT: any trigger fires on the next open (exit price is the same)
+        if exit_mode == "opposite":
+            trigger = prev_cross == -2
+        elif exit_mode == "time":
+            trigger = (stamps[i] - entry_stamp) // NS_PER_DAY >= hold_days
+        else:
+            trigger = np.zeros(k, dtype=bool)
+        trigger = trigger | ((stop_loss != 0) & (low[i] <= entry_price * (1 - stop_loss)))
+        trigger = trigger | ((take_profit != 0) & (high[i] >= entry_price * (1 + take_profit)))
+        leave = in_position & trigger
+
+        if leave.any():
+            net_return = (open_[i] / np.where(leave, entry_price, 1.0)) - 1 - cost
+            growth = np.where(leave, growth * (1 + net_return), growth)
+            n_trades += leave
+            n_wins += leave & (net_return > 0)
+            in_position = in_position & ~leave
+
+        if enter.any():
+            entry_price = np.where(enter, open_[i], entry_price)
+            entry_stamp = np.where(enter, stamps[i], entry_stamp)
+            in_position = in_position | enter
+            entry_bar[i] = enter
+
+    # ---------- Metrics ----------
+    returns = np.zeros(close.shape)
+    returns[1:] = close[1:] / close[:-1] - 1
+    returns[np.isnan(returns)] = 0
+    # Entry bars add no point to the equity curve, so they contribute growth 1.0
+    # there and are left out of the Sharpe sample. So do padding rows and the
+    # first real bar of each column (the curve's starting 1.0).
+    valid = np.ones((n, k), dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+    first_bar = valid.copy()
+    first_bar[1:] &= ~valid[:-1]
+    step = np.where(entry_bar | ~valid | first_bar, 1.0, 1 + returns)
+    equity = np.cumprod(step, axis=0)
+    drawdown = ((equity / np.maximum.accumulate(equity, axis=0)) - 1).min(axis=0)
+
+    daily = np.zeros((n, k))
+    daily[1:] = equity[1:] / equity[:-1] - 1
+    sample = valid & ~entry_bar
+    count = sample.sum(axis=0)
+    mean = np.where(sample, daily, 0).sum(axis=0) / np.maximum(count, 1)
+    var = np.where(sample, (daily - mean) ** 2, 0).sum(axis=0) / np.maximum(count - 1, 1)
+    std = np.sqrt(var)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = np.where((count > 1) & (std > 0), (mean / std) * np.sqrt(252), 0.0)
+
+    win_rate = np.where(n_trades > 0, n_wins / np.maximum(n_trades, 1), 0.0)
+
+    return {
+        "Total Return": np.round((growth - 1) * 100, 2),
+        "Max Drawdown": np.round(drawdown * 100, 2),
+        "Sharpe Ratio": np.round(sharpe, 2),
+        "Win Rate": np.array([round(rate, 2) for rate in (win_rate * 100).tolist()]),
+        "Trades": n_trades,
+    }
+
+# ---------- Batch API ----------
+def backtest_batch(df, grid, exit_mode="time", binary_signal=False, use_ema=None):
+    """
+    Evaluates every configuration in `grid` on one symbol's price frame.
+    grid: DataFrame (or list of dicts) with GRID_COLUMNS; see param_grid().
+    use_ema: per-bar EMA flags (aligned with df) for "ADAPTIVE" rows.
+    Returns the grid with one metrics row per configuration.
+    """
+    grid = pd.DataFrame(grid).reset_index(drop=True)
+    missing = [c for c in GRID_COLUMNS if c not in grid.columns]
+    if missing:
+        raise ValueError(f"grid is missing columns: {missing}")
+
+    if use_ema is not None:
+        df = df.assign(_use_ema=np.asarray(use_ema, dtype=bool))
+    df = df.sort_values("Date")
+    close = df["Close"].to_numpy(dtype=float)
+    ma_slow, crossover = crossover_matrices(
+        close,
+        grid["ma_type"].str.upper().tolist(),
+        grid["fast"].tolist(),
+        grid["slow"].tolist(),
+        binary_signal=binary_signal,
+        use_ema=None if use_ema is None else df["_use_ema"].to_numpy()
+    )
+
+    metrics = simulate_batch(
+        pd.to_datetime(df["Date"]),
+        df["Open"].to_numpy(dtype=float),
+        df["High"].to_numpy(dtype=float),
+        df["Low"].to_numpy(dtype=float),
+        close,
+        crossover,
+        ma_slow,
+        cost_bps=grid["cost_bps"].to_numpy(dtype=float),
+        exit_mode=exit_mode,
+        hold_days=grid["hold_days"].to_numpy(dtype=float),
+        stop_loss=grid["stop_loss"].to_numpy(dtype=float),
+        take_profit=grid["take_profit"].to_numpy(dtype=float)
+    )
+
+    result = grid.copy()
+    for col in METRIC_COLUMNS:
+        result[col] = metrics[col]
+    return result
@@ -0,0 +1,247 @@
+# Timing harness for the hot paths of the pipeline.
+# Run from the project root:  python src/benchmarks.py [backtest] [ma] [bank] [regime] [storage] [panel] [fetch]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+from backtest import backtest_strategy
+from features import add_moving_averages, generate_signals
+from moving_averages import sma, ema, wma, moving_average, crossover_matrix, MABank
+from regime import regime_features
+import storage
+import panel
+
+# ---------- Helpers ----------
+def synthetic_prices(n_bars, seed=0):
+    """Random-walk daily OHLCV frame with business-day dates."""
+    rng = np.random.default_rng(seed)
+    close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.015, n_bars)))
+    open_ = close * (1 + rng.normal(0, 0.004, n_bars))
+    spread = np.abs(rng.normal(0, 0.008, n_bars))
+    return pd.DataFrame({
+        "Date": pd.bdate_range("2005-01-03", periods=n_bars),
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + spread),
+        "Low": np.minimum(open_, close) * (1 - spread),
+        "Close": close,
+        "Volume": rng.integers(10_000, 1_000_000, n_bars),
+    })
+
+def best_time(fn, repeat=5):
+    """Best wall time of `repeat` calls, in seconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# ---------- Backtest Engines ----------
+def bench_backtest():
+    print("Backtest engine: loop (iloc per bar) vs numpy (array kernel)")
+    params = dict(exit_mode="time", hold_days=7, stop_loss=0.03, take_profit=0.05, cost_bps=15)
+
+    for label, n_bars in [("1 year", 252), ("20 years", 252 * 20)]:
+        df = generate_signals(add_moving_averages(synthetic_prices(n_bars), "EMA", 10, 20))
+
+        loop_result = backtest_strategy(df, engine="loop", **params)
+        numpy_result = backtest_strategy(df, engine="numpy", **params)
+        assert loop_result == numpy_result, "engines disagree"
+
+        t_loop = best_time(lambda: backtest_strategy(df, engine="loop", **params),
+                           repeat=1 if n_bars > 1000 else 3)
+        t_numpy = best_time(lambda: backtest_strategy(df, engine="numpy", **params))
+        print(
+            f"  {label:<9} ({n_bars:>5} bars) | loop {t_loop * 1000:9.1f} ms"
+            f" | numpy {t_numpy * 1000:7.2f} ms | {t_loop / t_numpy:7.1f}x"
+        )
+
+# ---------- Moving Average Kernels ----------
+def bench_moving_averages(window=20):
+    print(f"MA kernels (window {window}): pandas vs moving_averages")
+    weights = np.arange(1, window + 1)
+    kernels = [
+        ("SMA", lambda s: s.rolling(window).mean(), sma),
+        ("EMA", lambda s: s.ewm(span=window, adjust=False).mean(), ema),
+        ("WMA", lambda s: s.rolling(window).apply(
+            lambda prices: np.dot(prices, weights) / weights.sum(), raw=True), wma),
+    ]
+
+    for label, n_bars in [("1 year", 252), ("20 years", 252 * 20)]:
+        close = synthetic_prices(n_bars)["Close"]
+        values = close.to_numpy()
+        for name, pandas_fn, kernel in kernels:
+            expected = pandas_fn(close).to_numpy()
+            np.testing.assert_allclose(kernel(values, window), expected, rtol=1e-9)
+
+            t_pandas = best_time(lambda: pandas_fn(close), repeat=3 if name == "WMA" else 20)
+            t_kernel = best_time(lambda: kernel(values, window), repeat=20)
+            print(
+                f"  {name} {label:<9} ({n_bars:>5} bars) | pandas {t_pandas * 1e6:9.1f} us"
+                f" | kernel {t_kernel * 1e6:8.1f} us | {t_pandas / t_kernel:6.1f}x"
+            )
+
+# ---------- MA Bank ----------
+def bench_ma_bank(windows=range(5, 201)):
+    windows = list(windows)
+    pairs = [(f, s) for f in windows for s in windows if f < s]
+    print(f"MA bank: {len(pairs)} (fast, slow) crossovers, per-pair MAs vs one bank")
+
+    def per_pair(close, ma_type):
+        for fast, slow in pairs:
+            crossover_matrix(moving_average(close, ma_type, fast), moving_average(close, ma_type, slow))
+
+    def banked(close, ma_type):
+        MABank(close, windows, ma_type).pairs(pairs)
+
+    close = synthetic_prices(252 * 5)["Close"].to_numpy()
+    for ma_type in ("SMA", "EMA", "WMA"):
+        t_pairs = best_time(lambda: per_pair(close, ma_type), repeat=1)
+        t_bank = best_time(lambda: banked(close, ma_type), repeat=3)
+        print(
+            f"  {ma_type} ({len(close)} bars) | per pair {t_pairs * 1000:8.1f} ms"
+            f" | bank {t_bank * 1000:7.1f} ms | {t_pairs / t_bank:6.1f}x"
+        )
+
+# ---------- Regime Series ----------
+def bench_regime(window=20):
+    print("Regime features at every bar: last-bar pandas helpers per bar vs one rolling pass")
+
+    def per_bar(close):
+        returns = close.pct_change()
+        for i in range(window + 1, len(close) + 1):
+            returns.iloc[:i].rolling(window).std().iloc[-1]
+            abs(close.iloc[i - 1] - close.iloc[i - window]) / close.iloc[i - window]
+            returns.iloc[:i].dropna()[-window:].abs().sum()
+
+    for label, n_bars in [("1 year", 252), ("5 years", 252 * 5)]:
+        close = synthetic_prices(n_bars)["Close"]
+        t_loop = best_time(lambda: per_bar(close), repeat=1)
+        t_rolling = best_time(lambda: regime_features(close, window))
+        print(
+            f"  {label:<9} ({n_bars:>5} bars) | per bar {t_loop * 1000:9.1f} ms"
+            f" | rolling {t_rolling * 1000:7.2f} ms | {t_loop / t_rolling:7.1f}x"
+        )
+
+# ---------- Storage ----------
+def bench_storage(stage="processed"):
+    source = storage.DATA_DIRS[stage]
+    symbols = [s for s in storage.list_symbols(source) if os.path.exists(os.path.join(source, f"{s}.csv"))]
+    print(f"Load {len(symbols)} {stage} files: CSV + to_datetime vs Feather (int64 dates)")
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        for sym in symbols:
+            shutil.copy(os.path.join(source, f"{sym}.csv"), tmp_dir)
+        storage.import_csv(tmp_dir)
+
+        def load_csv():
+            for sym in symbols:
+                df = pd.read_csv(os.path.join(tmp_dir, f"{sym}.csv"))
+                df["Date"] = pd.to_datetime(df["Date"], utc=True).dt.tz_convert("Asia/Kolkata").dt.tz_localize(None)
+
+        def load_feather():
+            for sym in symbols:
+                storage.read_file(os.path.join(tmp_dir, f"{sym}.feather"))
+
+        def size(ext):
+            return sum(os.path.getsize(os.path.join(tmp_dir, f)) for f in os.listdir(tmp_dir) if f.endswith(ext))
+
+        t_csv = best_time(load_csv, repeat=3)
+        t_feather = best_time(load_feather, repeat=3)
+        print(
+            f"  csv {t_csv * 1000:8.1f} ms ({size('.csv') / 1e6:5.1f} MB)"
+            f" | feather {t_feather * 1000:8.1f} ms ({size('.feather') / 1e6:5.1f} MB)"
+            f" | {t_csv / t_feather:5.1f}x"
+        )
+    finally:
+        shutil.rmtree(tmp_dir)
+
+# ---------- Panel ----------
+def bench_panel(stage="raw"):
+    source = storage.DATA_DIRS[stage]
+    symbols = storage.list_symbols(source)
+    print(f"Load {len(symbols)} {stage} symbols: per-symbol files vs memory-mapped panel")
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        panel_dir = os.path.join(tmp_dir, "panel")
+        panel.build_panel(source, panel_dir)
+
+        def load_files():
+            for sym in symbols:
+                storage.read_prices(source, sym)
+
+        def load_panel():
+            mapped = panel.open_panel(panel_dir)
+            for sym in symbols:
+                mapped.symbol_frame(sym)
+
+        t_files = best_time(load_files, repeat=3)
+        t_panel = best_time(load_panel, repeat=3)
+        print(
+            f"  files {t_files * 1000:8.1f} ms | panel {t_panel * 1000:8.1f} ms"
+            f" | {t_files / t_panel:5.1f}x"
+        )
+    finally:
+        shutil.rmtree(tmp_dir)
+
+# ---------- Fetch ----------
+def bench_fetch(n_symbols=200, latency=0.15, concurrency=(1, 4, 16, 32)):
+    """Incremental-free full fetch against the local replay server."""
+    import asyncio
+    import threading
+    import fetch_async
+    import mock_upstox
+
+    port = 8799
+    base_url = f"http://127.0.0.1:{port}/v2"
+    symbol_map = {f"SYM{i}.NS": f"NSE_EQ|MOCK{i:05d}" for i in range(n_symbols)}
+    print(f"Fetch {n_symbols} symbols from the replay server ({latency * 1000:.0f} ms latency, 25 req/s limit)")
+
+    loop = asyncio.new_event_loop()
+    app = mock_upstox.make_app(fixtures_dir=None, latency=latency, rate_limit=25)
+    runner = loop.run_until_complete(mock_upstox.start_server(app, port))
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    try:
+        for workers in concurrency:
+            tmp_dir = tempfile.mkdtemp()
+            try:
+                start = time.perf_counter()
+                outcomes = fetch_async.fetch_all(
+                    symbol_map, {}, verbose=False, data_dir=tmp_dir, base_url=base_url, concurrency=workers
+                )
+                elapsed = time.perf_counter() - start
+            finally:
+                shutil.rmtree(tmp_dir)
+            errors = sum(o["status"] == "error" for o in outcomes)
+            retries = sum(max(o["attempts"] - 1, 0) for o in outcomes)
+            print(
+                f"  concurrency {workers:>3} | {elapsed:6.1f} s | {n_symbols / elapsed:6.1f} symbols/s"
+                f" | {retries:>4} retries | {errors} errors"
+            )
+    finally:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+BENCHMARKS = {
+    "backtest": bench_backtest,
+    "ma": bench_moving_averages,
+    "bank": bench_ma_bank,
+    "regime": bench_regime,
+    "storage": bench_storage,
+    "panel": bench_panel,
+    "fetch": bench_fetch,
+}
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
+        print()
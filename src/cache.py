@@ -0,0 +1,175 @@
+# Memo cache for derived arrays (MA columns, regime series). Entries are keyed
+# by a hash of the input data plus the parameters, so a symbol's EMA-20 is
+# computed once per data version however many optimizers ask for it, and a
+# changed file can never be served a stale value. An LRU tier in memory is
+# bounded in bytes; an optional on-disk tier (FEATURE_CACHE_DIR) survives
+# restarts and is bounded the same way.
+#
+#   FEATURE_CACHE_MB=256  FEATURE_CACHE_DIR=data/cache  FEATURE_CACHE_DISK_MB=2048
+
+import os
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+CACHE_MB = float(os.getenv("FEATURE_CACHE_MB", 256))
+CACHE_DIR = os.getenv("FEATURE_CACHE_DIR") or None
+DISK_CACHE_MB = float(os.getenv("FEATURE_CACHE_DISK_MB", 2048))
+
+# ---------- Keys ----------
+def data_hash(values):
+    """Content hash of an array (values, dtype and shape)."""
+    values = np.ascontiguousarray(values)
+    digest = hashlib.blake2b(values.view(np.uint8).reshape(-1), digest_size=16)
+    digest.update(f"{values.dtype.str}{values.shape}".encode())
+    return digest.hexdigest()
+
+def _key_name(key):
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+# ---------- Cache ----------
+class ArrayCache:
+    """
+    LRU cache of read-only NumPy arrays, bounded by max_bytes (0 disables it).
+    With disk_dir, evicted and new entries are also kept as .npy files there,
+    oldest removed first once max_disk_bytes is exceeded. stats counts hits,
+    misses, disk hits and evictions.
+    """
+
+    def __init__(self, max_bytes=CACHE_MB * 2**20, disk_dir=CACHE_DIR, max_disk_bytes=DISK_CACHE_MB * 2**20):
+        self.max_bytes = int(max_bytes)
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = int(max_disk_bytes)
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.disk_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "disk_hits": 0, "evictions": 0, "disk_evictions": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_bytes = sum(e.stat().st_size for e in os.scandir(disk_dir) if e.name.endswith(".npy"))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries or (self.disk_dir is not None and os.path.exists(self._disk_path(key)))
+
+    # ---------- Memory Tier ----------
+    def get(self, key):
+        """The cached array or None (counted as a hit or a miss)."""
+        value = self.entries.get(key)
+        if value is not None:
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+        value = self._disk_get(key)
+        if value is not None:
+            self.stats["disk_hits"] += 1
+            self._remember(key, value)
+            return value
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        """Stores value (made read-only, not copied) and returns it."""
+        value = np.asarray(value)
+        value.flags.writeable = False
+        self._remember(key, value)
+        self._disk_put(key, value)
+        return value
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        return value if value is not None else self.put(key, compute())
+
+    def _remember(self, key, value):
+        if value.nbytes > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old.nbytes
+        self.entries[key] = value
+        self.nbytes += value.nbytes
+        while self.nbytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.stats["evictions"] += 1
+
+    # ---------- Disk Tier ----------
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, _key_name(key) + ".npy")
+
+    def _disk_get(self, key):
+        if self.disk_dir is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            value = np.load(path)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        os.utime(path)  # recently used: evicted last
+        value.flags.writeable = False
+        return value
+
+    def _disk_put(self, key, value):
+        if self.disk_dir is None or value.nbytes > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, value)
+        os.replace(tmp_path, path)
+        self.disk_bytes += os.path.getsize(path)
+        if self.disk_bytes > self.max_disk_bytes:
+            self._disk_evict()
+
+    def _disk_evict(self):
+        files = sorted(
+            (e for e in os.scandir(self.disk_dir) if e.name.endswith(".npy")),
+            key=lambda e: e.stat().st_mtime,
+        )
+        self.disk_bytes = sum(e.stat().st_size for e in files)
+        for entry in files:
+            if self.disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self.disk_bytes -= size
+            self.stats["disk_evictions"] += 1
+
+    # ---------- Stats ----------
+    def clear(self, disk=False):
+        self.entries.clear()
+        self.nbytes = 0
+        if disk and self.disk_dir:
+            for entry in os.scandir(self.disk_dir):
+                if entry.name.endswith(".npy"):
+                    os.remove(entry.path)
+            self.disk_bytes = 0
+
+    def info(self):
+        lookups = self.stats["hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round((lookups - self.stats["misses"]) / lookups, 4) if lookups else 0.0,
+            "entries": len(self.entries),
+            "mb": round(self.nbytes / 2**20, 2),
+            "disk_mb": round(self.disk_bytes / 2**20, 2),
+        }
+
+# The process-wide cache the feature kernels use
+FEATURE_CACHE = ArrayCache()
+
+def cached(kind, values, params, compute, cache=None):
+    """compute() memoised under (data hash of values, kind, params)."""
+    cache = FEATURE_CACHE if cache is None else cache
+    return cache.get_or_compute((data_hash(values), kind, params), compute)
+
+def cache_info():
+    """Hit / miss counters and size of this process's feature cache."""
+    return FEATURE_CACHE.info()
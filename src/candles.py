@@ -0,0 +1,134 @@
+# Incremental ingestion for the Upstox historical-candle endpoint.
+# A manifest (data/raw/manifest.json) records the last stored session per
+# symbol, so a refresh asks only for the days since then and merges them into
+# the stored file instead of re-downloading a year per symbol. An entry is only
+# trusted while the file is the one it describes (same size and mtime); a file
+# deleted or rewritten by another fetcher is read (or fully re-fetched) instead.
+
+import os
+import json
+from datetime import datetime, timedelta
+import pandas as pd
+
+from storage import find_file, normalize_dates, read_prices, write_prices
+
+# ---------- PATH SETUP ----------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+
+DATA_DIR = os.path.join(PROJECT_ROOT, "data", "raw")
+
+UPSTOX_URL = "https://api.upstox.com/v2"
+# Point the fetchers at a local replay server: UPSTOX_BASE_URL=http://127.0.0.1:8765/v2
+BASE_URL = os.getenv("UPSTOX_BASE_URL", UPSTOX_URL).rstrip("/")
+
+CANDLE_COLUMNS = ["Date", "Open", "High", "Low", "Close", "Volume", "OI"]
+
+# ---------- Manifest ----------
+def manifest_path(data_dir=DATA_DIR):
+    return os.path.join(data_dir, "manifest.json")
+
+def load_manifest(data_dir=DATA_DIR):
+    """{symbol: {"last_date": "YYYY-MM-DD", "rows": n, "size": bytes, "mtime": ns}}; empty if none yet."""
+    path = manifest_path(data_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(manifest, data_dir=DATA_DIR):
+    os.makedirs(data_dir, exist_ok=True)
+    path = manifest_path(data_dir)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def file_state(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+def last_stored_date(symbol, manifest, data_dir=DATA_DIR):
+    """
+    Last session on disk for symbol: from the manifest entry while it matches
+    the file, else from the file itself; None when there is no file.
+    """
+    path = find_file(data_dir, symbol)
+    if path is None:
+        return None
+    entry = manifest.get(symbol)
+    if entry is not None and {k: entry.get(k) for k in ("size", "mtime")} == file_state(path):
+        return pd.Timestamp(entry["last_date"])
+    try:
+        dates = read_prices(data_dir, symbol, columns=["Date"])["Date"]
+    except FileNotFoundError:
+        return None
+    return dates.max() if len(dates) else None
+
+# ---------- Requests ----------
+def upstox_headers(base_url=BASE_URL):
+    """
+    Request headers with the bearer token from UPSTOX_ACCESS_TOKEN. The token
+    is only required against the real API, not a local replay server.
+    """
+    headers = {"Accept": "application/json"}
+    token = os.getenv("UPSTOX_ACCESS_TOKEN")
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    elif base_url == UPSTOX_URL:
+        raise RuntimeError("UPSTOX_ACCESS_TOKEN missing in .env")
+    return headers
+
+def fetch_window(last_date, days=365, today=None):
+    """
+    (from_date, to_date) to request, or None if nothing can be missing.
+    Restarts at the last stored session so a bar saved mid-day is refreshed.
+    """
+    to_date = (today or datetime.today()).date() + timedelta(days=1)
+    if last_date is None:
+        return to_date - timedelta(days=days), to_date
+    from_date = pd.Timestamp(last_date).date()
+    if from_date >= to_date:
+        return None
+    return from_date, to_date
+
+def candle_url(instrument_key, from_date, to_date, base_url=BASE_URL):
+    return f"{base_url}/historical-candle/{instrument_key}/day/{to_date}/{from_date}"
+
+def candles_frame(candles):
+    """Non-empty Upstox candle rows -> OHLCV frame with session dates, sorted."""
+    df = pd.DataFrame(candles, columns=CANDLE_COLUMNS[:len(candles[0])])
+    df = df.drop(columns=["OI"], errors="ignore")
+    # Session dates once, here; every reader uses them as stored
+    df["Date"] = normalize_dates(df["Date"]).to_numpy()
+    return df.sort_values("Date").reset_index(drop=True)
+
+# ---------- Merge ----------
+def merge_candles(stored, new):
+    """New bars over stored ones; an overlapping session keeps the newer bar."""
+    if stored is None or stored.empty:
+        return new.reset_index(drop=True)
+    merged = pd.concat([stored, new], ignore_index=True)
+    merged = merged.drop_duplicates("Date", keep="last")
+    return merged.sort_values("Date").reset_index(drop=True)
+
+def store_candles(symbol, new, manifest, data_dir=DATA_DIR, full=False):
+    """
+    Merges new bars into the symbol's file (replaces it when full=True),
+    updates the manifest entry and returns the number of rows added.
+    """
+    stored = None
+    if not full:
+        try:
+            stored = read_prices(data_dir, symbol)
+        except FileNotFoundError:
+            pass
+    before = 0 if stored is None else len(stored)
+    merged = merge_candles(stored, new)
+    path = write_prices(merged, data_dir, symbol)
+    manifest[symbol] = {
+        "last_date": merged["Date"].max().strftime("%Y-%m-%d"),
+        "rows": len(merged),
+        **file_state(path),
+    }
+    return len(merged) - before
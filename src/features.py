@@ -3,6 +3,8 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
+import json
 
 # ---------- PATH SETUP ----------
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))   # .../src
@@ -10,78 +12,214 @@ PROJECT_ROOT = os.path.dirname(SRC_DIR)                # project root
 
 RAW_DATA_DIR = os.path.join(PROJECT_ROOT, "data", "raw")
 PROCESSED_DATA_DIR = os.path.join(PROJECT_ROOT, "data", "processed")
+STATE_DIR = os.path.join(PROCESSED_DATA_DIR, "state")
 
-# ---------- Moving Averages ----------
-def compute_sma(df, column="Close", window=20):
-    return df[column].rolling(window=window).mean()
-
-def compute_ema(df, column="Close", span=20):
-    return df[column].ewm(span=span, adjust=False).mean()
-
-def compute_wma(df, column="Close", window=20):
-    weights = np.arange(1, window + 1)
-    return (
-        df[column]
-        .rolling(window)
-        .apply(lambda prices: np.dot(prices, weights) / weights.sum(), raw=True)
-    )
-
-# ---------- Feature Builder ----------
-def add_moving_averages(df, ma_type="SMA", fast=10, slow=20):
-    df = df.copy()
-    if ma_type.upper() == "SMA":
-        df["MA_Fast"] = compute_sma(df, "Close", fast)
-        df["MA_Slow"] = compute_sma(df, "Close", slow)
-    elif ma_type.upper() == "EMA":
-        df["MA_Fast"] = compute_ema(df, "Close", fast)
-        df["MA_Slow"] = compute_ema(df, "Close", slow)
-    elif ma_type.upper() == "WMA":
-        df["MA_Fast"] = compute_wma(df, "Close", fast)
-        df["MA_Slow"] = compute_wma(df, "Close", slow)
-    else:
-        raise ValueError("ma_type must be SMA, EMA, or WMA")
-    return df
+# MA settings of the processed files
+MA_TYPE = "EMA"    # SMA | EMA | WMA
+FAST = 10
+SLOW = 20
 
-# ---------- Signal Detection ----------
-def generate_signals(df):
-    df = df.copy()
-    df["Signal"] = 0
-    df.loc[df["MA_Fast"] > df["MA_Slow"], "Signal"] = 1
-    df.loc[df["MA_Fast"] < df["MA_Slow"], "Signal"] = -1
-    df["Crossover"] = df["Signal"].diff()
-    return df
+# ---------- Moving Averages / Signals ----------
+# Kernels live in moving_averages.py; re-exported here for existing callers.
+from moving_averages import (
+    compute_sma,
+    compute_ema,
+    compute_wma,
+    add_moving_averages,
+    generate_signals,
+    make_updater,
+    updater_from_dict,
+)
+from cache import data_hash
+from storage import read_file, write_file, append_file, find_file, list_symbols, symbol_path
+from incremental import StageManifest, report_plan, run_flags
 
 # ---------- Master Function ----------
-def process_file(filepath, ma_type="SMA", fast=10, slow=20):
-    df = pd.read_csv(filepath)
-    # Ensure Date is parsed as UTC first if it has offset, then convert to IST
-    df["Date"] = pd.to_datetime(df["Date"], utc=True).dt.tz_convert("Asia/Kolkata").dt.tz_localize(None)
-    df = df.sort_values("Date")
+def read_raw(filepath):
+    # Storage normalizes Date to naive IST (offset strings included)
+    return read_file(filepath).sort_values("Date")
 
+def process_file(filepath, ma_type="SMA", fast=10, slow=20):
+    df = read_raw(filepath)
     df = add_moving_averages(df, ma_type, fast, slow)
     df = generate_signals(df)
     return df
 
+# ---------- Incremental State ----------
+class FeatureState:
+    """
+    MA_Fast / MA_Slow updaters and the last Signal of one processed file, so
+    new candles extend MA_Fast, MA_Slow, Signal and Crossover in O(1) per bar
+    instead of recomputing the whole history. closes_hash fingerprints the
+    Closes consumed so far, so a revised bar (the fetcher re-downloads the
+    last stored session) is noticed.
+    """
+
+    def __init__(self, ma_type="SMA", fast=10, slow=20):
+        self.ma_type = ma_type.upper()
+        self.fast = fast
+        self.slow = slow
+        self.fast_ma = make_updater(self.ma_type, fast)
+        self.slow_ma = make_updater(self.ma_type, slow)
+        self.signal = None
+        self.last_date = None
+        self.bars = 0
+        self.closes_hash = None
+
+    @classmethod
+    def from_frame(cls, df, ma_type="SMA", fast=10, slow=20):
+        """State after replaying every Close of df (sorted by Date)."""
+        state = cls(ma_type, fast, slow)
+        for date, close in zip(df["Date"], df["Close"].to_numpy(dtype=float)):
+            state.update(date, close)
+        state.closes_hash = state.consumed_hash(df)
+        return state
+
+    def matches(self, ma_type, fast, slow):
+        return (self.ma_type, self.fast, self.slow) == (ma_type.upper(), fast, slow)
+
+    def consumed_hash(self, df):
+        """Hash of the Closes of df (sorted by Date) up to last_date."""
+        if self.last_date is None:
+            return None
+        return data_hash(df.loc[df["Date"] <= self.last_date, "Close"].to_numpy(dtype=float))
+
+    def update(self, date, close):
+        """Feeds one bar; returns its MA_Fast, MA_Slow, Signal and Crossover."""
+        ma_fast = self.fast_ma.update(close)
+        ma_slow = self.slow_ma.update(close)
+        signal = 1 if ma_fast > ma_slow else (-1 if ma_fast < ma_slow else 0)
+        crossover = np.nan if self.signal is None else float(signal - self.signal)
+        self.signal = signal
+        self.last_date = pd.Timestamp(date)
+        self.bars += 1
+        return ma_fast, ma_slow, signal, crossover
+
+    def to_dict(self):
+        return {
+            "params": {"ma_type": self.ma_type, "fast": self.fast, "slow": self.slow},
+            "fast_ma": self.fast_ma.to_dict(),
+            "slow_ma": self.slow_ma.to_dict(),
+            "signal": self.signal,
+            "last_date": None if self.last_date is None else self.last_date.isoformat(),
+            "bars": self.bars,
+            "closes_hash": self.closes_hash,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls(**data["params"])
+        state.fast_ma = updater_from_dict(data["fast_ma"])
+        state.slow_ma = updater_from_dict(data["slow_ma"])
+        state.signal = data["signal"]
+        state.last_date = None if data["last_date"] is None else pd.Timestamp(data["last_date"])
+        state.bars = data["bars"]
+        state.closes_hash = data.get("closes_hash")
+        return state
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+def write_features(df, out_path, state_path, ma_type="SMA", fast=10, slow=20):
+    """
+    Writes a fully processed frame and the updater state for it, so a later
+    update_file() appends to exactly these bars.
+    """
+    write_file(df, out_path)
+    FeatureState.from_frame(df, ma_type, fast, slow).save(state_path)
+
+def update_file(filepath, out_path, state_path, ma_type="SMA", fast=10, slow=20):
+    """
+    Appends the raw bars newer than the saved state to out_path, advancing the
+    MA updaters bar by bar. Falls back to a full process_file() rebuild when
+    there is no usable state (missing, other MA parameters, or any Close up to
+    the last processed bar added, removed or revised). Returns the number of
+    bars written.
+    """
+    df = read_raw(filepath)
+
+    state = None
+    if os.path.exists(state_path) and os.path.exists(out_path):
+        state = FeatureState.load(state_path)
+        seen = int((df["Date"] <= state.last_date).sum()) if state.last_date is not None else 0
+        if (not state.matches(ma_type, fast, slow) or seen != state.bars
+                or state.closes_hash != state.consumed_hash(df)):
+            state = None
+
+    if state is None:
+        df = add_moving_averages(df, ma_type, fast, slow)
+        df = generate_signals(df)
+        write_features(df, out_path, state_path, ma_type, fast, slow)
+        return len(df)
+
+    new = df[df["Date"] > state.last_date].copy()
+    if len(new):
+        rows = [state.update(d, c) for d, c in zip(new["Date"], new["Close"].to_numpy(dtype=float))]
+        for col, values in zip(("MA_Fast", "MA_Slow", "Signal", "Crossover"), zip(*rows)):
+            new[col] = values
+        append_file(new, out_path)
+        state.closes_hash = state.consumed_hash(df)
+        state.save(state_path)
+    return len(new)
+
 # ---------- Batch Processor ----------
+def feature_params(ma_type=MA_TYPE, fast=FAST, slow=SLOW, out_dir=PROCESSED_DATA_DIR):
+    """The stage parameters the pipeline manifest records for processed files."""
+    return {"ma_type": ma_type.upper(), "fast": fast, "slow": slow, "out_dir": os.path.abspath(out_dir)}
+
 def process_all(data_dir=RAW_DATA_DIR,
                 out_dir=PROCESSED_DATA_DIR,
-                ma_type="SMA", fast=10, slow=20):
-
+                ma_type="SMA", fast=10, slow=20,
+                incremental=False, state_dir=STATE_DIR,
+                force=False, dry_run=False):
+    """
+    Processes the symbols whose raw file, MA parameters or output changed
+    since the last run (every symbol with force); dry_run only lists them.
+    """
     os.makedirs(out_dir, exist_ok=True)
 
-    for file in os.listdir(data_dir):
-        if file.endswith(".csv"):
-            path = os.path.join(data_dir, file)
+    manifest = StageManifest("features")
+    params = feature_params(ma_type, fast, slow, out_dir)
+    symbols = list_symbols(data_dir)
+    plan = manifest.plan(symbols, lambda sym: [find_file(data_dir, sym)], params, force)
+    report_plan("features", plan, len(symbols), dry_run)
+    if dry_run:
+        return plan
+
+    try:
+        for symbol in plan:
+            path = find_file(data_dir, symbol)
+            out_path = symbol_path(out_dir, symbol)
+            state_path = os.path.join(state_dir, f"{symbol}.json")
+            if incremental:
+                added = update_file(path, out_path, state_path, ma_type, fast, slow)
+                print(f"OK Updated {symbol} -> {out_path} (+{added} bars)")
+                manifest.record(symbol, [path], params, [out_path, state_path])
+                continue
             df = process_file(path, ma_type, fast, slow)
-            out_path = os.path.join(out_dir, file)
-            df.to_csv(out_path, index=False)
-            print(f"OK Processed {file} -> {out_path}")
+            write_features(df, out_path, state_path, ma_type, fast, slow)
+            print(f"OK Processed {symbol} -> {out_path}")
+            manifest.record(symbol, [path], params, [out_path, state_path])
+    finally:
+        manifest.save()
+    return plan
 
 # ---------- RUN ----------
 if __name__ == "__main__":
-    ma_type = "EMA"    # SMA | EMA | WMA
-    fast = 10
-    slow = 20
+    ma_type, fast, slow = MA_TYPE, FAST, SLOW
+    incremental = "--full" not in sys.argv   # append only new candles when state exists
+    force, dry_run = run_flags()             # --force: every symbol; --dry-run: list stale ones
 
-    process_all(ma_type=ma_type, fast=fast, slow=slow)
-    print("Feature extraction complete! Files saved in data/processed/")
+    process_all(ma_type=ma_type, fast=fast, slow=slow, incremental=incremental,
+                force=force or "--full" in sys.argv, dry_run=dry_run)
+    if not dry_run:
+        print("Feature extraction complete! Files saved in data/processed/")
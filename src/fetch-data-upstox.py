@@ -1,46 +1,38 @@
 import os
-import json
+import sys
 import requests
-import pandas as pd
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
 
-# Load API token
+# Load API token (and UPSTOX_BASE_URL, if set) before candles reads them
 load_dotenv()
-ACCESS_TOKEN = os.getenv("UPSTOX_ACCESS_TOKEN")
 
-if not ACCESS_TOKEN:
-    raise RuntimeError("UPSTOX_ACCESS_TOKEN missing in .env")
-
-HEADERS = {
-    "Authorization": f"Bearer {ACCESS_TOKEN}",
-    "Accept": "application/json"
-}
-
-# Paths
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data", "raw")
+from candles import (
+    DATA_DIR, BASE_URL, load_manifest, save_manifest, last_stored_date,
+    fetch_window, candle_url, candles_frame, store_candles, upstox_headers,
+)
+from fetch_async import fetch_all
+from universe import instrument_map, select_from_argv
 
 os.makedirs(DATA_DIR, exist_ok=True)
 
-# Load symbol map
-with open(os.path.join(BASE_DIR, "upstox_symbol_map.json")) as f:
-    SYMBOL_MAP = json.load(f)
-
-def fetch_history(symbol, instrument_key, days=365):
-    os.makedirs(DATA_DIR, exist_ok=True)
-
-    to_date = (datetime.today() + timedelta(days=1)).date()
-    from_date = to_date - timedelta(days=days)
+def fetch_history(symbol, instrument_key, days=365, manifest=None, full=False,
+                  data_dir=DATA_DIR, base_url=BASE_URL):
+    """
+    Fetches the sessions missing since the last stored bar (the last `days`
+    when the symbol is new or full=True) and merges them into data_dir.
+    """
+    manifest = load_manifest(data_dir) if manifest is None else manifest
+    last_date = None if full else last_stored_date(symbol, manifest, data_dir)
+
+    window = fetch_window(last_date, days)
+    if window is None:
+        print(f"OK {symbol} up to date")
+        return
+    from_date, to_date = window
 
     print(f"Fetching {symbol}: {from_date} -> {to_date}")
 
-    url = (
-        "https://api.upstox.com/v2/historical-candle/"
-        f"{instrument_key}/day/{to_date}/{from_date}"
-    )
-
-    response = requests.get(url, headers=HEADERS)
+    response = requests.get(candle_url(instrument_key, from_date, to_date, base_url), headers=upstox_headers(base_url))
 
     if response.status_code != 200:
         print(f"X {symbol} | {response.status_code} | {response.text}")
@@ -52,20 +44,22 @@ def fetch_history(symbol, instrument_key, days=365):
         print(f"! No data for {symbol}")
         return
 
-    df = pd.DataFrame(
-        candles,
-        columns=["Date", "Open", "High", "Low", "Close", "Volume", "OI"]
-    )
-
-    df = df.drop(columns=["OI"])
-    df["Date"] = pd.to_datetime(df["Date"])
-    df = df.sort_values("Date")
-
-    df.to_csv(os.path.join(DATA_DIR, f"{symbol}.csv"), index=False)
-    print(f"OK Saved {symbol} ({len(df)} rows)")
+    added = store_candles(symbol, candles_frame(candles), manifest, data_dir, full)
+    print(f"OK Saved {symbol} (+{added} rows, {manifest[symbol]['rows']} total)")
 
 
 if __name__ == "__main__":
-    for sym, key in SYMBOL_MAP.items():
-        fetch_history(sym, key)
-
+    # Incremental by default; --full re-downloads the whole window,
+    # --sync fetches one symbol at a time instead of concurrently,
+    # --universe NAME / --shard I/N pick the symbols
+    full = "--full" in sys.argv[1:]
+    symbol_map = instrument_map(select_from_argv())
+    if "--sync" in sys.argv[1:]:
+        manifest = load_manifest()
+        try:
+            for sym, key in symbol_map.items():
+                fetch_history(sym, key, manifest=manifest, full=full)
+        finally:
+            save_manifest(manifest)
+    else:
+        fetch_all(symbol_map, upstox_headers(), full=full)
@@ -0,0 +1,159 @@
+# Concurrent fetch engine for the Upstox historical-candle API.
+# One keep-alive aiohttp session, a bounded number of requests in flight, a
+# token bucket holding the request rate under the API limit, and retries with
+# jittered backoff on 429 / 5xx. Each symbol reports its own outcome.
+
+import asyncio
+import random
+import time
+import aiohttp
+
+from candles import (
+    DATA_DIR, BASE_URL, load_manifest, save_manifest, last_stored_date,
+    fetch_window, candle_url, candles_frame, store_candles,
+)
+
+# Upstox allows 25 requests/s per user on the standard APIs; stay under it
+RATE_PER_SECOND = 20
+CONCURRENCY = 16
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+TIMEOUT_SECONDS = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# ---------- Rate Limiting ----------
+class TokenBucket:
+    """`rate` tokens per second, at most `burst` saved up; acquire() waits for one."""
+
+    def __init__(self, rate=RATE_PER_SECOND, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def backoff_delay(attempt, retry_after=None):
+    """Full-jitter exponential backoff; a Retry-After header is a lower bound."""
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+# ---------- Requests ----------
+async def get_candles(session, bucket, url, max_retries=MAX_RETRIES):
+    """
+    Candle rows for one URL as (candles, attempts). Retries 429 / 5xx and
+    connection errors; raises RuntimeError once retries run out or on any
+    other HTTP error.
+    """
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        try:
+            async with session.get(url) as response:
+                if response.status == 200:
+                    payload = await response.json()
+                    return payload.get("data", {}).get("candles", []), attempt + 1
+                text = await response.text()
+                if response.status not in RETRY_STATUSES:
+                    raise RuntimeError(f"{response.status} | {text[:200]}")
+                error, retry_after = f"{response.status} | {text[:200]}", _retry_after(response)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error, retry_after = f"{type(e).__name__}: {e}", None
+        if attempt < max_retries:
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+    raise RuntimeError(f"gave up after {max_retries + 1} attempts ({error})")
+
+async def fetch_symbol(session, bucket, semaphore, symbol, instrument_key, manifest,
+                       days=365, full=False, data_dir=DATA_DIR, base_url=BASE_URL):
+    """
+    Fetches and stores one symbol's missing sessions; returns its outcome
+    dict. Any failure (HTTP, parsing, writing) is reported in the outcome
+    rather than raised, so one symbol cannot stop the others.
+    """
+    outcome = {"symbol": symbol, "status": "ok", "rows": 0, "attempts": 0, "error": None}
+    try:
+        last_date = None if full else last_stored_date(symbol, manifest, data_dir)
+        window = fetch_window(last_date, days)
+        if window is None:
+            outcome["status"] = "up_to_date"
+            return outcome
+
+        async with semaphore:
+            candles, outcome["attempts"] = await get_candles(session, bucket, candle_url(instrument_key, *window, base_url))
+
+        if not candles:
+            outcome["status"] = "empty"
+            return outcome
+        # File writes off the event loop so other responses keep flowing
+        outcome["rows"] = await asyncio.to_thread(
+            store_candles, symbol, candles_frame(candles), manifest, data_dir, full
+        )
+    except RuntimeError as e:
+        outcome.update(status="error", error=str(e))
+    except Exception as e:
+        outcome.update(status="error", error=f"{type(e).__name__}: {e}")
+    return outcome
+
+async def fetch_all_async(symbol_map, headers, days=365, full=False, data_dir=DATA_DIR,
+                          base_url=BASE_URL, concurrency=CONCURRENCY, rate=RATE_PER_SECOND):
+    manifest = load_manifest(data_dir)
+    bucket = TokenBucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=60)
+    timeout = aiohttp.ClientTimeout(total=TIMEOUT_SECONDS)
+    try:
+        async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout) as session:
+            return await asyncio.gather(*(
+                fetch_symbol(session, bucket, semaphore, symbol, key, manifest, days, full, data_dir, base_url)
+                for symbol, key in symbol_map.items()
+            ))
+    finally:
+        save_manifest(manifest, data_dir)
+
+def fetch_all(symbol_map, headers, verbose=True, **kwargs):
+    """
+    Fetches every symbol in symbol_map ({symbol: instrument_key}) concurrently
+    and prints one line per symbol (verbose) plus a summary. Returns the
+    outcome dicts (symbol, status ok / up_to_date / empty / error, rows,
+    attempts, error).
+    """
+    start = time.perf_counter()
+    outcomes = asyncio.run(fetch_all_async(symbol_map, headers, **kwargs))
+    elapsed = time.perf_counter() - start
+
+    if verbose:
+        for o in outcomes:
+            if o["status"] == "error":
+                print(f"X {o['symbol']} | {o['error']}")
+            elif o["status"] == "empty":
+                print(f"! No data for {o['symbol']}")
+            elif o["status"] == "up_to_date":
+                print(f"OK {o['symbol']} up to date")
+            else:
+                retries = f", {o['attempts'] - 1} retries" if o["attempts"] > 1 else ""
+                print(f"OK Saved {o['symbol']} (+{o['rows']} rows{retries})")
+
+    counts = {}
+    for o in outcomes:
+        counts[o["status"]] = counts.get(o["status"], 0) + 1
+    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+    print(f"\n Fetched {len(outcomes)} symbols in {elapsed:.1f}s ({summary})")
+    return outcomes
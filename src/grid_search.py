@@ -0,0 +1,212 @@
+# Exhaustive (fast, slow) search: every fast < slow window pair in a range, for
+# each MA type, evaluated in batched backtests from one MA bank per type.
+# Pairs whose slow MA cannot warm up inside the window are skipped, and each
+# symbol's metrics come back as one dense (configs x metrics) array.
+#
+#   python src/grid_search.py [--min 3] [--max 200] [--months 3] [--types SMA,EMA,WMA]
+#                             [--universe NAME] [--shard I/N] [--workers N]
+
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from functools import partial
+
+from batch_backtest import METRIC_COLUMNS, simulate_batch
+from moving_averages import MA_TYPES, MABank, crossover_matrix
+from panel import load_bars, recent_window, panel_handoff, attach_panel
+from parallel import run_tasks, report_errors, save_errors
+from universe import select_from_argv
+
+# ---------- PATH SETUP ----------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+
+REPORTS_DIR = os.path.join(PROJECT_ROOT, "reports")
+GRID_DIR = os.path.join(REPORTS_DIR, "grid")
+
+MIN_WINDOW = 3
+MAX_WINDOW = 200
+# Bars a pair needs after its slow MA is defined: one to form the crossover,
+# one to enter on
+TRADE_BARS = 2
+# Configurations simulated per batch, bounding the (bars x configs) matrices
+CHUNK_SIZE = 20_000
+
+# ---------- Pair Grid ----------
+def window_pairs(min_window=MIN_WINDOW, max_window=MAX_WINDOW, n_bars=None):
+    """
+    (fast, slow) arrays of every min_window <= fast < slow <= max_window
+    pair, slow capped so the slow MA warms up within n_bars.
+    """
+    if n_bars is not None:
+        max_window = min(max_window, n_bars - TRADE_BARS)
+    fast, slow = np.triu_indices(max(max_window - min_window + 1, 0), k=1)
+    return fast + min_window, slow + min_window
+
+# ---------- Results ----------
+class GridResult:
+    """
+    Metrics of every (ma_type, fast, slow) configuration for one symbol.
+    metrics is a dense (configs x METRIC_COLUMNS) float array; row i belongs to
+    ma_types[type_index[i]], fast[i], slow[i].
+    """
+
+    def __init__(self, symbol, ma_types, type_index, fast, slow, metrics):
+        self.symbol = symbol
+        self.ma_types = list(ma_types)
+        self.type_index = np.asarray(type_index)
+        self.fast = np.asarray(fast)
+        self.slow = np.asarray(slow)
+        self.metrics = np.asarray(metrics, dtype=float)
+
+    def __len__(self):
+        return len(self.metrics)
+
+    def metric(self, name):
+        return self.metrics[:, METRIC_COLUMNS.index(name)]
+
+    def frame(self):
+        """One row per configuration, like backtest_batch() output."""
+        df = pd.DataFrame({
+            "ma_type": np.asarray(self.ma_types, dtype=object)[self.type_index],
+            "fast": self.fast,
+            "slow": self.slow,
+        })
+        for j, col in enumerate(METRIC_COLUMNS):
+            df[col] = self.metrics[:, j]
+        return df
+
+    def cube(self, name="Total Return"):
+        """
+        One metric as a (ma_types x slow+1 x slow+1) array indexed by
+        [type, fast, slow]; pairs that were not evaluated are NaN.
+        """
+        size = int(self.slow.max()) + 1 if len(self) else 0
+        out = np.full((len(self.ma_types), size, size), np.nan)
+        out[self.type_index, self.fast, self.slow] = self.metric(name)
+        return out
+
+    def best(self, by="Total Return"):
+        """The configuration with the highest `by` as a dict (first on ties)."""
+        i = int(np.argmax(self.metric(by)))
+        row = {"Symbol": self.symbol, "MA_Type": self.ma_types[self.type_index[i]],
+               "Fast": int(self.fast[i]), "Slow": int(self.slow[i])}
+        row.update({col: float(self.metrics[i, j]) for j, col in enumerate(METRIC_COLUMNS)})
+        row["Trades"] = int(row["Trades"])
+        row["Configs"] = len(self)
+        return row
+
+    def save(self, path):
+        np.savez(path, ma_types=np.array(self.ma_types), type_index=self.type_index,
+                 fast=self.fast, slow=self.slow, metrics=self.metrics,
+                 columns=np.array(METRIC_COLUMNS))
+
+    @classmethod
+    def load(cls, path, symbol=None):
+        data = np.load(path)
+        return cls(symbol, data["ma_types"].tolist(), data["type_index"], data["fast"],
+                   data["slow"], data["metrics"])
+
+# ---------- Search ----------
+def grid_search(
+    df,
+    symbol=None,
+    ma_types=MA_TYPES,
+    min_window=MIN_WINDOW,
+    max_window=MAX_WINDOW,
+    exit_mode="time",
+    hold_days=7,
+    stop_loss=0.03,
+    take_profit=0.05,
+    cost_bps=15,
+    binary_signal=False,
+    chunk_size=CHUNK_SIZE
+):
+    """
+    Backtests every valid (ma_type, fast, slow) on one symbol's bars with the
+    optimizers' exit settings. Each MA type's windows are computed once in an
+    MABank; pairs are column lookups into it.
+    """
+    df = df.sort_values("Date")
+    close = df["Close"].to_numpy(dtype=float)
+    prices = [pd.to_datetime(df["Date"])] + [
+        df[col].to_numpy(dtype=float) for col in ("Open", "High", "Low")
+    ]
+    fast, slow = window_pairs(min_window, max_window, len(df))
+    ma_types = [t.upper() for t in ma_types]
+
+    metrics = np.empty((len(ma_types) * len(fast), len(METRIC_COLUMNS)))
+    windows = np.arange(min_window, slow.max() + 1) if len(slow) else []
+    for t, ma_type in enumerate(ma_types):
+        bank = MABank(close, windows, ma_type)
+        fast_cols = fast - min_window  # bank columns are the sorted windows
+        slow_cols = slow - min_window
+        for start in range(0, len(fast), chunk_size):
+            cols = slice(start, start + chunk_size)
+            ma_fast = bank.values[:, fast_cols[cols]]
+            ma_slow = bank.values[:, slow_cols[cols]]
+            result = simulate_batch(
+                *prices, close, crossover_matrix(ma_fast, ma_slow, binary=binary_signal), ma_slow,
+                cost_bps=cost_bps, exit_mode=exit_mode, hold_days=hold_days,
+                stop_loss=stop_loss, take_profit=take_profit,
+            )
+            rows = slice(t * len(fast) + start, t * len(fast) + min(start + chunk_size, len(fast)))
+            metrics[rows] = np.column_stack([result[col] for col in METRIC_COLUMNS])
+
+    type_index = np.repeat(np.arange(len(ma_types)), len(fast))
+    return GridResult(symbol, ma_types, type_index, np.tile(fast, len(ma_types)),
+                      np.tile(slow, len(ma_types)), metrics)
+
+def grid_search_symbol(symbol, months=3, out_dir=GRID_DIR, **kwargs):
+    """
+    Grid search on a symbol's recent window; the dense result is saved to
+    out_dir/<symbol>_grid.npz and its best configuration returned.
+    """
+    df = recent_window(load_bars(symbol), months=months)
+    if len(df) < kwargs.get("min_window", MIN_WINDOW) + TRADE_BARS + 1:
+        raise ValueError("Not enough recent data")
+    result = grid_search(df, symbol, **kwargs)
+    if out_dir:
+        result.save(os.path.join(out_dir, f"{symbol.replace('.', '_')}_grid.npz"))
+    return result.best()
+
+# ---------- Batch Runner ----------
+def run_grid_search(symbols, workers=None, months=3, out_dir=GRID_DIR, **kwargs):
+    """
+    Grid search over every symbol on the process pool. Dense results go to
+    out_dir; the best configuration per symbol is saved as
+    reports/grid_search_best.csv (symbol order) and returned.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with panel_handoff() as handle:
+        results = run_tasks(
+            partial(grid_search_symbol, months=months, out_dir=out_dir, **kwargs), symbols, workers,
+            initializer=attach_panel, initargs=(handle,),
+        )
+    failed = report_errors(results)
+    save_errors(failed, os.path.join(REPORTS_DIR, "grid_search_errors.csv"))
+
+    best = pd.DataFrame([r["result"] for r in results if r["error"] is None])
+    if not best.empty:
+        out_path = os.path.join(REPORTS_DIR, "grid_search_best.csv")
+        best.to_csv(out_path, index=False)
+        print(f"OK Saved -> {out_path} ({len(best)} symbols, {int(best['Configs'].sum()):,} configs)")
+    return best
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full (fast, slow) MA grid search")
+    parser.add_argument("--min", type=int, default=MIN_WINDOW)
+    parser.add_argument("--max", type=int, default=MAX_WINDOW)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--types", default=",".join(MA_TYPES))
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--universe", default=None)
+    parser.add_argument("--shard", default=None)
+    args = parser.parse_args()
+
+    run_grid_search(
+        select_from_argv(default=args.universe), workers=args.workers, months=args.months,
+        ma_types=args.types.upper().split(","), min_window=args.min, max_window=args.max,
+    )
@@ -0,0 +1,133 @@
+# Per-symbol stage manifest for incremental pipeline runs. For every stage
+# (features, trim, optimize, ...) and symbol it records the content hash of
+# the input files, a hash of the stage parameters and the output paths, so a
+# stage can skip symbols whose inputs, parameters and outputs are unchanged.
+#
+#   python src/incremental.py              symbols recorded per stage
+#   python src/incremental.py --forget S   drop stage S from the manifest
+
+import os
+import sys
+import json
+import hashlib
+
+# ---------- PATH SETUP ----------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+
+MANIFEST_PATH = os.path.join(PROJECT_ROOT, "data", "pipeline_manifest.json")
+
+# ---------- Hashes ----------
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def params_hash(params):
+    """Hash of a JSON-able parameter dict (key order does not matter)."""
+    text = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+def run_flags(argv=None):
+    """(force, dry_run) from --force / --dry-run in argv."""
+    argv = sys.argv[1:] if argv is None else argv
+    return "--force" in argv, "--dry-run" in argv
+
+# ---------- Manifest ----------
+class StageManifest:
+    """
+    One stage's entries: {symbol: {"inputs": {path: {hash, size, mtime}},
+    "params": hash, "outputs": [paths]}}. Input files whose size and mtime are
+    unchanged keep their recorded hash instead of being read again.
+    """
+
+    def __init__(self, stage, path=None):
+        self.stage = stage
+        self.path = path or MANIFEST_PATH
+        self.data = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.data = json.load(f)
+        self.entries = self.data.setdefault(stage, {})
+
+    def _input_state(self, path, recorded=None):
+        stat = os.stat(path)
+        if recorded and recorded["size"] == stat.st_size and recorded["mtime"] == stat.st_mtime_ns:
+            return recorded
+        return {"hash": file_hash(path), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+    def stale_reason(self, symbol, inputs, params):
+        """Why symbol must be recomputed ("new", "input changed", ...), or None."""
+        entry = self.entries.get(symbol)
+        if entry is None:
+            return "new"
+        if entry["params"] != params_hash(params):
+            return "params changed"
+        if sorted(entry["inputs"]) != sorted(inputs):
+            return "inputs changed"
+        for path in inputs:
+            if not os.path.exists(path):
+                return "input missing"
+            state = self._input_state(path, entry["inputs"][path])
+            if state["hash"] != entry["inputs"][path]["hash"]:
+                return "input changed"
+            entry["inputs"][path] = state  # touched but identical: skip hashing next time
+        if not all(os.path.exists(p) for p in entry["outputs"]):
+            return "output missing"
+        return None
+
+    def plan(self, symbols, inputs_for, params, force=False):
+        """{symbol: reason} for the symbols to recompute (all of them with force)."""
+        plan = {}
+        for symbol in symbols:
+            reason = "forced" if force else self.stale_reason(symbol, inputs_for(symbol), params)
+            if reason:
+                plan[symbol] = reason
+        return plan
+
+    def record(self, symbol, inputs, params, outputs):
+        previous = self.entries.get(symbol, {}).get("inputs", {})
+        self.entries[symbol] = {
+            "inputs": {p: self._input_state(p, previous.get(p)) for p in inputs},
+            "params": params_hash(params),
+            "outputs": list(outputs),
+        }
+
+    def save(self):
+        # Re-read so stages saving one after another do not drop each other
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.data = {**json.load(f), self.stage: self.entries}
+        else:
+            self.data = {self.stage: self.entries}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.data, f)
+        os.replace(tmp_path, self.path)
+
+def report_plan(stage, plan, total, dry_run=False):
+    """Prints what a stage will (or, dry run, would) recompute."""
+    verb = "would recompute" if dry_run else "recomputing"
+    print(f"{stage}: {verb} {len(plan)} of {total} symbols ({total - len(plan)} unchanged)")
+    if dry_run:
+        for symbol, reason in plan.items():
+            print(f"  {symbol:<25} {reason}")
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    data = {}
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            data = json.load(f)
+    if "--forget" in sys.argv:
+        stage = sys.argv[sys.argv.index("--forget") + 1]
+        manifest = StageManifest(stage)
+        manifest.entries.clear()
+        manifest.save()
+        print(f"OK Forgot stage {stage}")
+    else:
+        for stage, entries in data.items():
+            print(f"{stage}: {len(entries)} symbols recorded")
@@ -0,0 +1,189 @@
+# Local stand-in for the Upstox historical-candle endpoint, for exercising and
+# benchmarking the fetchers without credentials or network. Replays recorded
+# responses from a fixtures dir (deterministic random-walk candles for keys
+# with no fixture), with configurable latency, injected 5xx errors and 429
+# responses above a request rate.
+#
+#   python src/mock_upstox.py record [SYMBOL ...]     save live responses (needs token)
+#   python src/mock_upstox.py serve [--latency 0.2] [--error-rate 0.05] [--rate-limit 25]
+#   UPSTOX_BASE_URL=http://127.0.0.1:8765/v2 python src/fetch-data-upstox.py
+
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import asyncio
+import argparse
+from collections import deque
+import numpy as np
+import pandas as pd
+import aiohttp
+from aiohttp import web
+
+from candles import UPSTOX_URL, candle_url, fetch_window, upstox_headers
+from fetch_async import TokenBucket, get_candles
+
+# ---------- PATH SETUP ----------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+
+FIXTURES_DIR = os.path.join(PROJECT_ROOT, "data", "fixtures", "upstox")
+SYMBOL_MAP_PATH = os.path.join(PROJECT_ROOT, "upstox_symbol_map.json")
+DEFAULT_PORT = 8765
+# Request counters of a running app: app[STATS_KEY]
+STATS_KEY = web.AppKey("stats", dict)
+
+# ---------- Candles ----------
+def synthetic_candles(instrument_key, from_date, to_date):
+    """Business-day candles, newest first like Upstox; same key -> same prices."""
+    all_days = pd.bdate_range("2020-01-01", to_date)
+    rng = np.random.default_rng(zlib.crc32(instrument_key.encode()))
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, len(all_days))))
+    open_ = close * (1 + rng.normal(0, 0.004, len(all_days)))
+    volume = rng.integers(10_000, 1_000_000, len(all_days))
+
+    keep = all_days >= pd.Timestamp(from_date)
+    rows = []
+    for day, o, c, v in zip(all_days[keep], open_[keep], close[keep], volume[keep]):
+        rows.append([
+            day.strftime("%Y-%m-%dT00:00:00+05:30"),
+            round(o, 2), round(max(o, c) * 1.005, 2), round(min(o, c) * 0.995, 2), round(c, 2),
+            int(v), 0,
+        ])
+    return rows[::-1]
+
+# ---------- Fixtures ----------
+def fixture_path(instrument_key, fixtures_dir=FIXTURES_DIR):
+    return os.path.join(fixtures_dir, instrument_key.replace("|", "_") + ".json")
+
+def load_fixtures(fixtures_dir=FIXTURES_DIR):
+    """{instrument_key: candle rows} for every recorded response."""
+    fixtures = {}
+    if not os.path.isdir(fixtures_dir):
+        return fixtures
+    for file in os.listdir(fixtures_dir):
+        if file.endswith(".json"):
+            with open(os.path.join(fixtures_dir, file)) as f:
+                recorded = json.load(f)
+            fixtures[recorded["instrument_key"]] = recorded["response"]["data"]["candles"]
+    return fixtures
+
+def replay_candles(candles, from_date, to_date):
+    """Recorded rows whose session falls in [from_date, to_date]."""
+    return [row for row in candles if from_date <= row[0][:10] <= to_date]
+
+async def record_async(symbol_map, fixtures_dir=FIXTURES_DIR, days=365, base_url=UPSTOX_URL):
+    """Saves one live historical-candle response per symbol as a fixture."""
+    os.makedirs(fixtures_dir, exist_ok=True)
+    bucket = TokenBucket()
+    async with aiohttp.ClientSession(headers=upstox_headers(base_url)) as session:
+        for symbol, key in symbol_map.items():
+            from_date, to_date = fetch_window(None, days)
+            try:
+                candles, _ = await get_candles(session, bucket, candle_url(key, from_date, to_date, base_url))
+            except RuntimeError as e:
+                print(f"X {symbol} | {e}")
+                continue
+            with open(fixture_path(key, fixtures_dir), "w") as f:
+                json.dump({
+                    "symbol": symbol, "instrument_key": key,
+                    "from_date": str(from_date), "to_date": str(to_date),
+                    "response": {"status": "success", "data": {"candles": candles}},
+                }, f)
+            print(f"OK Recorded {symbol} ({len(candles)} candles)")
+
+# ---------- Server ----------
+def make_app(fixtures_dir=FIXTURES_DIR, latency=0.0, jitter=0.0, error_rate=0.0,
+             rate_limit=None, seed=0):
+    """
+    latency / jitter: seconds added to every response (uniform +- jitter);
+    error_rate: share of requests answered with a 503; rate_limit: requests
+    in any one second above which 429 is returned. app[STATS_KEY] counts them.
+    """
+    rng = random.Random(seed)
+    fixtures = load_fixtures(fixtures_dir) if fixtures_dir else {}
+    stats = {"requests": 0, "replayed": 0, "synthetic": 0, "errors": 0, "throttled": 0}
+    recent = deque()
+
+    async def historical_candle(request):
+        stats["requests"] += 1
+        delay = latency + rng.uniform(-jitter, jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if rate_limit is not None:
+            now = time.monotonic()
+            while recent and now - recent[0] > 1.0:
+                recent.popleft()
+            if len(recent) >= rate_limit:
+                stats["throttled"] += 1
+                return web.json_response(
+                    {"status": "error", "errors": [{"errorCode": "UDAPI10005", "message": "Too many requests"}]},
+                    status=429, headers={"Retry-After": "1"},
+                )
+            recent.append(now)
+
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            return web.json_response({"status": "error", "errors": [{"message": "Service unavailable"}]}, status=503)
+
+        info = request.match_info
+        key, from_date, to_date = info["instrument_key"], info["from_date"], info["to_date"]
+        if key in fixtures:
+            stats["replayed"] += 1
+            candles = replay_candles(fixtures[key], from_date, to_date)
+        else:
+            stats["synthetic"] += 1
+            candles = synthetic_candles(key, from_date, to_date)
+        return web.json_response({"status": "success", "data": {"candles": candles}})
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application()
+    app.router.add_get("/v2/historical-candle/{instrument_key}/day/{to_date}/{from_date}", historical_candle)
+    app.router.add_get("/stats", get_stats)
+    app[STATS_KEY] = stats
+    return app
+
+async def start_server(app, port=DEFAULT_PORT):
+    """Starts app on 127.0.0.1:port in the running loop; returns the runner."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upstox historical-candle recorder / replay server")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    record = sub.add_parser("record")
+    record.add_argument("symbols", nargs="*", help="defaults to every symbol in upstox_symbol_map.json")
+    record.add_argument("--fixtures", default=FIXTURES_DIR)
+    record.add_argument("--days", type=int, default=365)
+
+    serve = sub.add_parser("serve")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve.add_argument("--fixtures", default=FIXTURES_DIR)
+    serve.add_argument("--latency", type=float, default=0.0)
+    serve.add_argument("--jitter", type=float, default=0.0)
+    serve.add_argument("--error-rate", type=float, default=0.0)
+    serve.add_argument("--rate-limit", type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == "record":
+        with open(SYMBOL_MAP_PATH) as f:
+            symbol_map = json.load(f)
+        if args.symbols:
+            missing = [s for s in args.symbols if s not in symbol_map]
+            if missing:
+                sys.exit(f"Not in upstox_symbol_map.json: {', '.join(missing)}")
+            symbol_map = {s: symbol_map[s] for s in args.symbols}
+        asyncio.run(record_async(symbol_map, args.fixtures, args.days))
+    else:
+        app = make_app(args.fixtures, args.latency, args.jitter, args.error_rate, args.rate_limit)
+        print(f"Serving {len(load_fixtures(args.fixtures))} fixtures on http://127.0.0.1:{args.port}/v2")
+        web.run_app(app, host="127.0.0.1", port=args.port, print=None)
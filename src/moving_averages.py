@@ -0,0 +1,423 @@
+# Shared moving-average kernels and the MA / signal columns built from them.
+# Kernels work on NumPy arrays in O(n) with no per-bar Python callbacks. They
+# reproduce pandas rolling().mean() / ewm(adjust=False).mean() and the old
+# rolling().apply() WMA to floating-point tolerance, warm-up NaNs included.
+
+import numpy as np
+import pandas as pd
+
+from cache import FEATURE_CACHE, data_hash
+
+MA_TYPES = ("SMA", "EMA", "WMA")
+
+# Largest decay factor growth allowed inside one EMA block (keeps ~1e-10 precision)
+_EMA_BLOCK_GROWTH = 1e6
+
+# ---------- Kernels ----------
+def _sma_sums(x):
+    """Cumulative sums shared by every SMA window of one series."""
+    n = len(x)
+    isnan = np.isnan(x)
+    # Offset by a sample value so the running sums stay small
+    offset = x[~isnan][0] if (~isnan).any() else 0.0
+    centered = np.where(isnan, 0.0, x - offset)
+    change = np.ones(n, dtype=bool)
+    change[1:] = x[1:] != x[:-1]
+    run_start = np.maximum.accumulate(np.where(change, np.arange(n), 0))
+    return {
+        "isnan": isnan,
+        "offset": offset,
+        "sums": np.concatenate(([0.0], np.cumsum(centered))),
+        "nans": np.concatenate(([0], np.cumsum(isnan))),
+        "run_length": np.arange(n) - run_start + 1,
+    }
+
+def _sma_window(x, sums, window):
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window < 1:
+        raise ValueError("window must be >= 1")
+    if n < window:
+        return out
+
+    total = sums["sums"]
+    out[window - 1:] = (total[window:] - total[:-window]) / window + sums["offset"]
+    nans = sums["nans"]
+    out[window - 1:][nans[window:] - nans[:-window] > 0] = np.nan
+
+    # Like pandas, a window of identical values averages to exactly that value
+    flat = (sums["run_length"] >= window) & ~sums["isnan"]
+    out[flat] = x[flat]
+    return out
+
+def sma(values, window):
+    """Simple moving average from cumulative sums."""
+    x = np.asarray(values, dtype=float)
+    return _sma_window(x, _sma_sums(x), window)
+
+def wma(values, window):
+    """Linearly weighted moving average (newest bar weight = window) by convolution."""
+    x = np.asarray(values, dtype=float)
+    n = len(x)
+    out = np.full(n, np.nan)
+    if window < 1:
+        raise ValueError("window must be >= 1")
+    if n < window:
+        return out
+
+    weights = np.arange(1, window + 1, dtype=float)
+    out[window - 1:] = np.convolve(x, weights[::-1], mode="valid") / weights.sum()
+    return out
+
+def _ema_segment(x, alpha):
+    """EMA of a NaN-free array seeded with x[0], in blocks of closed-form sums."""
+    n = len(x)
+    decay = 1.0 - alpha
+    out = np.empty(n)
+    out[0] = x[0]
+    if n == 1:
+        return out
+    if decay == 0.0:
+        out[1:] = x[1:]
+        return out
+
+    # Inside a block of length B starting after carry c:
+    #   y[j] = decay**(j+1) * (c + alpha * sum_{i<=j} x[i] * decay**-(i+1))
+    block = int(max(1, min(n - 1, np.log(_EMA_BLOCK_GROWTH) // -np.log(decay))))
+    rest = x[1:]
+    n_blocks = -(-len(rest) // block)
+    padded = np.zeros(n_blocks * block)
+    padded[:len(rest)] = rest
+    blocks = padded.reshape(n_blocks, block)
+
+    powers = decay ** np.arange(1, block + 1)
+    local = np.cumsum(blocks / powers, axis=1) * alpha * powers
+
+    # Carries are the only sequential part: one scalar update per block
+    carries = np.empty(n_blocks)
+    carry = float(x[0])
+    last_power = powers[-1]
+    for b, tail in enumerate(local[:, -1].tolist()):
+        carries[b] = carry
+        carry = last_power * carry + tail
+
+    out[1:] = (powers * carries[:, None] + local).ravel()[:len(rest)]
+
+    # Like pandas, the average does not move while price equals it: a flat
+    # opening run stays exactly at the first value.
+    change = np.flatnonzero(x != x[0])
+    lead = change[0] if len(change) else n
+    out[:lead] = x[0]
+    return out
+
+def ema(values, span):
+    """Exponential moving average, pandas ewm(span=span, adjust=False) semantics."""
+    x = np.asarray(values, dtype=float)
+    if span < 1:
+        raise ValueError("span must be >= 1")
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))
+    if len(valid) == 0:
+        return out
+
+    first = valid[0]
+    if len(valid) != len(x) - first:
+        # Interior gaps decay the old weight per missing bar; defer to pandas
+        return pd.Series(x).ewm(span=span, adjust=False).mean().to_numpy()
+
+    out[first:] = _ema_segment(x[first:], 2.0 / (span + 1.0))
+    return out
+
+KERNELS = {"SMA": sma, "EMA": ema, "WMA": wma}
+
+def moving_average(values, ma_type, window):
+    """
+    Dispatches to sma / ema / wma by name. A 2-D (bars x series) input is
+    averaged column by column, e.g. a dates x symbols panel with NaN padding.
+    Each series' result is memoised in FEATURE_CACHE and returned read-only.
+    """
+    ma_type = ma_type.upper()
+    if ma_type not in KERNELS:
+        raise ValueError("ma_type must be SMA, EMA, or WMA")
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 2:
+        if values.shape[1] == 0:
+            return np.full(values.shape, np.nan)
+        return np.column_stack([moving_average(col, ma_type, window) for col in values.T])
+    return ma_bank(values, [window], ma_type)[:, 0]
+
+# ---------- MA Bank ----------
+def ma_bank(values, windows, ma_type="SMA"):
+    """
+    Every window of one MA type in a single pass: a (bars x windows) array for
+    a 1-D series, (bars x series x windows) for a 2-D input. Column j equals
+    moving_average(values, ma_type, windows[j]); SMA windows share one set of
+    cumulative sums, and windows this series already has in FEATURE_CACHE are
+    not recomputed.
+    """
+    ma_type = ma_type.upper()
+    if ma_type not in KERNELS:
+        raise ValueError("ma_type must be SMA, EMA, or WMA")
+    values = np.asarray(values, dtype=float)
+    windows = [int(w) for w in windows]
+    if values.ndim == 2:
+        if values.shape[1] == 0:
+            return np.full((len(values), 0, len(windows)), np.nan)
+        return np.stack([ma_bank(col, windows, ma_type) for col in values.T], axis=1)
+
+    # Windows already in the cache for this exact series are looked up; the
+    # rest are computed together and stored
+    digest = data_hash(values)
+    columns = {w: FEATURE_CACHE.get((digest, ma_type, w)) for w in windows}
+    missing = [w for w, column in columns.items() if column is None]
+    if missing:
+        if ma_type == "SMA":
+            sums = _sma_sums(values)
+            computed = [_sma_window(values, sums, w) for w in missing]
+        else:
+            computed = [KERNELS[ma_type](values, w) for w in missing]
+        for w, column in zip(missing, computed):
+            columns[w] = FEATURE_CACHE.put((digest, ma_type, w), column)
+    if not windows:
+        return np.empty((len(values), 0))
+    return np.column_stack([columns[w] for w in windows])
+
+def crossover_matrix(ma_fast, ma_slow, binary=False):
+    """
+    Signal diff of fast vs slow MA arrays, NaN on the first bar (same values as
+    generate_signals()' Crossover column, for any number of columns).
+    """
+    if binary:
+        signal = np.where(ma_fast > ma_slow, 1.0, -1.0)
+    else:
+        signal = np.where(ma_fast > ma_slow, 1.0, np.where(ma_fast < ma_slow, -1.0, 0.0))
+    crossover = np.full(signal.shape, np.nan)
+    crossover[1:] = signal[1:] - signal[:-1]
+    return crossover
+
+class MABank:
+    """
+    MA values of one series for a set of windows, computed together with
+    ma_bank(). Any (fast, slow) pair is then a column lookup.
+    """
+
+    def __init__(self, values, windows, ma_type="SMA"):
+        self.ma_type = ma_type.upper()
+        self.windows = sorted({int(w) for w in windows})
+        self.index = {w: j for j, w in enumerate(self.windows)}
+        self.values = ma_bank(values, self.windows, self.ma_type)
+
+    def __getitem__(self, window):
+        return self.values[..., self.index[int(window)]]
+
+    def __contains__(self, window):
+        return int(window) in self.index
+
+    def pairs(self, pairs, binary=False):
+        """(MA_Slow, Crossover) arrays with one trailing column per (fast, slow) pair."""
+        fast = self.values[..., [self.index[int(f)] for f, _ in pairs]]
+        slow = self.values[..., [self.index[int(s)] for _, s in pairs]]
+        return slow, crossover_matrix(fast, slow, binary=binary)
+
+# ---------- Online Updaters ----------
+# One bar at a time, O(1) per bar, for appending new candles to an existing
+# series. update(price) returns the MA after that bar (NaN during warm-up) and
+# agrees with the array kernels to floating-point tolerance. State round-trips
+# through to_dict() / updater_from_dict() for persistence.
+
+class _WindowUpdater:
+    """Ring buffer of the last `window` prices shared by SMA and WMA."""
+
+    ma_type = None
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("window must be >= 1")
+        self.window = int(window)
+        self.buffer = [0.0] * self.window
+        self.head = 0          # slot the next price goes into
+        self.count = 0         # prices seen, capped at window
+        self.nans = 0          # NaNs currently in the buffer
+        self.run_length = 0    # trailing run of identical prices
+        self.last = np.nan
+        self.value = np.nan
+
+    def _push(self, price):
+        """Stores price, returns the price it evicted (None while filling)."""
+        evicted = self.buffer[self.head] if self.count == self.window else None
+        self.buffer[self.head] = price
+        self.head = (self.head + 1) % self.window
+        self.count = min(self.count + 1, self.window)
+        if evicted is not None and evicted != evicted:
+            self.nans -= 1
+        if price != price:
+            self.nans += 1
+        self.run_length = self.run_length + 1 if price == self.last else 1
+        self.last = price
+        return evicted
+
+    def _ordered(self):
+        """Buffer oldest to newest."""
+        return self.buffer[self.head:] + self.buffer[:self.head]
+
+    def to_dict(self):
+        state = {k: v for k, v in self.__dict__.items()}
+        state["ma_type"] = self.ma_type
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        updater = cls(state["window"])
+        for key, value in state.items():
+            if key != "ma_type":
+                setattr(updater, key, value)
+        return updater
+
+class SMAUpdater(_WindowUpdater):
+    """Simple moving average: ring buffer + running sum."""
+
+    ma_type = "SMA"
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.total = 0.0
+
+    def update(self, price):
+        price = float(price)
+        evicted = self._push(price)
+        if self.head == 0 or self.nans or evicted != evicted:
+            # Re-sum once per lap so rounding in the running sum cannot build up
+            self.total = sum(p for p in self.buffer[:self.count] if p == p)
+        else:
+            self.total += price - (evicted or 0.0)
+
+        if self.count < self.window or self.nans:
+            self.value = np.nan
+        elif self.run_length >= self.window:
+            # Like pandas, a window of identical values averages to exactly that value
+            self.value = price
+        else:
+            self.value = self.total / self.window
+        return self.value
+
+class WMAUpdater(_WindowUpdater):
+    """Linearly weighted moving average (newest weight = window)."""
+
+    ma_type = "WMA"
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.total = 0.0
+        self.weighted = 0.0
+        self.divisor = self.window * (self.window + 1) / 2
+
+    def update(self, price):
+        price = float(price)
+        evicted = self._push(price)
+        if self.count < self.window:
+            self.value = np.nan
+            return self.value
+
+        if evicted is None or evicted != evicted or self.head == 0 or self.nans:
+            # Re-sum on the first full window, around NaNs and once per lap
+            prices = self._ordered()
+            self.total = sum(p for p in prices if p == p)
+            self.weighted = sum(w * p for w, p in enumerate(prices, start=1) if p == p)
+        else:
+            # Every weight drops by one and the evicted price (weight 1) leaves
+            self.weighted += self.window * price - self.total
+            self.total += price - evicted
+
+        self.value = np.nan if self.nans else self.weighted / self.divisor
+        return self.value
+
+class EMAUpdater:
+    """Exponential moving average, the recursion pandas ewm(adjust=False) runs."""
+
+    ma_type = "EMA"
+
+    def __init__(self, span):
+        if span < 1:
+            raise ValueError("span must be >= 1")
+        self.window = int(span)
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = np.nan
+        self.old_weight = 1.0
+
+    def update(self, price):
+        price = float(price)
+        if self.value != self.value:
+            if price == price:
+                self.value = price
+            return self.value
+
+        # Missing bars decay the old weight, as with ignore_na=False
+        self.old_weight *= 1.0 - self.alpha
+        if price == price:
+            # pandas re-weights the new bar after gaps when com == 1 (span 3)
+            new_weight = 1.0 - self.old_weight if self.window == 3 else self.alpha
+            if self.value != price:
+                self.value = (self.old_weight * self.value + new_weight * price) / (self.old_weight + new_weight)
+            self.old_weight = 1.0
+        return self.value
+
+    def to_dict(self):
+        return {"ma_type": self.ma_type, "window": self.window,
+                "value": self.value, "old_weight": self.old_weight}
+
+    @classmethod
+    def from_dict(cls, state):
+        updater = cls(state["window"])
+        updater.value = state["value"]
+        updater.old_weight = state["old_weight"]
+        return updater
+
+UPDATERS = {"SMA": SMAUpdater, "EMA": EMAUpdater, "WMA": WMAUpdater}
+
+def make_updater(ma_type, window):
+    updater = UPDATERS.get(ma_type.upper())
+    if updater is None:
+        raise ValueError("ma_type must be SMA, EMA, or WMA")
+    return updater(window)
+
+def updater_from_dict(state):
+    return UPDATERS[state["ma_type"]].from_dict(state)
+
+# ---------- DataFrame Helpers ----------
+def compute_sma(df, column="Close", window=20):
+    return pd.Series(moving_average(df[column].to_numpy(dtype=float), "SMA", window), index=df.index)
+
+def compute_ema(df, column="Close", span=20):
+    return pd.Series(moving_average(df[column].to_numpy(dtype=float), "EMA", span), index=df.index)
+
+def compute_wma(df, column="Close", window=20):
+    return pd.Series(moving_average(df[column].to_numpy(dtype=float), "WMA", window), index=df.index)
+
+# ---------- Feature Builders ----------
+def add_moving_averages(df, ma_type="SMA", fast=10, slow=20):
+    """Adds MA_Fast / MA_Slow of Close."""
+    df = df.copy()
+    close = df["Close"].to_numpy(dtype=float)
+    df["MA_Fast"] = moving_average(close, ma_type, fast)
+    df["MA_Slow"] = moving_average(close, ma_type, slow)
+    return df
+
+def generate_signals(df, binary=False):
+    """
+    Adds Signal (+1 fast above slow, -1 below) and Crossover (Signal diff).
+    Ties and warm-up bars are 0, or -1 with binary=True (the optimizers'
+    np.where(fast > slow, 1, -1) convention).
+    """
+    df = df.copy()
+    fast = df["MA_Fast"].to_numpy(dtype=float)
+    slow = df["MA_Slow"].to_numpy(dtype=float)
+    if binary:
+        df["Signal"] = np.where(fast > slow, 1, -1)
+    else:
+        df["Signal"] = np.where(fast > slow, 1, np.where(fast < slow, -1, 0))
+    df["Crossover"] = df["Signal"].diff()
+    return df
+
+def add_crossover_signals(df, ma_type="EMA", fast=10, slow=20, binary=False):
+    """MA columns plus Signal / Crossover in one call."""
+    return generate_signals(add_moving_averages(df, ma_type, fast, slow), binary=binary)
@@ -1,26 +1,43 @@
 import os
+import sys
 import pandas as pd
+from functools import partial
 from optimize_ma import optimize_ma_windows
+from storage import list_symbols
+from panel import panel_handoff, attach_panel
+from universe import select_from_argv
+from parallel import run_tasks, report_errors, save_errors, workers_from_argv
+
+def optimize_task(task, ma_pairs=None):
+    symbol, ma_type = task
+    return optimize_ma_windows(symbol, ma_pairs=ma_pairs, ma_type=ma_type)
 
 def run_all_optimizations(
     processed_dir="data/processed",
     ma_types=["EMA", "SMA"],
-    ma_pairs=None
+    ma_pairs=None,
+    symbols=None,
+    workers=None
 ):
     if ma_pairs is None:
         ma_pairs = [(10, 20), (12, 26), (20, 50), (50, 100), (50, 200)]
 
-    all_results = []
+    # Default: every processed symbol; a universe selection is cut to those
+    available = list_symbols(processed_dir)
+    symbols = available if symbols is None else [s for s in symbols if s in set(available)]
+
+    os.makedirs("reports", exist_ok=True)
 
-    files = [f for f in os.listdir(processed_dir) if f.endswith(".csv")]
-    for file in files:
-        symbol = file.replace(".csv", "")
-        for ma_type in ma_types:
-            try:
-                df_res = optimize_ma_windows(symbol, ma_pairs=ma_pairs, ma_type=ma_type)
-                all_results.append(df_res)
-            except Exception as e:
-                print(f"⚠️ Error optimizing {symbol} ({ma_type}): {e}")
+    # One task per (symbol, MA type), results in that order
+    tasks = [(symbol, ma_type) for symbol in symbols for ma_type in ma_types]
+    with panel_handoff() as handle:
+        results = run_tasks(
+            partial(optimize_task, ma_pairs=ma_pairs), tasks, workers,
+            initializer=attach_panel, initargs=(handle,),
+        )
+    label = lambda task: f"{task[0]} ({task[1]})"
+    failed = report_errors(results, label)
+    all_results = [r["result"] for r in results if r["error"] is None]
 
     # Combine all results
     combined = pd.concat(all_results, ignore_index=True)
@@ -29,12 +46,15 @@ def run_all_optimizations(
     best_per_stock = combined.sort_values(["Symbol", "Return"], ascending=[True, False]).groupby("Symbol").head(1)
     
     # Save all + best results
-    os.makedirs("reports", exist_ok=True)
     combined.to_csv("reports/all_optimization_results.csv", index=False)
     best_per_stock.to_csv("reports/best_per_stock.csv", index=False)
+    save_errors(failed, "reports/optimization_errors.csv", label)
 
     print("✅ All optimization results saved to reports/all_optimization_results.csv")
     print("🏆 Best-performing setups per stock saved to reports/best_per_stock.csv")
 
 if __name__ == "__main__":
-    run_all_optimizations()
+    run_all_optimizations(
+        symbols=select_from_argv() if {"--universe", "--shard"} & set(sys.argv) else None,
+        workers=workers_from_argv(),
+    )
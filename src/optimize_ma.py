@@ -1,27 +1,6 @@
 import pandas as pd
-from backtest import backtest_strategy
-
-# ---------- Function to Recompute MAs ----------
-def add_moving_averages(df, ma_type="EMA", fast=10, slow=20):
-    df = df.copy()
-
-    # Calculate moving averages
-    if ma_type.upper() == "SMA":
-        df["MA_Fast"] = df["Close"].rolling(window=fast).mean()
-        df["MA_Slow"] = df["Close"].rolling(window=slow).mean()
-    elif ma_type.upper() == "EMA":
-        df["MA_Fast"] = df["Close"].ewm(span=fast, adjust=False).mean()
-        df["MA_Slow"] = df["Close"].ewm(span=slow, adjust=False).mean()
-    else:
-        raise ValueError("ma_type must be SMA or EMA")
-
-    # Generate signals and crossovers
-    df["Signal"] = 0
-    df.loc[df["MA_Fast"] > df["MA_Slow"], "Signal"] = 1
-    df.loc[df["MA_Fast"] < df["MA_Slow"], "Signal"] = -1
-    df["Crossover"] = df["Signal"].diff()
-
-    return df
+from batch_backtest import backtest_batch, param_grid
+from panel import load_bars, recent_window
 
 # ---------- Optimizer Function ----------
 def optimize_ma_windows(symbol="INFY.NS", ma_pairs=None, ma_type="EMA"):
@@ -29,29 +8,30 @@ def optimize_ma_windows(symbol="INFY.NS", ma_pairs=None, ma_type="EMA"):
         ma_pairs = [(10, 20), (12, 26), (20, 50), (50, 100), (50, 200)]
 
     # Load data
-    df = pd.read_csv(f"data/processed/{symbol}.csv")
-    df["Date"] = pd.to_datetime(df["Date"])
-    df_recent = df[df["Date"] >= (df["Date"].max() - pd.DateOffset(months=3))]
+    df = load_bars(symbol)
+    df_recent = recent_window(df, months=3)
 
-    results = []
-
-    # Loop over MA pairs
-    for fast, slow in ma_pairs:
-        df_pair = add_moving_averages(df_recent, ma_type=ma_type, fast=fast, slow=slow)
+    if ma_type.upper() not in ("SMA", "EMA"):
+        raise ValueError("ma_type must be SMA or EMA")
 
-        metrics, _ = backtest_strategy(
-            df_pair,
-            exit_mode="time",
-            hold_days=7,
-            stop_loss=0.03,
-            take_profit=0.05,
-            cost_bps=15
-        )
+    results = []
 
+    # Evaluate all MA pairs in one batched backtest
+    grid = param_grid(
+        ma_types=[ma_type],
+        ma_pairs=ma_pairs,
+        stop_loss=[0.03],
+        take_profit=[0.05],
+        hold_days=[7],
+        cost_bps=[15]
+    )
+    batch = backtest_batch(df_recent, grid, exit_mode="time")
+
+    for metrics in batch.to_dict("records"):
         results.append({
             "Symbol": symbol,
             "MA_Type": ma_type,
-            "MA_Pair": f"{fast}/{slow}",
+            "MA_Pair": f"{metrics['fast']}/{metrics['slow']}",
             "Return": metrics["Total Return"],
             "WinRate": metrics["Win Rate"],
             "Sharpe": metrics["Sharpe Ratio"],
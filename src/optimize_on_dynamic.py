@@ -1,42 +1,11 @@
 import pandas as pd
 import numpy as np
-from backtest import backtest_strategy
-
-# ---------- Helper: Compute Volatility ----------
-def compute_volatility(df, window=20):
-    """Rolling volatility (standard deviation of daily returns)."""
-    return df["Close"].pct_change().rolling(window).std().iloc[-1]
-
-# ---------- Helper: Compute Trend Strength ----------
-def compute_trend_strength(df, window=20):
-    """
-    Measures % change in price over last N days.
-    Approximation of trend direction & strength (like a simple ADX proxy).
-    """
-    if len(df) < window:
-        return 0
-    start_price = df["Close"].iloc[-window]
-    end_price = df["Close"].iloc[-1]
-    return abs(end_price - start_price) / start_price
-
-# ---------- Add Moving Averages ----------
-def add_moving_averages(df, ma_type="EMA", fast=10, slow=20):
-    df = df.copy()
-    if ma_type.upper() == "EMA":
-        df["MA_Fast"] = df["Close"].ewm(span=fast, adjust=False).mean()
-        df["MA_Slow"] = df["Close"].ewm(span=slow, adjust=False).mean()
-    elif ma_type.upper() == "SMA":
-        df["MA_Fast"] = df["Close"].rolling(window=fast).mean()
-        df["MA_Slow"] = df["Close"].rolling(window=slow).mean()
-    else:
-        raise ValueError("ma_type must be EMA or SMA")
-
-    # Signals
-    df["Signal"] = 0
-    df.loc[df["MA_Fast"] > df["MA_Slow"], "Signal"] = 1
-    df.loc[df["MA_Fast"] < df["MA_Slow"], "Signal"] = -1
-    df["Crossover"] = df["Signal"].diff()
-    return df
+from batch_backtest import backtest_batch, param_grid
+from regime import compute_volatility, compute_trend_strength
+from panel import load_bars, recent_window, panel_handoff, attach_panel
+from universe import select_from_argv
+from parallel import run_tasks, report_errors, save_errors, workers_from_argv
+import sys
 
 # ---------- Smart MA Selector ----------
 def select_ma_type(vol, trend, vol_threshold=0.01, trend_threshold=0.05):
@@ -57,9 +26,8 @@ def optimize_dynamic_trend(symbol, ma_pairs=None, vol_threshold=0.01, trend_thre
 
     print(f"\n🔍 Running dynamic + trend-aware optimization for {symbol}...")
 
-    df = pd.read_csv(f"data/processed/{symbol}.csv")
-    df["Date"] = pd.to_datetime(df["Date"])
-    df_recent = df[df["Date"] >= (df["Date"].max() - pd.DateOffset(months=3))]
+    df = load_bars(symbol)
+    df_recent = recent_window(df, months=3)
 
     # Compute regime stats
     vol = compute_volatility(df_recent)
@@ -70,23 +38,24 @@ def optimize_dynamic_trend(symbol, ma_pairs=None, vol_threshold=0.01, trend_thre
 
     results = []
 
-    for fast, slow in ma_pairs:
-        df_pair = add_moving_averages(df_recent, ma_type=ma_type, fast=fast, slow=slow)
-        metrics, _ = backtest_strategy(
-            df_pair,
-            exit_mode="time",
-            hold_days=7,
-            stop_loss=0.03,
-            take_profit=0.05,
-            cost_bps=15
-        )
-
+    # All pairs in one batched backtest
+    grid = param_grid(
+        ma_types=[ma_type],
+        ma_pairs=ma_pairs,
+        stop_loss=[0.03],
+        take_profit=[0.05],
+        hold_days=[7],
+        cost_bps=[15]
+    )
+    batch = backtest_batch(df_recent, grid, exit_mode="time")
+
+    for metrics in batch.to_dict("records"):
         results.append({
             "Symbol": symbol,
             "Volatility": round(vol * 100, 2),
             "TrendStrength": round(trend * 100, 2),
             "MA_Type": ma_type,
-            "MA_Pair": f"{fast}/{slow}",
+            "MA_Pair": f"{metrics['fast']}/{metrics['slow']}",
             "Return": metrics["Total Return"],
             "WinRate": metrics["Win Rate"],
             "Sharpe": metrics["Sharpe Ratio"],
@@ -103,19 +72,23 @@ def optimize_dynamic_trend(symbol, ma_pairs=None, vol_threshold=0.01, trend_thre
     return results_df
 
 # ---------- Batch Runner ----------
-def run_all_dynamic_trend(symbols):
-    all_results = []
-    for sym in symbols:
-        try:
-            df_res = optimize_dynamic_trend(sym)
-            all_results.append(df_res.head(1))  # best pair per stock
-        except Exception as e:
-            print(f"⚠️ Error for {sym}: {e}")
+def best_dynamic_trend(symbol):
+    return optimize_dynamic_trend(symbol).head(1)  # best pair per stock
+
+def run_all_dynamic_trend(symbols, workers=None):
+    with panel_handoff() as handle:
+        results = run_tasks(best_dynamic_trend, symbols, workers, initializer=attach_panel, initargs=(handle,))
+    failed = report_errors(results)
+    save_errors(failed, "reports/dynamic_trend_errors.csv")
+    all_results = [r["result"] for r in results if r["error"] is None]
     if all_results:
         final = pd.concat(all_results, ignore_index=True)
         final.to_csv("reports/best_dynamic_trend_summary.csv", index=False)
         print("\n🏆 Saved final summary → reports/best_dynamic_trend_summary.csv")
+        return final
 
 if __name__ == "__main__":
     symbols = ["ADANIENT.NS", "HDFCBANK.NS", "INFY.NS", "TCS.NS", "RELIANCE.NS","ICICIBANK.NS", "ITC.NS", "MARUTI.NS","TATASTEEL.NS","LT.NS","SBI.NS"]
-    run_all_dynamic_trend(symbols)
+    if {"--universe", "--shard"} & set(sys.argv):
+        symbols = select_from_argv()
+    run_all_dynamic_trend(symbols, workers=workers_from_argv())
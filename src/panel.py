@@ -0,0 +1,334 @@
+# Aligned dates x symbols price matrices for cross-sectional work.
+#
+#   python src/panel.py [source_dir]   builds the memory-mapped panel in data/panel
+#                                      from data/processed (or source_dir); skipped
+#                                      when up to date unless --force
+
+import os
+import sys
+import json
+import shutil
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from storage import list_symbols, read_prices, session_dates, session_days
+
+# ---------- PATH SETUP ----------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+
+PROCESSED_DATA_DIR = os.path.join(PROJECT_ROOT, "data", "processed")
+PANEL_DIR = os.path.join(PROJECT_ROOT, "data", "panel")
+
+PRICE_FIELDS = ("Open", "High", "Low", "Close", "Volume")
+
+# ---------- Panel Container ----------
+class PricePanel:
+    """
+    One (dates x symbols) float matrix per field on a shared, sorted date index.
+    Cells are NaN where a symbol has no bar (not yet listed, or a gap). source
+    is the absolute path of the directory the prices were read from, if known.
+    """
+
+    def __init__(self, dates, symbols, fields, source=None):
+        self.dates = pd.DatetimeIndex(dates)
+        self.symbols = list(symbols)
+        self.fields = dict(fields)
+        self.source = source
+        self.symbol_index = {sym: i for i, sym in enumerate(self.symbols)}
+
+    def __getitem__(self, field):
+        return self.fields[field]
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def shape(self):
+        return len(self.dates), len(self.symbols)
+
+    def slice_dates(self, start=None, end=None):
+        """
+        Bars with start <= date <= end as a PricePanel of views (binary search
+        on the date index, nothing is copied).
+        """
+        i, k = window_bounds(self.dates, start, end)
+        fields = {field: values[i:k] for field, values in self.fields.items()}
+        return PricePanel(self.dates[i:k], self.symbols, fields, self.source)
+
+    def column(self, field, symbol):
+        """One symbol's values for field over every panel date (a view)."""
+        return self.fields[field][:, self.symbol_index[symbol]]
+
+    def frame(self, field):
+        """One field as a dates x symbols DataFrame."""
+        return pd.DataFrame(self.fields[field], index=self.dates, columns=self.symbols)
+
+    def symbol_frame(self, symbol):
+        """A single symbol's bars in the per-symbol CSV layout (Date + fields)."""
+        j = self.symbol_index[symbol]
+        rows = ~np.isnan(self.fields["Close"][:, j])
+        data = {"Date": self.dates[rows]}
+        for field, values in self.fields.items():
+            data[field] = np.asarray(values[:, j], dtype=float)[rows]
+        return pd.DataFrame(data)
+
+# ---------- Date Windows ----------
+def window_bounds(dates, start=None, end=None):
+    """Row range [i, k) of start <= date <= end in a sorted date array."""
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    i = 0 if start is None else np.searchsorted(dates, pd.Timestamp(start).to_datetime64(), side="left")
+    k = len(dates) if end is None else np.searchsorted(dates, pd.Timestamp(end).to_datetime64(), side="right")
+    return int(i), int(max(i, k))
+
+def date_window(df, start=None, end=None):
+    """Rows of a Date-sorted frame with start <= Date <= end, as a positional slice."""
+    i, k = window_bounds(df["Date"].to_numpy(), start, end)
+    return df.iloc[i:k]
+
+def recent_window(df, months=3, days=None):
+    """
+    The trailing window of a Date-sorted frame: every bar on or after its
+    last date minus `months` (or `days`, when given).
+    """
+    if df.empty:
+        return df
+    last = df["Date"].iloc[-1]
+    start = last - (pd.Timedelta(days=days) if days is not None else pd.DateOffset(months=months))
+    return date_window(df, start)
+
+# ---------- Loader ----------
+def load_price_panel(data_dir=PROCESSED_DATA_DIR, symbols=None, fields=PRICE_FIELDS):
+    """
+    Reads per-symbol price files into a PricePanel aligned on the union of
+    their dates. symbols defaults to every symbol stored in data_dir.
+    """
+    if symbols is None:
+        symbols = list_symbols(data_dir)
+
+    frames = {}
+    for sym in symbols:
+        try:
+            frames[sym] = read_prices(data_dir, sym, columns=["Date", *fields])
+        except FileNotFoundError:
+            continue
+    return panel_from_frames(frames, fields, source=data_dir)
+
+def panel_from_frames(frames, fields=PRICE_FIELDS, source=None):
+    """
+    A PricePanel from {symbol: bars DataFrame} already in memory; source is
+    the directory the frames are (or will be) stored in.
+    """
+    columns = {field: {} for field in fields}
+    loaded = []
+    for sym, df in frames.items():
+        df = df[["Date", *fields]].drop_duplicates("Date", keep="last").set_index("Date").sort_index()
+        for field in fields:
+            columns[field][sym] = df[field].astype(float)
+        loaded.append(sym)
+
+    matrices = {}
+    dates = None
+    for field in fields:
+        frame = pd.concat(columns[field], axis=1).sort_index() if loaded else pd.DataFrame()
+        dates = frame.index
+        matrices[field] = frame.reindex(columns=loaded).to_numpy(dtype=float)
+
+    source = os.path.abspath(source) if source is not None else None
+    return PricePanel(dates if dates is not None else [], loaded, matrices, source)
+
+# ---------- Memory-Mapped Panel ----------
+# data/panel holds one dates x symbols float64 .npy per field, dates.npy (int64
+# session days) and meta.json (symbols, fields, source dir). Opening it maps the
+# files read-only, so no price file is parsed and slices are views into the
+# page cache.
+
+def build_panel(source_dir=PROCESSED_DATA_DIR, out_dir=PANEL_DIR, symbols=None, fields=PRICE_FIELDS):
+    """Aligns every symbol in source_dir and writes the memory-mapped panel."""
+    panel = load_price_panel(source_dir, symbols=symbols, fields=fields)
+    return write_panel(panel, out_dir, source_dir)
+
+def write_panel(panel, out_dir=PANEL_DIR, source_dir=None):
+    """
+    Writes an in-memory PricePanel as the memory-mapped panel of source_dir
+    (default: the panel's own source).
+    """
+    fields = list(panel.fields)
+    source_dir = source_dir or panel.source
+    if source_dir is None:
+        raise ValueError("write_panel needs the source_dir the panel was read from")
+
+    # Written next to out_dir and swapped in whole so readers never see half a panel
+    tmp_dir = f"{out_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "dates.npy"), session_days(panel.dates))
+    for field in fields:
+        out = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, f"{field}.npy"), mode="w+", dtype=np.float64, shape=panel.shape
+        )
+        out[:] = panel[field]
+        out.flush()
+        del out
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump({"source": os.path.abspath(source_dir), "symbols": panel.symbols, "fields": list(fields)}, f)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    _shared_panel.clear()
+    print(f"OK panel {panel.shape[0]} dates x {panel.shape[1]} symbols -> {out_dir}")
+    return out_dir
+
+def open_panel(panel_dir=PANEL_DIR, mmap_mode="r"):
+    """Maps a built panel without reading it; raises FileNotFoundError if absent."""
+    meta_path = os.path.join(panel_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        raise FileNotFoundError(f"No panel in {panel_dir} (run python src/panel.py)")
+    with open(meta_path) as f:
+        meta = json.load(f)
+    dates = session_dates(np.load(os.path.join(panel_dir, "dates.npy")))
+    fields = {
+        field: np.load(os.path.join(panel_dir, f"{field}.npy"), mmap_mode=mmap_mode)
+        for field in meta["fields"]
+    }
+    return PricePanel(dates, meta["symbols"], fields, meta["source"])
+
+def _panel_meta(panel_dir=PANEL_DIR):
+    meta_path = os.path.join(panel_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+def mapped_source(panel_dir=PANEL_DIR):
+    """The source dir recorded in a built panel's meta.json, or None."""
+    meta = _panel_meta(panel_dir)
+    return None if meta is None else meta["source"]
+
+def panel_is_stale(panel_dir=PANEL_DIR):
+    """
+    True if the panel is missing, its source dir is gone, a file was added to
+    or removed from it since the build, one of the panel's symbols has no file
+    there any more, or a file there is newer.
+    """
+    meta = _panel_meta(panel_dir)
+    if meta is None or not os.path.isdir(meta["source"]):
+        return True
+    source = meta["source"]
+    built = os.path.getmtime(os.path.join(panel_dir, "meta.json"))
+    # Adding, deleting or renaming a file updates the directory's mtime
+    if os.path.getmtime(source) > built:
+        return True
+    if not set(meta["symbols"]) <= set(list_symbols(source)):
+        return True
+    return any(entry.stat().st_mtime > built for entry in os.scandir(source) if entry.is_file())
+
+# {panel_dir: (panel version, mapped panel or None)}
+_shared_panel = {}
+
+def _panel_version(panel_dir):
+    """(meta.json mtime, source dir mtime): changes when the panel is rebuilt or a source file replaced."""
+    source = mapped_source(panel_dir)
+    if source is None:
+        return None
+    meta_mtime = os.stat(os.path.join(panel_dir, "meta.json")).st_mtime_ns
+    return meta_mtime, os.stat(source).st_mtime_ns if os.path.isdir(source) else None
+
+def shared_panel(panel_dir=PANEL_DIR):
+    """
+    The process-wide mapped panel, or None when it is missing or stale.
+    Checked again (and re-opened) once the panel is rebuilt or its source
+    directory changes.
+    """
+    version = _panel_version(panel_dir)
+    cached = _shared_panel.get(panel_dir)
+    if cached is None or cached[0] != version:
+        _shared_panel[panel_dir] = (version, None if panel_is_stale(panel_dir) else open_panel(panel_dir))
+    return _shared_panel[panel_dir][1]
+
+# ---------- Worker Handoff ----------
+# A process pool gets the prices once, up front: the parent publishes a panel
+# and each worker attaches to it in its initializer, so tasks carry only
+# symbols and grids and no worker parses a price file. A fresh mapped panel of
+# data_dir is handed over by path (every worker maps the same page-cache
+# pages); otherwise data_dir is loaded once into multiprocessing.shared_memory
+# blocks that the workers wrap as arrays without copying.
+
+_attached = {"panel": None, "blocks": []}
+
+def _publish_shared(panel):
+    blocks, specs = [], {}
+    for field, values in panel.fields.items():
+        values = np.ascontiguousarray(values, dtype=np.float64)
+        block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+        np.ndarray(values.shape, dtype=np.float64, buffer=block.buf)[:] = values
+        blocks.append(block)
+        specs[field] = (block.name, values.shape)
+    handle = {"dates": session_days(panel.dates), "symbols": panel.symbols, "fields": specs,
+              "source": panel.source}
+    return handle, blocks
+
+@contextmanager
+def panel_handoff(data_dir=PROCESSED_DATA_DIR, panel_dir=PANEL_DIR, panel=None):
+    """
+    Publishes the prices load_bars would read (or `panel`, one already in
+    memory) and yields a small picklable handle for attach_panel();
+    shared-memory blocks are freed on exit.
+    """
+    if panel is not None:
+        handle, blocks = _publish_shared(panel)
+    elif mapped_source(panel_dir) == os.path.abspath(data_dir) and not panel_is_stale(panel_dir):
+        handle, blocks = {"panel_dir": panel_dir}, []
+    else:
+        handle, blocks = _publish_shared(load_price_panel(data_dir))
+    try:
+        yield handle
+    finally:
+        detach_panel()
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+def attach_panel(handle):
+    """Pool initializer: makes load_bars read from the published panel."""
+    detach_panel()
+    if "panel_dir" in handle:
+        _attached["panel"] = open_panel(handle["panel_dir"])
+        return
+    fields = {}
+    for field, (name, shape) in handle["fields"].items():
+        block = shared_memory.SharedMemory(name=name)
+        _attached["blocks"].append(block)
+        fields[field] = np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+        fields[field].flags.writeable = False
+    _attached["panel"] = PricePanel(session_dates(handle["dates"]), handle["symbols"], fields, handle["source"])
+
+def detach_panel():
+    _attached["panel"] = None
+    for block in _attached["blocks"]:
+        block.close()
+    _attached["blocks"] = []
+
+def load_bars(symbol, data_dir=PROCESSED_DATA_DIR, panel_dir=PANEL_DIR):
+    """
+    A symbol's OHLCV bars: from the attached worker panel or the mapped panel
+    when it was built from data_dir, is fresh and holds the symbol, otherwise
+    from its file in data_dir.
+    """
+    panel = _attached["panel"]
+    if panel is None:
+        panel = shared_panel(panel_dir)
+    if panel is not None and panel.source == os.path.abspath(data_dir) and symbol in panel.symbol_index:
+        return panel.symbol_frame(symbol)
+    return read_prices(data_dir, symbol)
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    # Rebuilt only when a source file changed since the last build (or --force)
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if "--force" in sys.argv or args or panel_is_stale():
+        build_panel(args[0] if args else PROCESSED_DATA_DIR)
+    else:
+        print(f"OK panel up to date -> {PANEL_DIR}")
@@ -0,0 +1,217 @@
+# Cross-sectional panel backtest: the dynamic trend/noise MA crossover strategy
+# for the whole symbol universe as a handful of (bars x symbols) matrix
+# operations instead of one DataFrame pipeline per symbol.
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+from batch_backtest import simulate_batch
+from moving_averages import ma_bank, crossover_matrix
+from optimize_on_dynamic_noise import select_ma_type, select_ma_types, report_tag, REPORTS_DIR
+from panel import load_price_panel
+from regime import rolling_volatility, rolling_trend_strength, rolling_noise_ratio
+from universe import select_from_argv
+
+DEFAULT_MA_PAIRS = [(10, 20), (12, 26), (20, 50), (50, 100), (50, 200)]
+
+# ---------- Bar Alignment ----------
+def align_recent_bars(panel, months=3):
+    """
+    Re-stacks each symbol's last `months` of bars (measured from its own last
+    bar, like the per-symbol optimizers) at the bottom of the matrices.
+    Late listings and date gaps become leading NaN padding, so rolling and
+    EWM windows see exactly the bars a per-symbol run would.
+    Returns a dict with Dates / Open / High / Low / Close (bars x symbols),
+    the boolean `valid` mask and `bars` (bar count per symbol).
+    """
+    close = panel["Close"]
+    has_bar = ~np.isnan(close)
+    n_dates, n_symbols = close.shape
+    dates = panel.dates.as_unit("ns").to_numpy()
+
+    last_row = n_dates - 1 - np.argmax(has_bar[::-1], axis=0)
+    start = pd.DatetimeIndex(dates[last_row]) - pd.DateOffset(months=months)
+    in_window = has_bar & (dates[:, None] >= start.to_numpy()[None, :])
+    in_window[:, ~has_bar.any(axis=0)] = False
+
+    # Stable sort of the mask moves window rows to the bottom, order intact
+    order = np.argsort(in_window, axis=0, kind="stable")
+    bars = in_window.sum(axis=0)
+    depth = int(bars.max()) if n_symbols else 0
+    order = order[n_dates - depth:]
+    valid = np.take_along_axis(in_window, order, axis=0)
+
+    aligned = {"valid": valid, "bars": bars}
+    aligned["Dates"] = np.where(valid, dates[order], np.datetime64("NaT", "ns"))
+    for field in ("Open", "High", "Low", "Close"):
+        aligned[field] = np.where(valid, np.take_along_axis(panel[field], order, axis=0), np.nan)
+    return aligned
+
+# ---------- Regime Stats ----------
+def panel_regime(close, window=20):
+    """
+    Volatility, trend strength and noise ratio at the last bar of every column
+    of a bottom-aligned close matrix (same definitions as the per-symbol helpers).
+    """
+    # Only the last window + 1 bars reach the final value, as in compute_*()
+    tail = close[-(window + 1):]
+    return (
+        rolling_volatility(tail, window)[-1],
+        rolling_trend_strength(tail, window)[-1],
+        rolling_noise_ratio(tail, window)[-1],
+    )
+
+# ---------- Signals ----------
+def panel_ma_bank(close, use_ema, windows):
+    """
+    (bars x symbols x windows) MA bank: EMA on the columns flagged in use_ema,
+    SMA elsewhere. Each window is computed once for every pair that uses it.
+    A (bars x symbols) use_ema switches type per bar (adaptive mode).
+    """
+    if use_ema.ndim == 2:
+        return np.where(use_ema[:, :, None], ma_bank(close, windows, "EMA"), ma_bank(close, windows, "SMA"))
+
+    bank = np.empty(close.shape + (len(windows),))
+    for ma_type, columns in (("EMA", use_ema), ("SMA", ~use_ema)):
+        bank[:, columns] = ma_bank(close[:, columns], windows, ma_type)
+    return bank
+
+def panel_crossovers(ma_fast, ma_slow, valid):
+    """
+    Crossover matrix for one (fast, slow) pair (np.where(fast > slow, 1, -1)),
+    NaN on padding rows and on the first bar of each symbol.
+    """
+    crossover = crossover_matrix(ma_fast, ma_slow, binary=True)
+    # The first bar of each symbol has no previous signal
+    crossover[1:][~valid[:-1]] = np.nan
+    crossover[~valid] = np.nan
+    return crossover
+
+# ---------- Panel Backtest ----------
+def backtest_panel(
+    aligned,
+    use_ema,
+    ma_pairs=None,
+    exit_mode="time",
+    hold_days=7,
+    stop_loss=0.03,
+    take_profit=0.05,
+    cost_bps=15
+):
+    """
+    Runs every (fast, slow) pair for every symbol in one simulate_batch() call.
+    use_ema flags EMA symbols, or (bars x symbols) per-bar types when adaptive.
+    Returns {(fast, slow): metrics dict of per-symbol arrays}.
+    """
+    if ma_pairs is None:
+        ma_pairs = DEFAULT_MA_PAIRS
+
+    close, valid = aligned["Close"], aligned["valid"]
+    windows = sorted({w for pair in ma_pairs for w in pair})
+    bank = panel_ma_bank(close, use_ema, windows)
+    slow_blocks, cross_blocks = [], []
+    for fast, slow in ma_pairs:
+        ma_slow = bank[:, :, windows.index(slow)]
+        slow_blocks.append(ma_slow)
+        cross_blocks.append(panel_crossovers(bank[:, :, windows.index(fast)], ma_slow, valid))
+
+    reps = (1, len(ma_pairs))
+    metrics = simulate_batch(
+        np.tile(aligned["Dates"], reps),
+        np.tile(aligned["Open"], reps),
+        np.tile(aligned["High"], reps),
+        np.tile(aligned["Low"], reps),
+        np.tile(close, reps),
+        np.hstack(cross_blocks),
+        np.hstack(slow_blocks),
+        cost_bps=cost_bps,
+        exit_mode=exit_mode,
+        hold_days=hold_days,
+        stop_loss=stop_loss,
+        take_profit=take_profit,
+        valid=np.tile(valid, reps)
+    )
+
+    n_symbols = close.shape[1]
+    return {
+        pair: {name: values[p * n_symbols:(p + 1) * n_symbols] for name, values in metrics.items()}
+        for p, pair in enumerate(ma_pairs)
+    }
+
+# ---------- Universe Optimizer ----------
+def optimize_panel_dynamic_trend_noise(panel=None, symbols=None, ma_pairs=None,
+                                       min_bars=50, write_reports=True, adaptive=False):
+    """
+    Panel equivalent of run_all_dynamic_trend_noise(): regime stats, EMA/SMA
+    choice and every MA pair for all symbols at once. Writes the same per-symbol
+    reports and best_*_summary.csv; returns the summary. adaptive=True switches
+    EMA/SMA per bar from the rolling regime, like the per-symbol adaptive mode.
+    """
+    if ma_pairs is None:
+        ma_pairs = DEFAULT_MA_PAIRS
+    if panel is None:
+        panel = load_price_panel(symbols=symbols)
+
+    aligned = align_recent_bars(panel)
+    enough = aligned["bars"] >= min_bars
+    for sym in np.array(panel.symbols)[~enough]:
+        print(f"! {sym}: Not enough recent data")
+
+    vol, trend, noise = panel_regime(aligned["Close"])
+    ma_types = np.array([select_ma_type(v, t, z) for v, t, z in zip(vol, trend, noise)])
+    use_ema = ma_types == "EMA"
+    if adaptive:
+        close = aligned["Close"]
+        use_ema = select_ma_types(
+            rolling_volatility(close), rolling_trend_strength(close), rolling_noise_ratio(close)
+        ) == "EMA"
+        ema_share = np.where(aligned["valid"], use_ema, False).sum(axis=0) / np.maximum(aligned["bars"], 1)
+        ma_types = np.full(len(ma_types), "ADAPTIVE")
+    by_pair = backtest_panel(aligned, use_ema, ma_pairs)
+
+    best = []
+    for j, sym in enumerate(panel.symbols):
+        if not enough[j]:
+            continue
+        rows = []
+        for fast, slow in ma_pairs:
+            metrics = by_pair[(fast, slow)]
+            rows.append({
+                "Symbol": sym,
+                "Volatility": round(vol[j] * 100, 2),
+                "TrendStrength": round(trend[j] * 100, 2),
+                "Noise": round(noise[j] * 100, 2),
+                "MA_Type": ma_types[j],
+                "MA_Pair": f"{fast}/{slow}",
+                "Return": metrics["Total Return"][j],
+                "WinRate": metrics["Win Rate"][j],
+                "Sharpe": metrics["Sharpe Ratio"][j],
+                "MaxDD": metrics["Max Drawdown"][j],
+                "Trades": metrics["Trades"][j]
+            })
+            if adaptive:
+                rows[-1]["EMA_Share"] = round(ema_share[j] * 100, 2)
+
+        results_df = pd.DataFrame(rows).sort_values("Return", ascending=False)
+        if write_reports:
+            out_path = os.path.join(
+                REPORTS_DIR,
+                f"{sym.replace('.', '_')}_{report_tag(adaptive)}_optimization.csv"
+            )
+            results_df.to_csv(out_path, index=False)
+        best.append(results_df.head(1))
+
+    if not best:
+        return pd.DataFrame()
+
+    final = pd.concat(best, ignore_index=True)
+    if write_reports:
+        final.to_csv(os.path.join(REPORTS_DIR, f"best_{report_tag(adaptive)}_summary.csv"), index=False)
+        print(f"OK Panel optimization saved for {len(final)} symbols")
+    return final
+
+if __name__ == "__main__":
+    symbols = select_from_argv() if {"--universe", "--shard"} & set(sys.argv) else None
+    optimize_panel_dynamic_trend_noise(symbols=symbols, adaptive="--adaptive" in sys.argv)
@@ -0,0 +1,82 @@
+# Process-pool executor shared by the batch optimizers. Items are sent to the
+# workers in chunks, results come back in input order whatever the worker
+# count, and an exception in one item is captured (with its traceback) in that
+# item's result instead of stopping or silently skipping the batch.
+
+import os
+import csv
+import sys
+import traceback
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+# Worker count when none is given: OPTIMIZER_WORKERS, else every core
+WORKERS_ENV = "OPTIMIZER_WORKERS"
+
+def default_workers():
+    return int(os.getenv(WORKERS_ENV, os.cpu_count() or 1))
+
+def workers_from_argv(argv=None):
+    """--workers N from argv, else default_workers()."""
+    argv = sys.argv[1:] if argv is None else argv
+    return int(argv[argv.index("--workers") + 1]) if "--workers" in argv else default_workers()
+
+# ---------- Tasks ----------
+def _run_one(fn, item):
+    try:
+        return {"item": item, "result": fn(item), "error": None}
+    except Exception:
+        return {"item": item, "result": None, "error": traceback.format_exc()}
+
+def _run_chunk(fn, chunk):
+    return [_run_one(fn, item) for item in chunk]
+
+def run_tasks(fn, items, workers=None, chunksize=None, initializer=None, initargs=()):
+    """
+    fn(item) for every item, as a list of {"item", "result", "error"} dicts in
+    the order of items. fn must be picklable (a module-level function or a
+    functools.partial of one). workers=1 runs in this process; chunksize
+    defaults to about four chunks per worker. initializer(*initargs) runs
+    once in each worker before its first chunk.
+    """
+    items = list(items)
+    workers = min(workers or default_workers(), max(len(items), 1))
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [_run_one(fn, item) for item in items]
+
+    chunksize = chunksize or max(1, -(-len(items) // (workers * 4)))
+    chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        # map() yields chunk results in submission order
+        for chunk_results in pool.map(partial(_run_chunk, fn), chunks):
+            results.extend(chunk_results)
+    return results
+
+def error_message(result):
+    """Last line of a captured traceback (the exception itself)."""
+    return result["error"].strip().splitlines()[-1] if result["error"] else None
+
+def report_errors(results, label=str):
+    """Prints one line per failed item; returns the failed results."""
+    failed = [r for r in results if r["error"] is not None]
+    for r in failed:
+        print(f"! {label(r['item'])}: {error_message(r)}")
+    if failed:
+        print(f"! {len(failed)} of {len(results)} tasks failed")
+    return failed
+
+def save_errors(failed, path, label=str):
+    """Writes failed items and their exceptions to a CSV (removes a stale one when none failed)."""
+    if not failed:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Item", "Error"])
+        for r in failed:
+            writer.writerow([label(r["item"]), error_message(r)])
+    print(f"! Errors saved -> {path}")
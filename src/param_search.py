@@ -0,0 +1,240 @@
+# Budgeted search over the strategy levers the optimizers hard-code (MA type
+# and pair, stop-loss, take-profit, holding period, cost). Every strategy gets
+# a fixed number of backtest_strategy() evaluations per symbol:
+#   random   - uniform sample of the grid
+#   halving  - successive halving: screen many configs on a short history,
+#              re-evaluate the best 1/eta on longer ones
+#   tpe      - Tree-structured Parzen Estimator: after a random start, sample
+#              each lever from the distribution of the best configs so far
+# and logs how many evaluations it saved versus the full grid.
+#
+#   python src/param_search.py [--strategy tpe] [--budget 60] [--objective Sharpe]
+#                              [--universe NAME] [--shard I/N] [--workers N]
+
+import os
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from functools import partial
+
+from backtest import backtest_strategy
+from moving_averages import add_crossover_signals
+from panel import load_bars, recent_window, panel_handoff, attach_panel
+from parallel import run_tasks, report_errors, save_errors
+from universe import select_from_argv
+
+# ---------- PATH SETUP ----------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+
+DATA_DIR = os.path.join(PROJECT_ROOT, "data", "processed")
+REPORTS_DIR = os.path.join(PROJECT_ROOT, "reports")
+
+# Choices per lever. cost_bps is an assumption rather than a lever (searching
+# it just finds the cheapest broker), so it has one value unless widened.
+SEARCH_SPACE = {
+    "ma_type": ["EMA", "SMA"],
+    "fast": [5, 8, 10, 12, 15, 20, 30, 50],
+    "slow": [20, 26, 30, 50, 75, 100, 150, 200],
+    "stop_loss": [0.02, 0.03, 0.05, 0.08],
+    "take_profit": [0.03, 0.05, 0.08, 0.12],
+    "hold_days": [3, 5, 7, 10, 15, 20],
+    "cost_bps": [15],
+}
+OBJECTIVES = {"Return": "Total Return", "Sharpe": "Sharpe Ratio", "WinRate": "Win Rate"}
+STRATEGIES = ("random", "halving", "tpe")
+
+# Histories (months) the halving rungs evaluate on, shortest first; the last
+# one is also what random and tpe evaluate on
+RUNG_MONTHS = (3, 6, 12)
+HALVING_ETA = 3
+TPE_STARTUP = 10
+TPE_GAMMA = 0.25
+TPE_CANDIDATES = 24
+
+# ---------- Search Space ----------
+def valid_config(config):
+    return config["fast"] < config["slow"]
+
+def full_grid(space=SEARCH_SPACE):
+    """Every valid configuration of the space, as dicts."""
+    keys = list(space)
+    configs = (dict(zip(keys, values)) for values in itertools.product(*space.values()))
+    return [c for c in configs if valid_config(c)]
+
+def config_key(config):
+    return tuple(config[k] for k in sorted(config))
+
+# ---------- Evaluation ----------
+class Evaluator:
+    """
+    Backtests configurations on one symbol's bars and counts the calls.
+    Crossover signals are computed on the whole history, so a slow MA is
+    already warm when a short window starts, and cached per (type, fast, slow).
+    """
+
+    def __init__(self, df, objective="Total Return", binary_signal=True):
+        self.df = df.sort_values("Date").reset_index(drop=True)
+        self.objective = objective
+        self.binary_signal = binary_signal
+        self.signals = {}
+        self.evaluations = 0
+        self.log = []
+
+    def __call__(self, config, months=RUNG_MONTHS[-1]):
+        ma = (config["ma_type"], config["fast"], config["slow"])
+        if ma not in self.signals:
+            self.signals[ma] = add_crossover_signals(self.df, *ma, binary=self.binary_signal)
+        metrics, _ = backtest_strategy(
+            recent_window(self.signals[ma], months=months),
+            cost_bps=config["cost_bps"],
+            exit_mode="time",
+            hold_days=config["hold_days"],
+            stop_loss=config["stop_loss"],
+            take_profit=config["take_profit"]
+        )
+        self.evaluations += 1
+        self.log.append({**config, "Months": months, **metrics})
+        return metrics[self.objective]
+
+# ---------- Strategies ----------
+def random_search(evaluate, space, budget, rng):
+    grid = full_grid(space)
+    for i in rng.permutation(len(grid))[:budget]:
+        evaluate(grid[i])
+
+def successive_halving(evaluate, space, budget, rng, eta=HALVING_ETA, rung_months=RUNG_MONTHS):
+    """
+    Starts with as many configs as the budget allows when each rung keeps the
+    best 1/eta of the previous one, so the rungs together spend the budget.
+    """
+    grid = full_grid(space)
+    share = sum(eta ** -r for r in range(len(rung_months)))
+    configs = [grid[i] for i in rng.permutation(len(grid))[:max(1, int(budget / share))]]
+    for months in rung_months:
+        scores = [evaluate(c, months) for c in configs]
+        keep = max(1, len(configs) // eta)
+        configs = [configs[i] for i in np.argsort(scores, kind="stable")[::-1][:keep]]
+
+def tpe_search(evaluate, space, budget, rng, n_startup=TPE_STARTUP, gamma=TPE_GAMMA,
+               n_candidates=TPE_CANDIDATES):
+    """
+    Categorical TPE: each lever's choices get a good (top gamma) and a bad
+    density from the trials so far, smoothed by a uniform prior; candidates are
+    drawn from the good densities and the one with the best good / bad ratio
+    is evaluated next. Levers are treated as independent, as in hyperopt.
+    """
+    grid = full_grid(space)
+    seen, trials = set(), []
+
+    def run(config):
+        seen.add(config_key(config))
+        trials.append((config, evaluate(config)))
+
+    for i in rng.permutation(len(grid))[:min(n_startup, budget)]:
+        run(grid[i])
+
+    while len(trials) < min(budget, len(grid)):
+        ranked = sorted(trials, key=lambda t: t[1], reverse=True)
+        n_good = max(1, int(np.ceil(gamma * len(ranked))))
+        good, bad = [c for c, _ in ranked[:n_good]], [c for c, _ in ranked[n_good:]]
+
+        densities = {}
+        for lever, choices in space.items():
+            good_counts = np.array([sum(c[lever] == x for c in good) for x in choices], dtype=float) + 1
+            bad_counts = np.array([sum(c[lever] == x for c in bad) for x in choices], dtype=float) + 1
+            densities[lever] = (good_counts / good_counts.sum(), bad_counts / bad_counts.sum())
+
+        best, best_score = None, -np.inf
+        for _ in range(n_candidates):
+            picks = {lever: rng.choice(len(choices), p=densities[lever][0])
+                     for lever, choices in space.items()}
+            config = {lever: space[lever][j] for lever, j in picks.items()}
+            if not valid_config(config) or config_key(config) in seen:
+                continue
+            score = sum(np.log(densities[lever][0][j] / densities[lever][1][j]) for lever, j in picks.items())
+            if score > best_score:
+                best, best_score = config, score
+        if best is None:
+            # Every candidate was invalid or already tried: fall back to a random new one
+            unseen = [c for c in grid if config_key(c) not in seen]
+            best = unseen[rng.integers(len(unseen))]
+        run(best)
+
+SEARCHES = {"random": random_search, "halving": successive_halving, "tpe": tpe_search}
+
+# ---------- Optimizer ----------
+def optimize_params(symbol, strategy="tpe", budget=60, space=None, objective="Return",
+                    seed=0, save=True):
+    """
+    Searches one symbol's levers with `budget` backtests and returns every
+    evaluation, best first (on the longest history, then by objective).
+    """
+    if strategy not in SEARCHES:
+        raise ValueError(f"strategy must be one of {', '.join(STRATEGIES)}")
+    space = SEARCH_SPACE if space is None else space
+    df = load_bars(symbol, DATA_DIR)
+    if len(recent_window(df, months=RUNG_MONTHS[0])) < 50:
+        raise ValueError("Not enough recent data")
+
+    evaluate = Evaluator(df, OBJECTIVES.get(objective, objective))
+    SEARCHES[strategy](evaluate, space, budget, np.random.default_rng(seed))
+
+    grid_size = len(full_grid(space))
+    print(f" {symbol}: {strategy} used {evaluate.evaluations} of {grid_size} evaluations "
+          f"({1 - evaluate.evaluations / grid_size:.1%} saved)")
+
+    results = pd.DataFrame(evaluate.log)
+    results.insert(0, "Symbol", symbol)
+    results = results.sort_values(["Months", evaluate.objective], ascending=False, kind="stable")
+    if save:
+        out_path = os.path.join(REPORTS_DIR, f"{symbol.replace('.', '_')}_param_search_{strategy}.csv")
+        results.to_csv(out_path, index=False)
+    return results
+
+def best_params(symbol, **kwargs):
+    """Best evaluation plus the evaluation count, for the batch runner."""
+    results = optimize_params(symbol, **kwargs)
+    return results.head(1).assign(Evaluations=len(results))
+
+# ---------- Batch Runner ----------
+def run_param_search(symbols, strategy="tpe", budget=60, workers=None, **kwargs):
+    with panel_handoff(DATA_DIR) as handle:
+        results = run_tasks(
+            partial(best_params, strategy=strategy, budget=budget, **kwargs), symbols, workers,
+            initializer=attach_panel, initargs=(handle,),
+        )
+    failed = report_errors(results)
+    save_errors(failed, os.path.join(REPORTS_DIR, f"param_search_{strategy}_errors.csv"))
+
+    best = [r["result"] for r in results if r["error"] is None]
+    if not best:
+        return None
+    final = pd.concat(best, ignore_index=True)
+    out_path = os.path.join(REPORTS_DIR, f"best_param_search_{strategy}_summary.csv")
+    final.to_csv(out_path, index=False)
+
+    used = int(final["Evaluations"].sum())
+    full = len(full_grid(kwargs.get("space") or SEARCH_SPACE)) * len(final)
+    print(f"\n {strategy}: {used:,} evaluations instead of {full:,} for the full grid "
+          f"({full - used:,} saved, {1 - used / full:.1%})")
+    print(f"OK Saved -> {out_path}")
+    return final
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Budgeted strategy-parameter search")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="tpe")
+    parser.add_argument("--budget", type=int, default=60)
+    parser.add_argument("--objective", default="Return", help="Return, Sharpe, WinRate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--universe", default=None)
+    parser.add_argument("--shard", default=None)
+    args = parser.parse_args()
+
+    run_param_search(
+        select_from_argv(default=args.universe), args.strategy, args.budget, args.workers,
+        objective=args.objective, seed=args.seed,
+    )
@@ -0,0 +1,172 @@
+# The data pipeline in one process: a small DAG of stages (fetch -> features ->
+# panel -> optimize) run in dependency order, handing DataFrames and the price
+# panel to the next stage in memory. Writing processed files and the mapped
+# panel to disk is optional checkpointing; reports are always written. Each
+# stage's wall time is reported.
+#
+#   python src/pipeline.py [--stages features,optimize] [--skip fetch] [--checkpoint]
+#                          [--force] [--workers N] [--universe NAME] [--shard I/N]
+
+import os
+import time
+import argparse
+from graphlib import TopologicalSorter
+
+from features import (
+    RAW_DATA_DIR, PROCESSED_DATA_DIR, STATE_DIR, MA_TYPE, FAST, SLOW,
+    process_file, write_features, feature_params,
+)
+from storage import list_symbols, find_file, read_file, symbol_path
+from incremental import StageManifest, report_plan
+from panel import PANEL_DIR, panel_from_frames, write_panel, panel_is_stale
+from universe import select_from_argv
+
+# ---------- Stages ----------
+# Each stage is fn(options, inputs) -> output, inputs being {dependency: output}
+# (None for a dependency that was skipped).
+
+def fetch_stage(options, inputs):
+    """Incremental Upstox download into data/raw (the raw files are the source of truth)."""
+    # Imported here: the token and UPSTOX_BASE_URL come from .env before candles reads them
+    from dotenv import load_dotenv
+    load_dotenv()
+    from candles import upstox_headers
+    from fetch_async import fetch_all
+    from universe import instrument_map
+
+    return fetch_all(instrument_map(options["symbols"]), upstox_headers(), verbose=False)
+
+def features_stage(options, inputs):
+    """
+    MA / signal frames for every symbol with raw data: recomputed where the
+    raw file changed, read back from data/processed otherwise. Returns
+    {"frames": {symbol: DataFrame}, "changed": [symbols]}.
+    """
+    available = set(list_symbols(RAW_DATA_DIR))
+    symbols = [s for s in options["symbols"] if s in available]
+    manifest = StageManifest("features")
+    params = feature_params(MA_TYPE, FAST, SLOW, PROCESSED_DATA_DIR)
+    inputs_for = lambda sym: [find_file(RAW_DATA_DIR, sym)]
+    plan = manifest.plan(symbols, inputs_for, params, options["force"])
+    report_plan("features", plan, len(symbols))
+
+    frames = {}
+    for sym in symbols:
+        if sym not in plan:
+            frames[sym] = read_file(find_file(PROCESSED_DATA_DIR, sym))
+            continue
+        frames[sym] = process_file(find_file(RAW_DATA_DIR, sym), MA_TYPE, FAST, SLOW)
+        if options["checkpoint"]:
+            # With the updater state, so an incremental features.py run appends after these bars
+            out_path = symbol_path(PROCESSED_DATA_DIR, sym)
+            state_path = os.path.join(STATE_DIR, f"{sym}.json")
+            write_features(frames[sym], out_path, state_path, MA_TYPE, FAST, SLOW)
+            manifest.record(sym, inputs_for(sym), params, [out_path, state_path])
+    if options["checkpoint"]:
+        manifest.save()
+    return {"frames": frames, "changed": list(plan)}
+
+def panel_stage(options, inputs):
+    """Aligned price panel of the feature frames (or of data/processed if features was skipped)."""
+    features = inputs["features"]
+    if features is None:
+        from panel import load_price_panel
+        panel = load_price_panel(PROCESSED_DATA_DIR, symbols=options["symbols"])
+    else:
+        # The frames are what features writes to data/processed, so that is the panel's source
+        panel = panel_from_frames(features["frames"], source=PROCESSED_DATA_DIR)
+    if options["checkpoint"] and features is not None and (features["changed"] or panel_is_stale()):
+        write_panel(panel, PANEL_DIR)
+    return panel
+
+def optimize_stage(options, inputs):
+    """Dynamic trend / noise optimization over the in-memory panel; returns the summary."""
+    from optimize_on_dynamic_noise import run_all_dynamic_trend_noise
+
+    panel = inputs["panel"]
+    symbols = options["symbols"] if panel is None else panel.symbols
+    # Without checkpoints data/processed may be older than the panel, so the
+    # optimizer's own staleness check cannot see what changed
+    features = inputs.get("features")
+    changed = features is not None and features["changed"]
+    force = options["force"] or (bool(changed) and not options["checkpoint"])
+    return run_all_dynamic_trend_noise(
+        symbols, adaptive=options["adaptive"], workers=options["workers"], force=force, panel=panel
+    )
+
+STAGES = {
+    "fetch": (fetch_stage, ()),
+    "features": (features_stage, ("fetch",)),
+    "panel": (panel_stage, ("features",)),
+    "optimize": (optimize_stage, ("panel", "features")),
+}
+
+# ---------- Runner ----------
+def stage_order(stages=None, skip=()):
+    """
+    The requested stages (default: all) plus everything they depend on, in
+    dependency order, minus the skipped ones.
+    """
+    wanted, todo = set(), list(stages or STAGES)
+    while todo:
+        name = todo.pop()
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage {name!r}; stages: {', '.join(STAGES)}")
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(STAGES[name][1])
+    graph = {name: [d for d in STAGES[name][1] if d in wanted] for name in wanted}
+    return [name for name in TopologicalSorter(graph).static_order() if name not in skip]
+
+def run_pipeline(symbols=None, stages=None, skip=(), checkpoint=False, force=False,
+                 workers=None, adaptive=False, progress=None):
+    """
+    Runs the stages in one process. symbols defaults to the whole universe;
+    progress(stage) is called before each stage (e.g. to update a status
+    line). Returns ({stage: output}, {stage: seconds}).
+    """
+    options = {
+        "symbols": select_from_argv([]) if symbols is None else list(symbols),
+        "checkpoint": checkpoint,
+        "force": force,
+        "workers": workers,
+        "adaptive": adaptive,
+    }
+    outputs, timings = {}, {}
+    for name in stage_order(stages, skip):
+        fn, deps = STAGES[name]
+        if progress is not None:
+            progress(name)
+        start = time.perf_counter()
+        outputs[name] = fn(options, {d: outputs.get(d) for d in deps})
+        timings[name] = time.perf_counter() - start
+        print(f"OK {name} done in {timings[name]:.1f}s")
+
+    print("\n Stage timings")
+    for name, seconds in timings.items():
+        print(f"  {name:<10} {seconds:>7.1f}s")
+    print(f"  {'total':<10} {sum(timings.values()):>7.1f}s")
+    return outputs, timings
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the data pipeline in one process")
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated targets")
+    parser.add_argument("--skip", default="", help="comma-separated stages to leave out, e.g. fetch")
+    parser.add_argument("--checkpoint", action="store_true", help="write processed files and the panel")
+    parser.add_argument("--force", action="store_true", help="recompute unchanged symbols too")
+    parser.add_argument("--adaptive", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--universe", default=None)
+    parser.add_argument("--shard", default=None)
+    args = parser.parse_args()
+
+    run_pipeline(
+        symbols=select_from_argv(),
+        stages=[s for s in args.stages.split(",") if s],
+        skip=[s for s in args.skip.split(",") if s],
+        checkpoint=args.checkpoint,
+        force=args.force,
+        workers=args.workers,
+        adaptive=args.adaptive,
+    )
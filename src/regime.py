@@ -0,0 +1,134 @@
+# Market-regime features (volatility, trend strength, noise ratio) as full
+# rolling series, for one symbol or a dates x symbols panel. The value at bar t
+# is what the last-bar helpers return for the history up to t, so a regime can
+# be classified at every historical bar in one vectorized pass.
+
+import numpy as np
+import pandas as pd
+
+from cache import cached
+
+# ---------- Helpers ----------
+def _window_sum(values, window):
+    """Trailing `window` sums from one cumulative sum (NaN until filled)."""
+    out = np.full(len(values), np.nan)
+    if len(values) < window:
+        return out
+    sums = np.concatenate(([0.0], np.cumsum(values)))
+    out[window - 1:] = sums[window:] - sums[:-window]
+    return out
+
+def _returns(close):
+    returns = np.full(len(close), np.nan)
+    returns[1:] = close[1:] / close[:-1] - 1
+    return returns
+
+def _cached(fn, values, window):
+    """fn(values, window) memoised in the feature cache."""
+    return cached(fn.__name__, values, window, lambda: fn(values, window))
+
+def _as_columns(close, fn, window):
+    """Applies a 1-D series function to a Series, DataFrame or array."""
+    if isinstance(close, pd.DataFrame):
+        values = close.to_numpy(dtype=float)
+        return pd.DataFrame(_as_columns(values, fn, window), index=close.index, columns=close.columns)
+    if isinstance(close, pd.Series):
+        return pd.Series(_cached(fn, close.to_numpy(dtype=float), window), index=close.index, name=close.name)
+
+    values = np.asarray(close, dtype=float)
+    if values.ndim == 1:
+        return _cached(fn, values, window)
+    # One contiguous column at a time: every column gets the same arithmetic as
+    # the 1-D path, so panel and per-symbol results agree exactly.
+    out = np.empty(values.shape)
+    for j in range(values.shape[1]):
+        out[:, j] = _cached(fn, np.ascontiguousarray(values[:, j]), window)
+    return out
+
+# ---------- Rolling Series ----------
+def _volatility(close, window):
+    returns = _returns(close)
+    valid = ~np.isnan(returns)
+    if not valid.any():
+        return np.full(len(close), np.nan)
+
+    # Centre on the mean return so the sum of squares keeps its precision
+    centered = np.where(valid, returns - returns[valid].mean(), 0.0)
+    count = _window_sum(valid.astype(float), window)
+    s1 = _window_sum(centered, window)
+    s2 = _window_sum(centered ** 2, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = np.maximum(s2 - s1 * s1 / window, 0.0) / (window - 1)
+    return np.where(count == window, np.sqrt(var), np.nan)
+
+def _trend_strength(close, window):
+    out = np.zeros(len(close))
+    seen = np.cumsum(~np.isnan(close))
+    if len(close) >= window:
+        start = close[:len(close) - window + 1]
+        out[window - 1:] = np.abs(close[window - 1:] - start) / start
+    out[seen < window] = 0.0
+    out[np.isnan(close)] = np.nan
+    return out
+
+def _noise_ratio(close, window):
+    returns = _returns(close)
+    valid = ~np.isnan(returns)
+    seen = np.cumsum(valid)
+
+    total_abs = _window_sum(np.where(valid, np.abs(returns), 0.0), window)
+    moves = _window_sum((valid & (returns != 0)).astype(float), window)
+    cumulative = np.full(len(close), np.nan)
+    if len(close) >= window:
+        cumulative[window - 1:] = np.abs(close[window - 1:] / close[:len(close) - window + 1] - 1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(moves == 0, 0.0, 1 - (cumulative / total_abs))
+    out[seen < window] = 0.0
+    out[np.isnan(close)] = np.nan
+    return out
+
+def rolling_volatility(close, window=20):
+    """Rolling std (ddof=1) of daily returns, NaN until `window` returns exist."""
+    return _as_columns(close, _volatility, window)
+
+def rolling_trend_strength(close, window=20):
+    """|Close[t] - Close[t-window+1]| / Close[t-window+1]; 0 before `window` bars."""
+    return _as_columns(close, _trend_strength, window)
+
+def rolling_noise_ratio(close, window=20):
+    """
+    1 - |net move| / sum of |daily returns| over the window (sums from
+    cumulative sums); 0 before `window` returns or on a flat window.
+    """
+    return _as_columns(close, _noise_ratio, window)
+
+def regime_features(close, window=20):
+    """Volatility / TrendStrength / Noise series for one Close series, as a DataFrame."""
+    if isinstance(close, pd.DataFrame):
+        raise TypeError("regime_features takes one series; use the rolling_* functions for panels")
+    index = close.index if isinstance(close, pd.Series) else None
+    values = np.asarray(close, dtype=float)
+    return pd.DataFrame({
+        "Volatility": _cached(_volatility, values, window),
+        "TrendStrength": _cached(_trend_strength, values, window),
+        "Noise": _cached(_noise_ratio, values, window),
+    }, index=index)
+
+# ---------- Last-Bar Values ----------
+def _last(close, fn, window, empty=0.0):
+    # Only the final window + 1 closes reach the last bar's value
+    tail = np.asarray(close, dtype=float)[-(window + 1):]
+    return _cached(fn, tail, window)[-1] if len(tail) else empty
+
+def compute_volatility(df, window=20):
+    """Rolling volatility (standard deviation of daily returns) at the last bar."""
+    return _last(df["Close"], _volatility, window, empty=np.nan)
+
+def compute_trend_strength(df, window=20):
+    """% change in price over the last `window` bars (a simple ADX proxy)."""
+    return _last(df["Close"], _trend_strength, window)
+
+def compute_noise_ratio(df, window=20):
+    """Share of the window's absolute daily moves that did not add to the net move."""
+    return _last(df["Close"], _noise_ratio, window)
@@ -0,0 +1,217 @@
+# Typed on-disk store for the per-symbol price files in data/raw, data/processed
+# and data/trimmed. Files are Feather / Arrow IPC (Date as int64 IST session
+# days, float64 prices, LZ4) with CSV kept as an import/export format.
+# Dates are normalized once, at write time: every file holds plain trading
+# dates and readers always return Date as naive IST midnight datetime64.
+#
+#   python src/storage.py import [raw processed trimmed]   CSV -> Feather
+#   python src/storage.py export [raw processed trimmed]   Feather -> CSV
+#   python src/storage.py normalize [raw processed trimmed] rewrite dates in place
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# ---------- PATH SETUP ----------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+
+DATA_DIRS = {
+    stage: os.path.join(PROJECT_ROOT, "data", stage)
+    for stage in ("raw", "processed", "trimmed")
+}
+
+IST = "Asia/Kolkata"
+SESSION_FORMAT = "%Y-%m-%d"
+EXTENSIONS = {"feather": ".feather", "csv": ".csv"}
+PRICE_COLUMNS = ("Open", "High", "Low", "Close")
+
+# Format new files are written in; readers accept either
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "feather" if feather is not None else "csv")
+
+# ---------- Dates ----------
+# A session date is the IST trading day, stored as int64 days since 1970-01-01.
+
+def session_dates(days):
+    """int64 session days -> naive IST midnight datetime64[ns] (no parsing)."""
+    return np.asarray(days, dtype=np.int64).astype("datetime64[D]").astype("datetime64[ns]")
+
+def _floor_days(dates):
+    # Numpy day floor; Series.dt.normalize() is several times slower
+    return pd.Series(dates.to_numpy().astype("datetime64[D]").astype("datetime64[ns]"), index=dates.index)
+
+def normalize_dates(values):
+    """
+    Any Date column (session days, plain dates, ISO strings with or without
+    offsets, tz-aware or naive datetimes) as naive IST session dates,
+    datetime64[ns] at midnight. Naive inputs are taken to be IST already.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_integer_dtype(values):
+        return pd.Series(session_dates(values.to_numpy()), index=values.index)
+    if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+        dates = pd.to_datetime(values)
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_convert(IST).dt.tz_localize(None)
+        return _floor_days(dates)
+
+    text = values.astype(str)
+    try:
+        # Canonical files hold plain dates; one fixed-format pass parses them
+        return pd.to_datetime(text, format=SESSION_FORMAT).astype("datetime64[ns]")
+    except ValueError:
+        pass
+    if text.str.endswith("+05:30").all():
+        # IST offsets: the wall time already is the IST time, no tz round trip
+        return _floor_days(pd.to_datetime(text.str[:-6], format="ISO8601"))
+
+    # Other offsets go through UTC; naive strings are IST wall time as written
+    aware = text.str.contains(r"(?:[+-]\d{2}:?\d{2}|Z)$")
+    dates = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    if aware.any():
+        parsed = pd.to_datetime(text[aware], format="ISO8601", utc=True)
+        dates[aware] = parsed.dt.tz_convert(IST).dt.tz_localize(None).astype("datetime64[ns]")
+    if not aware.all():
+        dates[~aware] = pd.to_datetime(text[~aware], format="ISO8601").astype("datetime64[ns]")
+    # Older trimmed files carry 05:30 wall times from a UTC round trip
+    return _floor_days(dates)
+
+def session_days(dates):
+    """Any Date column -> int64 IST session days."""
+    return normalize_dates(dates).to_numpy().astype("datetime64[D]").view(np.int64)
+
+# ---------- Paths ----------
+def _check_format(fmt):
+    fmt = STORAGE_FORMAT if fmt is None else fmt
+    if fmt not in EXTENSIONS:
+        raise ValueError("format must be feather or csv")
+    if fmt == "feather" and feather is None:
+        raise ImportError("pyarrow is required for Feather storage (pip install pyarrow)")
+    return fmt
+
+def symbol_path(data_dir, symbol, fmt=None):
+    return os.path.join(data_dir, f"{symbol}{EXTENSIONS[_check_format(fmt)]}")
+
+def find_file(data_dir, symbol):
+    """Newest existing file for symbol in data_dir (any format), or None."""
+    paths = [os.path.join(data_dir, f"{symbol}{ext}") for ext in EXTENSIONS.values()]
+    paths = [p for p in paths if os.path.exists(p)]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+def list_symbols(data_dir):
+    """Sorted symbols with a price file in data_dir."""
+    if not os.path.isdir(data_dir):
+        return []
+    symbols = set()
+    for file in os.listdir(data_dir):
+        for ext in EXTENSIONS.values():
+            if file.endswith(ext):
+                symbols.add(file[:-len(ext)])
+    return sorted(symbols)
+
+# ---------- Files ----------
+def read_file(path, columns=None):
+    """One price file (.feather or .csv) with a normalized Date column."""
+    if path.endswith(".feather"):
+        _check_format("feather")
+        table = feather.read_table(path, columns=columns)
+        data = {}
+        for name in table.column_names:
+            values = table.column(name).to_numpy()
+            data[name] = values.astype(float) if values.dtype == np.float32 else values
+        df = pd.DataFrame(data)
+    else:
+        df = pd.read_csv(path, usecols=columns)
+    if "Date" in df.columns:
+        df["Date"] = normalize_dates(df["Date"]).to_numpy()
+    return df
+
+def write_file(df, path, price_dtype="float64"):
+    """
+    Writes df to path in the format its extension names, Date as session dates
+    (int64 days in Feather, YYYY-MM-DD in CSV); price_dtype="float32" halves
+    the OHLC columns.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    if path.endswith(".feather"):
+        _check_format("feather")
+        out = df.reset_index(drop=True)
+        if "Date" in out.columns:
+            out["Date"] = session_days(out["Date"])
+        for col in PRICE_COLUMNS:
+            if col in out.columns:
+                out[col] = out[col].astype(price_dtype)
+        feather.write_feather(out, tmp_path, compression="lz4")
+    else:
+        out = df.copy()
+        if "Date" in out.columns:
+            out["Date"] = normalize_dates(out["Date"]).to_numpy()
+        out.to_csv(tmp_path, index=False, date_format=SESSION_FORMAT)
+    os.replace(tmp_path, path)
+
+def append_file(df, path):
+    """Appends rows to an existing price file (CSV in place, Feather rewritten)."""
+    if path.endswith(".csv"):
+        out = df.copy()
+        if "Date" in out.columns:
+            out["Date"] = normalize_dates(out["Date"]).to_numpy()
+        out.to_csv(path, mode="a", header=False, index=False, date_format=SESSION_FORMAT)
+    else:
+        write_file(pd.concat([read_file(path), df], ignore_index=True), path)
+
+# ---------- Symbols ----------
+def read_prices(data_dir, symbol, columns=None):
+    """A symbol's bars from data_dir, whichever format holds the newest copy."""
+    path = find_file(data_dir, symbol)
+    if path is None:
+        raise FileNotFoundError(f"Missing data: {os.path.join(data_dir, symbol)}")
+    return read_file(path, columns)
+
+def write_prices(df, data_dir, symbol, fmt=None, price_dtype="float64"):
+    """Writes a symbol's bars to data_dir in STORAGE_FORMAT (or fmt); returns the path."""
+    path = symbol_path(data_dir, symbol, fmt)
+    write_file(df, path, price_dtype)
+    return path
+
+# ---------- CSV Import / Export ----------
+def convert_dir(data_dir, fmt):
+    """Rewrites every symbol in data_dir in the given format."""
+    for symbol in list_symbols(data_dir):
+        source = find_file(data_dir, symbol)
+        target = symbol_path(data_dir, symbol, fmt)
+        if source != target:
+            write_file(read_file(source), target)
+    print(f"OK {data_dir}: {len(list_symbols(data_dir))} symbols as {fmt}")
+
+def import_csv(data_dir):
+    convert_dir(data_dir, "feather")
+
+def export_csv(data_dir):
+    convert_dir(data_dir, "csv")
+
+def normalize_dir(data_dir):
+    """Rewrites files written before ingestion normalized dates, in place."""
+    for symbol in list_symbols(data_dir):
+        for ext in EXTENSIONS.values():
+            path = os.path.join(data_dir, f"{symbol}{ext}")
+            if os.path.exists(path):
+                write_file(read_file(path), path)
+    print(f"OK {data_dir}: {len(list_symbols(data_dir))} symbols with session dates")
+
+COMMANDS = {"import": import_csv, "export": export_csv, "normalize": normalize_dir}
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print("usage: python src/storage.py import|export|normalize [raw processed trimmed]")
+        sys.exit(1)
+    stages = sys.argv[2:] or list(DATA_DIRS)
+    for stage in stages:
+        COMMANDS[sys.argv[1]](DATA_DIRS[stage])
@@ -1,7 +1,19 @@
 # src/trim_data.py
-import pandas as pd
+# The rolling ~3-month window used by the dashboard, as a lazy view over the
+# processed store (binary search on the sorted dates, no copy on disk). The
+# window ends at each symbol's last bar, so it does not empty out when the
+# data is a few days (or months) behind the calendar.
+#
+#   python src/trim_data.py           row counts per symbol for the window
+#   python src/trim_data.py --write   also export the window to data/trimmed
+#                                     (symbols whose processed file or window changed;
+#                                     --force for all, --dry-run to list them)
 import os
-from datetime import datetime
+import sys
+
+from storage import list_symbols, read_prices, write_prices, find_file
+from panel import recent_window
+from incremental import StageManifest, report_plan, run_flags
 
 # ---------- PATH SETUP ----------
 SRC_DIR = os.path.dirname(os.path.abspath(__file__))   # .../src
@@ -10,53 +22,67 @@ PROJECT_ROOT = os.path.dirname(SRC_DIR)                # project root
 INPUT_DIR = os.path.join(PROJECT_ROOT, "data", "processed")
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data", "trimmed")
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
 # ---------- Rolling 3-Month Window ----------
-# Set END_DATE to the *end* of today to ensure today's data (with time) is included
-END_DATE = pd.Timestamp(datetime.today().date()) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-LOOKBACK_DAYS = 92   # ~3 months
-START_DATE = END_DATE - pd.Timedelta(days=LOOKBACK_DAYS)
+LOOKBACK_MONTHS = 3
+
+def trimmed_bars(symbol, data_dir=INPUT_DIR, months=LOOKBACK_MONTHS):
+    """
+    A symbol's bars (every stored column) in the `months` up to its last bar;
+    raises FileNotFoundError if missing.
+    """
+    df = read_prices(data_dir, symbol).sort_values("Date").reset_index(drop=True)
+    return recent_window(df, months=months)
 
-print(
-    f"Trimming all datasets to rolling window:\n"
-    f"    {START_DATE.date()} -> {END_DATE.date()} (Last ~3 months)\n"
-)
+def trim_params(months=LOOKBACK_MONTHS, out_dir=OUTPUT_DIR):
+    """
+    The stage parameters the pipeline manifest records for trimmed exports.
+    The window follows each symbol's last bar, which the input hash already
+    covers, so nothing here depends on the calendar date.
+    """
+    return {"months": months, "out_dir": os.path.abspath(out_dir)}
 
-summary = []
+# ---------- RUN ----------
+if __name__ == "__main__":
+    write = "--write" in sys.argv[1:]
+    force, dry_run = run_flags()
 
-# ---------- Trim Loop ----------
-for file in os.listdir(INPUT_DIR):
-    if file.endswith(".csv"):
-        file_path = os.path.join(INPUT_DIR, file)
-        df = pd.read_csv(file_path)
+    print(f"Trimming all datasets to the last {LOOKBACK_MONTHS} months before each symbol's last bar\n")
 
-        # Parse date safely (expecting naive dates from features.py, but handling potential TZ just in case)
-        df["Date"] = pd.to_datetime(df["Date"], utc=True).dt.tz_convert("Asia/Kolkata").dt.tz_localize(None)
+    summary = []
+    symbols = list_symbols(INPUT_DIR)
 
-        df = df.sort_values("Date")
+    # Exports are incremental: only symbols whose input or window length changed
+    if write:
+        manifest = StageManifest("trim")
+        params = trim_params()
+        plan = manifest.plan(symbols, lambda sym: [find_file(INPUT_DIR, sym)], params, force)
+        report_plan("trim", plan, len(symbols), dry_run)
+        if dry_run:
+            sys.exit(0)
+        symbols = list(plan)
 
-        # Filter rolling window
-        df_trimmed = df[
-            (df["Date"] >= START_DATE) &
-            (df["Date"] <= END_DATE)
-        ]
+    # ---------- Trim Loop ----------
+    for symbol in symbols:
+        df_trimmed = trimmed_bars(symbol)
 
-        out_path = os.path.join(OUTPUT_DIR, file)
-        df_trimmed.to_csv(out_path, index=False)
+        if write:
+            out_path = write_prices(df_trimmed, OUTPUT_DIR, symbol)
+            manifest.record(symbol, [find_file(INPUT_DIR, symbol)], params, [out_path])
 
         row_count = len(df_trimmed)
         status = "OK" if row_count > 0 else "! EMPTY"
-        print(f"{status} {file:<25} | {row_count:>4} rows retained")
+        print(f"{status} {symbol:<25} | {row_count:>4} rows retained")
 
-        summary.append((file, row_count))
+        summary.append((symbol, row_count))
 
-# ---------- Summary ----------
-print("\n Summary Report")
-for f, count in summary:
-    if count < 30:
-        print(f"! {f:<25} -- Only {count} rows")
-    else:
-        print(f"OK {f:<25} -- OK ({count} rows)")
+    # ---------- Summary ----------
+    print("\n Summary Report")
+    for f, count in summary:
+        if count < 30:
+            print(f"! {f:<25} -- Only {count} rows")
+        else:
+            print(f"OK {f:<25} -- OK ({count} rows)")
 
-print(f"\n Rolling 3-month datasets saved to:\n{OUTPUT_DIR}")
+    if write:
+        manifest.save()
+        print(f"\n Rolling 3-month datasets saved to:\n{OUTPUT_DIR}")
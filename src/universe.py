@@ -0,0 +1,119 @@
+# Symbol-universe registry. universe.json (project root) lists every symbol
+# once plus named sub-universes; upstox_symbol_map.json maps them to Upstox
+# instrument keys. Lists are validated and deduplicated on load, and can be
+# split into deterministic shards so batch jobs never repeat work.
+#
+#   python src/universe.py [--universe NAME] [--shard I/N]   print the selection
+
+import os
+import re
+import sys
+import json
+import zlib
+
+# ---------- PATH SETUP ----------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SRC_DIR)
+
+UNIVERSE_PATH = os.path.join(PROJECT_ROOT, "universe.json")
+SYMBOL_MAP_PATH = os.path.join(PROJECT_ROOT, "upstox_symbol_map.json")
+
+SUFFIX = ".NS"
+SYMBOL_RE = re.compile(r"^[A-Z0-9][A-Z0-9&\-]*\.NS$")
+
+# ---------- Validation ----------
+def clean_symbols(symbols, source="universe"):
+    """
+    Upper-cased, validated, order-preserving unique symbols. Two tickers
+    run together by a missing comma ("LT.NS360ONE.NS") are split apart;
+    duplicates and malformed entries are reported and dropped.
+    """
+    seen, out, duplicates, invalid = set(), [], [], []
+    for raw in symbols:
+        text = str(raw).strip().upper()
+        parts = [p + SUFFIX for p in text.split(SUFFIX) if p] if text.count(SUFFIX) > 1 else [text]
+        if len(parts) > 1:
+            print(f"! {source}: split {raw!r} into {', '.join(parts)}")
+        for sym in parts:
+            if not SYMBOL_RE.match(sym):
+                invalid.append(raw)
+            elif sym in seen:
+                duplicates.append(sym)
+            else:
+                seen.add(sym)
+                out.append(sym)
+    if duplicates:
+        print(f"! {source}: dropped {len(duplicates)} duplicate symbols")
+    if invalid:
+        print(f"! {source}: dropped invalid symbols {invalid}")
+    return out
+
+# ---------- Registry ----------
+def _read_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def universe_names(path=UNIVERSE_PATH):
+    return ["all", *_read_json(path).get("universes", {})]
+
+def load_universe(name=None, path=UNIVERSE_PATH):
+    """Symbols of a named sub-universe, or the full universe for None / "all"."""
+    registry = _read_json(path)
+    if name in (None, "all"):
+        symbols = registry.get("symbols")
+        if symbols is None:
+            # No universe file: fall back to the mapped symbols
+            symbols = list(_read_json(SYMBOL_MAP_PATH))
+        return clean_symbols(symbols, "all")
+    universes = registry.get("universes", {})
+    if name not in universes:
+        raise KeyError(f"Unknown universe {name!r}; known: {', '.join(universe_names(path))}")
+    return clean_symbols(universes[name], name)
+
+def instrument_map(symbols=None, path=SYMBOL_MAP_PATH):
+    """{symbol: instrument_key} for symbols (default: full universe) that are mapped."""
+    mapping = _read_json(path)
+    symbols = load_universe() if symbols is None else symbols
+    unmapped = [s for s in symbols if s not in mapping]
+    if unmapped:
+        print(f"! {len(unmapped)} symbols have no Upstox instrument key: {', '.join(unmapped[:10])}")
+    return {s: mapping[s] for s in symbols if s in mapping}
+
+# ---------- Sharding ----------
+def shard_of(symbol, count):
+    """Stable shard for a symbol: crc32, so adding symbols never moves the others."""
+    return zlib.crc32(symbol.encode()) % count
+
+def shard(symbols, index, count):
+    """Symbols in shard `index` of `count` (0-based), in their original order."""
+    if not 0 <= index < count:
+        raise ValueError(f"shard index must be in [0, {count})")
+    return [s for s in symbols if shard_of(s, count) == index]
+
+def parse_shard(text):
+    """Parses "I/N" into (I, N)."""
+    index, count = (int(p) for p in text.split("/"))
+    return index, count
+
+def select(name=None, shard_spec=None):
+    """Universe `name`, cut to shard "I/N" when given."""
+    symbols = load_universe(name)
+    if shard_spec:
+        symbols = shard(symbols, *parse_shard(shard_spec))
+    return symbols
+
+def select_from_argv(argv=None, default=None):
+    """select() driven by --universe NAME (else `default`) and --shard I/N in argv."""
+    argv = sys.argv[1:] if argv is None else argv
+    name = argv[argv.index("--universe") + 1] if "--universe" in argv else default
+    shard_spec = argv[argv.index("--shard") + 1] if "--shard" in argv else None
+    return select(name, shard_spec)
+
+# ---------- RUN ----------
+if __name__ == "__main__":
+    symbols = select_from_argv()
+    for sym in symbols:
+        print(sym)
+    print(f"\n {len(symbols)} symbols")
@@ -0,0 +1,63 @@
+# Shared fixtures. The modules live flat in src/ and import each other by
+# name, so src/ goes on sys.path the way the scripts run.
+
+import os
+import sys
+import socket
+import asyncio
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+# ---------- Price Data ----------
+def random_bars(n=160, seed=0):
+    """Random-walk OHLCV bars on business days, Date-sorted like a stored file."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    return pd.DataFrame({
+        "Date": pd.bdate_range("2025-01-01", periods=n),
+        "Open": open_,
+        "High": np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n)),
+        "Low": np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n)),
+        "Close": close,
+        "Volume": rng.integers(10_000, 1_000_000, n).astype(float),
+    })
+
+@pytest.fixture
+def bars():
+    return random_bars()
+
+# ---------- Mock Upstox Server ----------
+@pytest.fixture
+def mock_upstox():
+    """
+    start(**make_app options) runs the mock Upstox server on a free port in a
+    background thread and returns (base_url, stats); stopped after the test.
+    """
+    from mock_upstox import STATS_KEY, make_app, start_server
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    runners = []
+
+    def start(**options):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        app = make_app(fixtures_dir=None, **options)
+        runners.append(asyncio.run_coroutine_threadsafe(start_server(app, port), loop).result())
+        return f"http://127.0.0.1:{port}/v2", app[STATS_KEY]
+
+    yield start
+
+    for runner in runners:
+        asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
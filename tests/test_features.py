@@ -0,0 +1,59 @@
+# Incremental feature refresh against a full recompute.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FeatureState, process_file, update_file
+from storage import read_file, write_prices
+
+COLUMNS = ["Close", "MA_Fast", "MA_Slow", "Signal", "Crossover"]
+
+@pytest.fixture
+def paths(tmp_path):
+    return str(tmp_path / "raw"), str(tmp_path / "out.csv"), str(tmp_path / "state" / "ABC.NS.json")
+
+def refresh(raw_dir, out_path, state_path, df):
+    raw_path = write_prices(df, raw_dir, "ABC.NS")
+    written = update_file(raw_path, out_path, state_path, "EMA", 10, 20)
+    return raw_path, written
+
+def assert_matches_full_recompute(raw_path, out_path):
+    got = read_file(out_path).reset_index(drop=True)
+    expected = process_file(raw_path, "EMA", 10, 20).reset_index(drop=True)
+    assert got["Date"].tolist() == expected["Date"].tolist()
+    for col in COLUMNS:
+        np.testing.assert_allclose(got[col], expected[col], rtol=1e-10, atol=1e-8, equal_nan=True, err_msg=col)
+
+def test_new_bars_are_appended(paths, bars):
+    raw_dir, out_path, state_path = paths
+    refresh(raw_dir, out_path, state_path, bars.iloc[:120])
+    raw_path, written = refresh(raw_dir, out_path, state_path, bars)
+    assert written == len(bars) - 120
+    assert_matches_full_recompute(raw_path, out_path)
+
+def test_revised_last_bar_triggers_rebuild(paths, bars):
+    raw_dir, out_path, state_path = paths
+    refresh(raw_dir, out_path, state_path, bars.iloc[:80])
+
+    # The next fetch re-downloads the last stored session with a new Close
+    revised = bars.iloc[:82].copy()
+    revised.loc[79, "Close"] *= 1.05
+    raw_path, written = refresh(raw_dir, out_path, state_path, revised)
+    assert written == len(revised)
+    assert_matches_full_recompute(raw_path, out_path)
+
+    # And the rebuilt state keeps appending from there
+    raw_path, written = refresh(raw_dir, out_path, state_path, pd.concat([revised, bars.iloc[82:]]))
+    assert written == len(bars) - 82
+    assert_matches_full_recompute(raw_path, out_path)
+
+def test_state_without_closes_hash_is_rebuilt(paths, bars):
+    raw_dir, out_path, state_path = paths
+    refresh(raw_dir, out_path, state_path, bars.iloc[:120])
+    state = FeatureState.load(state_path)
+    state.closes_hash = None  # written before the hash was recorded
+    state.save(state_path)
+    raw_path, written = refresh(raw_dir, out_path, state_path, bars)
+    assert written == len(bars)
+    assert_matches_full_recompute(raw_path, out_path)
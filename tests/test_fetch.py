@@ -0,0 +1,160 @@
+# The Upstox fetchers against the local mock server: retries on 429 / 5xx,
+# incremental merges and the data/raw manifest.
+
+import os
+import importlib.util
+import pandas as pd
+import pytest
+
+import candles
+import fetch_async
+from candles import load_manifest, save_manifest, store_candles, candles_frame
+from fetch_async import fetch_all
+from mock_upstox import synthetic_candles
+from storage import read_prices, write_prices
+
+SYMBOLS = {f"SYM{i}.NS": f"NSE_EQ|TEST{i}" for i in range(6)}
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(fetch_async, "BACKOFF_BASE", 0.001)
+    monkeypatch.setattr(fetch_async, "BACKOFF_CAP", 0.01)
+
+def stored_dates(data_dir, symbol):
+    return read_prices(data_dir, symbol, columns=["Date"])["Date"]
+
+def seed_history(data_dir, symbol, key, until):
+    """Stores the mock server's bars for key up to `until`, as an earlier run would have."""
+    rows = synthetic_candles(key, "2020-01-01", until)
+    manifest = load_manifest(data_dir)
+    store_candles(symbol, candles_frame(rows), manifest, data_dir)
+    save_manifest(manifest, data_dir)
+
+# ---------- Concurrent Fetcher ----------
+def test_fetch_all_stores_files_and_manifest(mock_upstox, tmp_path):
+    base_url, stats = mock_upstox()
+    outcomes = fetch_all(SYMBOLS, {}, verbose=False, data_dir=str(tmp_path), base_url=base_url)
+
+    assert [o["symbol"] for o in outcomes] == list(SYMBOLS)
+    assert {o["status"] for o in outcomes} == {"ok"}
+    assert stats["requests"] == len(SYMBOLS)
+
+    manifest = load_manifest(str(tmp_path))
+    for symbol in SYMBOLS:
+        dates = stored_dates(str(tmp_path), symbol)
+        assert dates.is_monotonic_increasing and not dates.duplicated().any()
+        assert manifest[symbol]["rows"] == len(dates)
+        assert manifest[symbol]["last_date"] == dates.max().strftime("%Y-%m-%d")
+
+def test_incremental_run_fetches_only_new_sessions(mock_upstox, tmp_path):
+    base_url, stats = mock_upstox()
+    data_dir = str(tmp_path)
+    symbol, key = "SYM0.NS", SYMBOLS["SYM0.NS"]
+    cutoff = pd.Timestamp.today().normalize() - pd.Timedelta(days=30)
+    seed_history(data_dir, symbol, key, cutoff)
+    before = stored_dates(data_dir, symbol)
+
+    [outcome] = fetch_all({symbol: key}, {}, verbose=False, data_dir=data_dir, base_url=base_url)
+
+    dates = stored_dates(data_dir, symbol)
+    assert outcome["status"] == "ok"
+    # Only the sessions after the last stored one were added, and the history kept
+    assert outcome["rows"] == (dates > before.max()).sum() > 0
+    assert dates.min() == before.min()
+    assert not dates.duplicated().any()
+    assert load_manifest(data_dir)[symbol]["rows"] == len(dates)
+
+    # Nothing new: the rerun adds no rows
+    [outcome] = fetch_all({symbol: key}, {}, verbose=False, data_dir=data_dir, base_url=base_url)
+    assert outcome["rows"] == 0
+    assert len(stored_dates(data_dir, symbol)) == len(dates)
+
+def test_manifest_entry_for_replaced_file_is_ignored(mock_upstox, tmp_path):
+    base_url, _ = mock_upstox()
+    data_dir = str(tmp_path)
+    symbol, key = "SYM1.NS", SYMBOLS["SYM1.NS"]
+    fetch_all({symbol: key}, {}, verbose=False, data_dir=data_dir, base_url=base_url)
+    full_rows = len(stored_dates(data_dir, symbol))
+
+    # Another fetcher rewrites the file with older, shorter history
+    old = read_prices(data_dir, symbol).iloc[:100]
+    write_prices(old, data_dir, symbol)
+    [outcome] = fetch_all({symbol: key}, {}, verbose=False, data_dir=data_dir, base_url=base_url)
+    assert outcome["rows"] == full_rows - 100
+    assert len(stored_dates(data_dir, symbol)) == full_rows
+
+    # Deleted file: the whole window is fetched again
+    os.remove(candles.find_file(data_dir, symbol))
+    fetch_all({symbol: key}, {}, verbose=False, data_dir=data_dir, base_url=base_url)
+    assert len(stored_dates(data_dir, symbol)) == full_rows
+
+def test_retries_server_errors(mock_upstox, tmp_path):
+    base_url, stats = mock_upstox(error_rate=0.3, seed=1)
+    # One request at a time keeps the seeded error sequence reproducible
+    outcomes = fetch_all(SYMBOLS, {}, verbose=False, data_dir=str(tmp_path), base_url=base_url,
+                         concurrency=1)
+
+    assert {o["status"] for o in outcomes} == {"ok"}
+    assert stats["errors"] > 0
+    assert sum(o["attempts"] for o in outcomes) == stats["requests"] == len(SYMBOLS) + stats["errors"]
+
+def test_retries_rate_limited_requests(mock_upstox, tmp_path):
+    base_url, stats = mock_upstox(rate_limit=3)
+    outcomes = fetch_all(SYMBOLS, {}, verbose=False, data_dir=str(tmp_path), base_url=base_url,
+                         rate=100)
+
+    assert {o["status"] for o in outcomes} == {"ok"}
+    assert stats["throttled"] > 0
+    assert max(o["attempts"] for o in outcomes) > 1
+
+def test_gives_up_after_max_retries(mock_upstox, tmp_path):
+    base_url, stats = mock_upstox(error_rate=1.0)
+    outcomes = fetch_all(SYMBOLS, {}, verbose=False, data_dir=str(tmp_path), base_url=base_url)
+
+    assert {o["status"] for o in outcomes} == {"error"}
+    assert all("gave up" in o["error"] for o in outcomes)
+    assert stats["requests"] == len(SYMBOLS) * (fetch_async.MAX_RETRIES + 1)
+    assert load_manifest(str(tmp_path)) == {}
+
+def test_one_failing_symbol_does_not_stop_the_run(mock_upstox, tmp_path, monkeypatch):
+    base_url, _ = mock_upstox()
+    bad_symbol = "SYM2.NS"
+
+    def store(symbol, *args):
+        if symbol == bad_symbol:
+            raise OSError("disk full")
+        return store_candles(symbol, *args)
+
+    monkeypatch.setattr(fetch_async, "store_candles", store)
+    outcomes = {o["symbol"]: o for o in fetch_all(SYMBOLS, {}, verbose=False, data_dir=str(tmp_path),
+                                                  base_url=base_url)}
+
+    assert outcomes[bad_symbol]["status"] == "error"
+    assert outcomes[bad_symbol]["error"] == "OSError: disk full"
+    assert all(o["status"] == "ok" for s, o in outcomes.items() if s != bad_symbol)
+    assert set(load_manifest(str(tmp_path))) == set(SYMBOLS) - {bad_symbol}
+
+# ---------- Sequential Fetcher ----------
+def test_fetch_history_merges_into_stored_file(mock_upstox, tmp_path):
+    pytest.importorskip("requests")
+    pytest.importorskip("dotenv")
+    spec = importlib.util.spec_from_file_location(
+        "fetch_data_upstox", os.path.join(os.path.dirname(candles.__file__), "fetch-data-upstox.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    base_url, stats = mock_upstox()
+    data_dir = str(tmp_path)
+    symbol, key = "SYM3.NS", SYMBOLS["SYM3.NS"]
+    seed_history(data_dir, symbol, key, pd.Timestamp.today().normalize() - pd.Timedelta(days=30))
+    before = stored_dates(data_dir, symbol)
+
+    manifest = load_manifest(data_dir)
+    module.fetch_history(symbol, key, manifest=manifest, data_dir=data_dir, base_url=base_url)
+
+    dates = stored_dates(data_dir, symbol)
+    assert stats["requests"] == 1
+    assert dates.min() == before.min() and dates.max() > before.max()
+    assert not dates.duplicated().any()
+    assert manifest[symbol]["rows"] == len(dates)
@@ -0,0 +1,48 @@
+# The exhaustive (fast, slow) grid against the per-configuration batch backtest.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch_backtest import METRIC_COLUMNS, backtest_batch, param_grid
+from grid_search import GridResult, grid_search, window_pairs
+
+def test_window_pairs():
+    fast, slow = window_pairs(3, 6)
+    assert list(zip(fast, slow)) == [(3, 4), (3, 5), (3, 6), (4, 5), (4, 6), (5, 6)]
+    # The slow MA must warm up with bars left to trade
+    _, slow = window_pairs(3, 200, n_bars=40)
+    assert slow.max() == 38
+
+@pytest.mark.parametrize("binary_signal", [False, True])
+@pytest.mark.parametrize("exit_mode", ["time", "opposite"])
+def test_grid_search_matches_backtest_batch(bars, exit_mode, binary_signal):
+    result = grid_search(bars, "TEST", ma_types=("SMA", "EMA", "WMA"), min_window=3, max_window=40,
+                         exit_mode=exit_mode, binary_signal=binary_signal, chunk_size=100)
+    fast, slow = window_pairs(3, 40, len(bars))
+    expected = backtest_batch(
+        bars, param_grid(ma_types=("SMA", "EMA", "WMA"), ma_pairs=list(zip(fast, slow))),
+        exit_mode=exit_mode, binary_signal=binary_signal,
+    )
+
+    got = result.frame()
+    assert len(got) == len(expected) == 3 * len(fast)
+    assert (got["Trades"] > 0).any()
+    merged = got.merge(expected, on=["ma_type", "fast", "slow"], suffixes=("", "_batch"))
+    assert len(merged) == len(got)
+    for col in METRIC_COLUMNS:
+        np.testing.assert_allclose(merged[col], merged[f"{col}_batch"], rtol=1e-9, atol=1e-12,
+                                   equal_nan=True, err_msg=col)
+
+def test_best_and_round_trip(bars, tmp_path):
+    result = grid_search(bars, "TEST", ma_types=("EMA",), max_window=30)
+    best = result.best()
+    returns = result.metric("Total Return")
+    assert best["Total Return"] == returns.max()
+    assert best["Configs"] == len(result)
+    assert result.cube()[0, best["Fast"], best["Slow"]] == best["Total Return"]
+
+    path = tmp_path / "grid.npz"
+    result.save(path)
+    loaded = GridResult.load(path, "TEST")
+    pd.testing.assert_frame_equal(loaded.frame(), result.frame())
@@ -0,0 +1,64 @@
+# The per-symbol stage manifest: what makes a symbol stale, and stage
+# parameters that stay put from one day to the next.
+
+import os
+import pandas as pd
+import pytest
+
+from incremental import StageManifest, params_hash
+from storage import write_prices
+from trim_data import trim_params, trimmed_bars
+
+@pytest.fixture
+def stage(tmp_path):
+    """A symbol file, its output and a manifest path, all under tmp_path."""
+    def write_input(df):
+        return write_prices(df, str(tmp_path / "in"), "ABC.NS")
+
+    out_path = tmp_path / "out.csv"
+    out_path.write_text("x")
+    return write_input, str(out_path), str(tmp_path / "manifest.json")
+
+def plan_for(manifest_path, input_path, params, force=False):
+    return StageManifest("test", manifest_path).plan(["ABC.NS"], lambda sym: [input_path], params, force)
+
+def test_stale_reasons(stage, bars):
+    write_input, out_path, manifest_path = stage
+    input_path = write_input(bars)
+    params = {"months": 3}
+    assert plan_for(manifest_path, input_path, params) == {"ABC.NS": "new"}
+
+    manifest = StageManifest("test", manifest_path)
+    manifest.record("ABC.NS", [input_path], params, [out_path])
+    manifest.save()
+    assert plan_for(manifest_path, input_path, params) == {}
+    assert plan_for(manifest_path, input_path, params, force=True) == {"ABC.NS": "forced"}
+    assert plan_for(manifest_path, input_path, {"months": 6}) == {"ABC.NS": "params changed"}
+
+    # Rewritten with the same bars: touched but identical
+    write_input(bars)
+    assert plan_for(manifest_path, input_path, params) == {}
+    write_input(bars.iloc[:-1])
+    assert plan_for(manifest_path, input_path, params) == {"ABC.NS": "input changed"}
+
+    write_input(bars)
+    os.remove(out_path)
+    assert plan_for(manifest_path, input_path, params) == {"ABC.NS": "output missing"}
+
+def test_stages_saved_in_turn_keep_each_other(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    first, second = StageManifest("a", path), StageManifest("b", path)
+    first.entries["X"] = {"inputs": {}, "params": params_hash({}), "outputs": []}
+    second.entries["Y"] = {"inputs": {}, "params": params_hash({}), "outputs": []}
+    first.save()
+    second.save()
+    assert set(StageManifest("a", path).entries) == {"X"}
+    assert set(StageManifest("b", path).entries) == {"Y"}
+
+def test_trim_window_follows_the_data(tmp_path, bars):
+    write_prices(bars, str(tmp_path), "ABC.NS")
+    window = trimmed_bars("ABC.NS", str(tmp_path), months=3)
+    assert window["Date"].iloc[-1] == bars["Date"].iloc[-1]
+    assert window["Date"].iloc[0] >= bars["Date"].iloc[-1] - pd.DateOffset(months=3)
+    # Only the window length and the output dir are parameters, no dates
+    assert trim_params(3, str(tmp_path)) == {"months": 3, "out_dir": str(tmp_path)}
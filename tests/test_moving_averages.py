@@ -0,0 +1,66 @@
+# The MA kernels and the bar-by-bar updaters against pandas.
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+from moving_averages import ema, sma, wma, make_updater, updater_from_dict
+
+WINDOWS = [1, 2, 3, 5, 10, 20, 50]
+
+def prices(n=300, seed=0, gaps=False):
+    rng = np.random.default_rng(seed)
+    x = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    x[40:60] = x[40]  # flat run: pandas returns the value itself
+    if gaps:
+        x[[0, 1, 75, 76, 77, 150, 220]] = np.nan
+    return x
+
+def pandas_ma(x, ma_type, window):
+    s = pd.Series(x)
+    if ma_type == "SMA":
+        return s.rolling(window).mean().to_numpy()
+    if ma_type == "EMA":
+        return s.ewm(span=window, adjust=False).mean().to_numpy()
+    weights = np.arange(1, window + 1)
+    return s.rolling(window).apply(lambda w: np.dot(w, weights) / weights.sum(), raw=True).to_numpy()
+
+def run_updater(x, ma_type, window):
+    updater = make_updater(ma_type, window)
+    return np.array([updater.update(p) for p in x])
+
+# ---------- Vectorised Kernels ----------
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("ma_type, kernel", [("SMA", sma), ("EMA", ema), ("WMA", wma)])
+def test_kernel_matches_pandas(ma_type, kernel, window):
+    x = prices()
+    np.testing.assert_allclose(kernel(x, window), pandas_ma(x, ma_type, window), rtol=1e-10, atol=1e-8)
+
+@pytest.mark.parametrize("window", WINDOWS)
+def test_ema_kernel_matches_pandas_with_gaps(window):
+    x = prices(gaps=True)
+    np.testing.assert_allclose(ema(x, window), pandas_ma(x, "EMA", window), rtol=1e-10, atol=1e-8)
+
+# ---------- Updaters ----------
+@pytest.mark.parametrize("window", WINDOWS)
+@pytest.mark.parametrize("ma_type", ["SMA", "EMA", "WMA"])
+@pytest.mark.parametrize("gaps", [False, True])
+def test_updater_matches_pandas(ma_type, window, gaps):
+    x = prices(gaps=gaps)
+    np.testing.assert_allclose(run_updater(x, ma_type, window), pandas_ma(x, ma_type, window),
+                               rtol=1e-10, atol=1e-8)
+
+@pytest.mark.parametrize("ma_type", ["SMA", "EMA", "WMA"])
+def test_updater_resumes_from_saved_state(ma_type):
+    x = prices(gaps=True)
+    updater = make_updater(ma_type, 10)
+    first = [updater.update(p) for p in x[:120]]
+    # Saved to JSON and restored, as FeatureState does between runs
+    resumed = updater_from_dict(json.loads(json.dumps(updater.to_dict())))
+    rest = [resumed.update(p) for p in x[120:]]
+    np.testing.assert_allclose(first + rest, run_updater(x, ma_type, 10), rtol=0, atol=0)
+
+def test_unknown_ma_type():
+    with pytest.raises(ValueError):
+        make_updater("HMA", 10)
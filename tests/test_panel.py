@@ -0,0 +1,57 @@
+# The memory-mapped panel: staleness and which store load_bars reads.
+
+import os
+import time
+import pytest
+
+import panel
+from panel import build_panel, load_bars, panel_is_stale
+from storage import find_file, read_prices, write_prices
+from conftest import random_bars
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    panel._shared_panel.clear()
+    yield
+    panel._shared_panel.clear()
+
+@pytest.fixture
+def built(tmp_path):
+    """A source dir with three symbols and the panel built from it."""
+    source, panel_dir = str(tmp_path / "processed"), str(tmp_path / "panel")
+    for i, symbol in enumerate(["AAA.NS", "BBB.NS", "CCC.NS"]):
+        write_prices(random_bars(seed=i), source, symbol)
+    time.sleep(0.01)
+    build_panel(source, panel_dir)
+    return source, panel_dir
+
+def test_fresh_panel_serves_its_source(built):
+    source, panel_dir = built
+    assert not panel_is_stale(panel_dir)
+    bars = load_bars("AAA.NS", source, panel_dir)
+    assert bars["Close"].tolist() == read_prices(source, "AAA.NS")["Close"].tolist()
+
+def test_deleted_symbol_makes_panel_stale(built):
+    source, panel_dir = built
+    os.remove(find_file(source, "BBB.NS"))
+    assert panel_is_stale(panel_dir)
+    with pytest.raises(FileNotFoundError):
+        load_bars("BBB.NS", source, panel_dir)
+
+def test_rewritten_file_makes_panel_stale(built):
+    source, panel_dir = built
+    time.sleep(0.01)
+    write_prices(random_bars(seed=9), source, "CCC.NS")
+    assert panel_is_stale(panel_dir)
+    assert load_bars("CCC.NS", source, panel_dir)["Close"].tolist() == random_bars(seed=9)["Close"].tolist()
+
+def test_missing_source_makes_panel_stale(built, tmp_path):
+    source, panel_dir = built
+    os.rename(source, str(tmp_path / "moved"))
+    assert panel_is_stale(panel_dir)
+
+def test_other_store_is_read_from_its_files(built, tmp_path):
+    source, panel_dir = built
+    other = str(tmp_path / "raw")
+    write_prices(random_bars(seed=5), other, "AAA.NS")
+    assert load_bars("AAA.NS", other, panel_dir)["Close"].tolist() == random_bars(seed=5)["Close"].tolist()